@@ -0,0 +1,102 @@
+import html
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import streamlit as st
+
+Message = Dict[str, str]
+
+
+@dataclass
+class ChatViewState:
+    """Rendering cache for one chat view, kept in st.session_state"""
+    fragments: List[str] = field(default_factory=list)
+    pages: Dict[int, str] = field(default_factory=dict)
+    count: int = 0
+    last_message: Optional[Message] = None
+    pages_shown: int = 1
+
+
+def bubble(css_class: str, text: str, label: Optional[str] = None) -> str:
+    """HTML for one message bubble, with the text escaped"""
+    suffix = f" <small>{html.escape(label)}</small>" if label else ""
+    return f'<div class="{css_class}">{html.escape(text)}{suffix}</div>'
+
+
+class ChatView:
+    """
+    Render a growing conversation with work proportional to what changed.
+
+    Messages are grouped into fixed pages counted from the start of the
+    conversation. Each message is converted to HTML once, when it first
+    appears, and a full page is joined once and then reused, so a rerun only
+    converts new messages and joins the last, partial page. Only the newest
+    pages are drawn; older pages are loaded on request. Without `to_html`,
+    messages are drawn as st.chat_message elements instead, again only for
+    the pages shown.
+    """
+    def __init__(
+        self,
+        key: str,
+        to_html: Optional[Callable[[Message], str]] = None,
+        content_key: str = "content",
+        page_size: int = 25
+    ):
+        """
+        Args:
+            key: Session state key, unique per view
+            to_html: Converts a message to an HTML bubble; None uses st.chat_message
+            content_key: Message field holding the text, for st.chat_message mode
+            page_size: Messages per page
+        """
+        self.key = key
+        self.to_html = to_html
+        self.content_key = content_key
+        self.page_size = page_size
+
+    @property
+    def state(self) -> ChatViewState:
+        if self.key not in st.session_state:
+            st.session_state[self.key] = ChatViewState()
+        return st.session_state[self.key]
+
+    def render(self, messages: List[Message]) -> None:
+        """Draw the newest pages of `messages`, caching everything already rendered"""
+        state = self.state
+        if len(messages) < state.count or (state.count and messages[state.count - 1] is not state.last_message):
+            # History was cleared or replaced, e.g. on a role switch
+            state = st.session_state[self.key] = ChatViewState()
+        if not messages:
+            return
+
+        if self.to_html:
+            for message in messages[len(state.fragments):]:
+                state.fragments.append(self.to_html(message))
+        state.count = len(messages)
+        state.last_message = messages[-1]
+
+        total_pages = (len(messages) - 1) // self.page_size + 1
+        first_page = max(0, total_pages - state.pages_shown)
+        if first_page > 0:
+            if st.button(f"Show earlier messages ({first_page * self.page_size} hidden)", key=f"{self.key}_more"):
+                state.pages_shown += 1
+                first_page -= 1
+
+        for page in range(first_page, total_pages):
+            start = page * self.page_size
+            if self.to_html:
+                st.markdown(self._page_html(page, start, total_pages), unsafe_allow_html=True)
+            else:
+                for message in messages[start:start + self.page_size]:
+                    with st.chat_message("user" if message["role"] == "user" else "assistant"):
+                        st.write(message[self.content_key])
+
+    def _page_html(self, page: int, start: int, total_pages: int) -> str:
+        state = self.state
+        if page in state.pages:
+            return state.pages[page]
+        block = "".join(state.fragments[start:start + self.page_size])
+        if page < total_pages - 1:
+            # Full pages never change again
+            state.pages[page] = block
+        return block
@@ -0,0 +1,144 @@
+"""
+Capture EXPLAIN ANALYZE plans for the patients queries used by the
+dashboards and the SQL agent, and point out filters that still scan the table.
+
+Usage:
+    python explain_patients.py [output.json]
+"""
+import json
+import logging
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+from patients_db import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Fixed query set, one entry per access pattern schema_extensions.sql targets
+QUERIES = {
+    'lookup_by_mrn': (
+        "SELECT * FROM patients WHERE mrn = 'MRN000042'"
+    ),
+    'diagnosis_recent': (
+        "SELECT mrn, admission_date FROM patients "
+        "WHERE primary_diagnosis = 'Pneumonia' AND admission_date >= now() - interval '30 days'"
+    ),
+    'admission_range': (
+        "SELECT count(*) FROM patients "
+        "WHERE admission_date BETWEEN now() - interval '90 days' AND now() - interval '60 days'"
+    ),
+    'insurance_recent': (
+        "SELECT primary_diagnosis, count(*) FROM patients "
+        "WHERE insurance_provider = 'Medicare' AND admission_date >= now() - interval '7 days' "
+        "GROUP BY primary_diagnosis"
+    ),
+    'open_admissions': (
+        "SELECT mrn, room_number, primary_diagnosis FROM patients "
+        "WHERE discharge_date IS NULL ORDER BY admission_date DESC LIMIT 50"
+    ),
+    'open_room': (
+        "SELECT mrn, first_name, last_name FROM patients "
+        "WHERE discharge_date IS NULL AND room_number = '312'"
+    ),
+    'census_from_patients': (
+        "SELECT primary_diagnosis, insurance_provider, count(*) FILTER (WHERE discharge_date IS NULL) "
+        "FROM patients GROUP BY 1, 2"
+    ),
+    'census_from_summary': (
+        "SELECT primary_diagnosis, insurance_provider, open_admissions FROM patient_census"
+    ),
+}
+
+
+@dataclass
+class PlanReport:
+    """Summary of one EXPLAIN ANALYZE run"""
+    name: str
+    query: str
+    planning_ms: float
+    execution_ms: float
+    node_types: List[str] = field(default_factory=list)
+    indexes: List[str] = field(default_factory=list)
+    advice: List[str] = field(default_factory=list)
+    plan: Dict[str, Any] = field(default_factory=dict)
+
+
+def walk(node: Dict[str, Any]):
+    """Yield a plan node and all of its children"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(cur: Any, name: str, query: str) -> PlanReport:
+    """
+    Run EXPLAIN ANALYZE for one query
+    Args:
+        cur: Open cursor
+        name: Name of the query in the report
+        query: SQL to explain
+    Returns:
+        PlanReport for the query
+    """
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+    result = cur.fetchone()[0][0]
+    report = PlanReport(
+        name=name,
+        query=query,
+        planning_ms=result['Planning Time'],
+        execution_ms=result['Execution Time'],
+        plan=result['Plan']
+    )
+    for node in walk(result['Plan']):
+        report.node_types.append(node['Node Type'])
+        if 'Index Name' in node:
+            report.indexes.append(node['Index Name'])
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == 'patients' and 'Filter' in node:
+            report.advice.append(
+                f"Sequential scan of patients filtering on {node['Filter']} "
+                f"removed {node.get('Rows Removed by Filter', 0)} rows; consider an index on these columns"
+            )
+    return report
+
+
+def unused_indexes(cur: Any) -> List[str]:
+    """Indexes on patients that have never been scanned since statistics were reset"""
+    cur.execute(
+        "SELECT indexrelname FROM pg_stat_user_indexes "
+        "WHERE relname = 'patients' AND idx_scan = 0"
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def main(output_path: str = 'explain_patients.json') -> None:
+    reports = []
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            for name, query in QUERIES.items():
+                try:
+                    reports.append(explain(cur, name, query))
+                except Exception as e:
+                    logger.error(f"Failed to explain {name}: {str(e)}")
+                    conn.rollback()
+            unused = unused_indexes(cur)
+
+    print(f"{'query':<24}{'plan ms':>10}{'exec ms':>10}  indexes")
+    for report in reports:
+        print(f"{report.name:<24}{report.planning_ms:>10.2f}{report.execution_ms:>10.2f}  "
+              f"{', '.join(report.indexes) or '-'}")
+        for advice in report.advice:
+            print(f"    {advice}")
+    if unused:
+        print(f"Indexes never scanned: {', '.join(unused)}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'queries': [asdict(r) for r in reports], 'unused_indexes': unused}, f, indent=2)
+    print(f"Plans written to {output_path}")
+
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    configure_logging()
+    main(*sys.argv[1:2])
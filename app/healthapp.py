@@ -1,26 +1,26 @@
 import streamlit as st
-import pandas as pd
-from together import Together
 import os
+from intake_planner import INTAKE_FIELDS
+from telemetry import chat_completion
 # Define the questions to generate responses for
 
-client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+@st.cache_resource
+def get_client():
+    # Together API client, created once per server process instead of on every rerun
+    from together import Together
+    return Together(api_key=os.getenv("TOGETHER_API_KEY"))
 
-questions = [
-    "What is the patient's name?",
-    "What is the patient's age?",
-    "What is the patient's condition?",
-    "Can you tell me why you’re here today?"
-    "When did patient's symptoms start, and have they gotten worse?"
-    "How would you rate patient's pain on a scale from 1 to 10?"
-    "Where did patient feel the pain, and does it spread anywhere else?"
-    "Did patient feel any other symptoms like nausea, dizziness, or difficulty breathing?"
-    "Did you have a fever, chills, or a cough recently?"
-    "Is patient allergic to any medications or foods?"
-    "Does patient have any medical conditions, such as diabetes, asthma, or heart problems?"
-    "Is patient taking any medications right now?"
-    "Have patient recently been around anyone who’s sick or has similar symptoms?"
-]
+
+@st.cache_resource
+def start_logging():
+    # Queue-based logging, set up once per server process; LOG_FILE adds a rotating JSON file
+    from logging_setup import configure_logging
+    configure_logging()
+
+start_logging()
+
+# One question per intake field; shared with the planner in main.py
+questions = [intake_field.analysis_question for intake_field in INTAKE_FIELDS]
 
 # Function to process conversation and generate responses
 def generate_responses(conversation_text):
@@ -36,7 +36,9 @@ def generate_responses(conversation_text):
         ]
         
         # Call the model API for each question (replace with actual client code as needed)
-        response = client.chat.completions.create(
+        response = chat_completion(
+            get_client(),
+            "llm.analyze_conversation",
             model="meta-llama/Llama-3.2-3B-Instruct-Turbo",  # Replace with the actual model identifier
             messages=context,
             max_tokens=150,
@@ -57,6 +59,7 @@ def generate_responses(conversation_text):
             "Answer": answer
         })
     
+    import pandas as pd
     return pd.DataFrame(results)  # Return the results as a DataFrame for easy display in Streamlit
 
 # Streamlit app layout
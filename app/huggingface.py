@@ -3,6 +3,9 @@ from transformers import AutoModelForCausalLM, AutoTokenizer
 from typing import List, Optional
 import logging
 
+from profiling import torch_profile
+from telemetry import span
+
 class LLMInference:
     def __init__(
         self,
@@ -87,7 +90,8 @@ class LLMInference:
             inputs = self.tokenizer(formatted_prompt, return_tensors="pt", padding=True)
             inputs = inputs.to(self.device)
 
-            with torch.no_grad():
+            with span("llm.generate", model=self.model.config.name_or_path) as generate_span, torch.no_grad(), \
+                    torch_profile("llm.generate"):
                 outputs = self.model.generate(
                     **inputs,
                     max_length=max_length,
@@ -99,6 +103,9 @@ class LLMInference:
                     eos_token_id=self.tokenizer.eos_token_id,
                     do_sample=True
                 )
+                prompt_tokens = inputs["input_ids"].shape[1]
+                generate_span.set(prompt_tokens=int(prompt_tokens),
+                                  completion_tokens=int((outputs.shape[1] - prompt_tokens) * outputs.shape[0]))
 
             responses = []
             for output in outputs:
@@ -143,7 +150,9 @@ class LLMInference:
 # Example usage:
 if __name__ == "__main__":
     # Configure logging
-    logging.basicConfig(level=logging.INFO)
+    from logging_setup import configure_logging
+
+    configure_logging()
     
     # Initialize the model
     llm = LLMInference(low_memory=True)
@@ -0,0 +1,128 @@
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(APP_DIR, "importtime.json")
+
+# Scripts started directly, by `streamlit run` or `python`
+ENTRY_POINTS = ["main.py", "healthapp.py", "main_splitscreen.py", "mindsdb.py"]
+
+
+def top_level_imports(path: str) -> List[str]:
+    """
+    Import statements that run when a script starts, i.e. those outside functions and __main__ blocks
+    Args:
+        path: Python source file
+    Returns:
+        The statements as source text
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    return [ast.get_source_segment(source, node) for node in ast.parse(source).body
+            if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def _probe(statements: List[str]) -> str:
+    # Run each import on its own so a missing optional package does not hide the cost of the rest
+    lines = ["missing = []"]
+    for statement in statements:
+        lines += ["try:", f"    {statement}", "except ImportError as e:", "    missing.append(e.name or str(e))"]
+    lines.append("missing = sorted(set(missing))")
+    lines.append("import json, sys; sys.stdout.write(json.dumps(missing))")
+    return "\n".join(lines)
+
+
+def measure(statements: List[str], cwd: str = APP_DIR) -> Dict[str, object]:
+    """
+    Import `statements` in a fresh interpreter with -X importtime
+    Args:
+        statements: Import statements
+        cwd: Directory the imports are resolved from
+    Returns:
+        Total import time, wall time, the most expensive top-level imports and missing packages
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", _probe(statements)],
+                             cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    modules: Dict[str, int] = {}
+    for line in process.stderr.splitlines():
+        # "import time:       self [us] |    cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not name.startswith("  "):
+            # Only modules imported directly by the probe, their children are in the cumulative time
+            modules[name.strip()] = int(cumulative)
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {
+        "import_ms": round(sum(modules.values()) / 1000, 1),
+        "wall_ms": round(wall * 1000, 1),
+        "top_ms": {name: round(us / 1000, 1) for name, us in top},
+        "missing": json.loads(process.stdout or "[]"),
+    }
+
+
+def benchmark(entry_points: List[str] = ENTRY_POINTS, runs: int = 5, root: str = APP_DIR) -> Dict[str, Dict]:
+    """
+    Median of `runs` cold imports for each entry point's top-level imports
+    Args:
+        entry_points: Scripts to measure, relative to root
+        runs: Fresh interpreters per script
+        root: Directory holding the scripts
+    Returns:
+        Results per script
+    """
+    results = {}
+    for script in entry_points:
+        statements = top_level_imports(os.path.join(root, script))
+        samples = [measure(statements, cwd=root) for _ in range(runs)]
+        samples.sort(key=lambda sample: sample["import_ms"])
+        median = samples[len(samples) // 2]
+        results[script] = {"imports": statements, **median}
+    return results
+
+
+def compare(results: Dict[str, Dict], previous: Optional[Dict[str, Dict]]) -> None:
+    for script, result in results.items():
+        line = f"{script:22} {result['import_ms']:8.1f} ms imports {result['wall_ms']:8.1f} ms wall"
+        if previous and script in previous:
+            line += f"   (was {previous[script]['import_ms']:.1f} ms / {previous[script]['wall_ms']:.1f} ms)"
+        if result["missing"]:
+            line += f"   missing: {', '.join(result['missing'])}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the start-up imports of the app's entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per script")
+    parser.add_argument("--root", default=APP_DIR, help="Directory holding the scripts, e.g. an older checkout")
+    parser.add_argument("--record", metavar="LABEL", help=f"Append the results to {os.path.basename(RESULTS_FILE)}")
+    args = parser.parse_args()
+
+    history = []
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE, encoding="utf-8") as f:
+            history = json.load(f)
+    results = benchmark(runs=args.runs, root=args.root)
+    compare(results, history[-1]["results"] if history else None)
+
+    if args.record:
+        # Packages absent here had no import cost measured, say so where the run is named
+        missing = sorted({name for result in results.values() for name in result["missing"]})
+        history.append({
+            "label": f"{args.record} (not measured: {', '.join(missing)})" if missing else args.record,
+            "date": time.strftime("%Y-%m-%d"),
+            "python": platform.python_version(),
+            "results": results,
+        })
+        with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+            f.write("\n")
@@ -1,13 +1,50 @@
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from profiling import profile_request
+from telemetry import chat_completion, span
+
+logger = logging.getLogger(__name__)
+
+Backend = Callable[[str], str]
+
+ROLE_ALIASES = {
+    "patient": "Patient",
+    "doctor": "Doctor",
+    "clinician": "Doctor",
+    "physician": "Doctor",
+    "nurse": "Doctor",
+    "admin": "Admin",
+    "administrator": "Admin",
+}
+
+
+class DeadlineExceeded(Exception):
+    """Raised for a request that could not start before its deadline"""
+
+
+def normalize_role(role: str) -> Optional[str]:
+    """
+    Map a role label such as "👩‍⚕️ Doctor" or "doctor" to Patient, Doctor or Admin
+    Args:
+        role: Role label from the UI or a caller
+    Returns:
+        Canonical role name, or None if the label is not recognized
+    """
+    words = re.findall(r"[a-z]+", (role or "").lower())
+    for word in words:
+        if word in ROLE_ALIASES:
+            return ROLE_ALIASES[word]
+    return None
 
-def get_response(user_input, role):
-    if role == "Patient":
-        return get_response_patient(user_input)
-    elif role == "Doctor":
-        return get_response_doctor(user_input)
-    elif role == "Admin":
-        return get_response_admin(user_input)
-    else:
-        return "I'm sorry, I don't understand your role. Please try again."
 
 def get_response_admin(user_input):
     return "I'm here to assist you with administrative tasks. How can I help?"
@@ -17,3 +54,288 @@ def get_response_doctor(user_input):
 
 def get_response_patient(user_input):
     return "I'm here to assist you with your medical queries. How can I help?"
+
+
+class RemoteLLMBackend:
+    """Chat model behind an OpenAI-compatible API (Together by default, or Featherless)"""
+
+    def __init__(
+        self,
+        model: str = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
+        system_prompt: str = "You are a helpful medical assistant.",
+        base_url: str = "https://api.together.xyz/v1",
+        api_key_env: str = "TOGETHER_API_KEY",
+        max_tokens: int = 300
+    ):
+        from openai import OpenAI
+        self.client = OpenAI(base_url=base_url, api_key=os.getenv(api_key_env))
+        self.model = model
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+
+    def __call__(self, user_input: str) -> str:
+        response = chat_completion(
+            self.client,
+            "llm.chat",
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_input},
+            ],
+            max_tokens=self.max_tokens,
+            temperature=0.7
+        )
+        return response.choices[0].message.content.strip()
+
+
+class LocalLLMBackend:
+    """Model loaded in-process with LLMInference"""
+
+    def __init__(self, model_name: str = "TinyLlama/TinyLlama-1.1B-Chat-v1.0", max_length: int = 512):
+        from huggingface import LLMInference
+        self.llm = LLMInference(model_name=model_name)
+        self.max_length = max_length
+        # One generate call at a time per loaded model
+        self.lock = threading.Lock()
+
+    def __call__(self, user_input: str) -> str:
+        with self.lock:
+            return self.llm.generate_response(user_input, max_length=self.max_length)[0].strip()
+
+
+class SQLAgentBackend:
+    """Questions about patients, answered by direct lookups or the MindsDB SQL agent"""
+
+    def __init__(self, direct_lookups: bool = True):
+        import mindsdb_sdk
+        from patients_db import PATIENTS_CONNECTION_ARGS
+        from psql_agent import AgentRegistry
+        self.registry = AgentRegistry(mindsdb_sdk.connect())
+        self.registry.start_gc()
+        ask_agent = lambda question: self.registry.ask(PATIENTS_CONNECTION_ARGS, question)
+        if direct_lookups:
+            from patient_lookup import QueryRouter
+            router = QueryRouter(fallback=ask_agent)
+            self.answer = lambda question: router.ask(question).answer
+        else:
+            self.answer = ask_agent
+
+    def __call__(self, user_input: str) -> str:
+        return self.answer(user_input)
+
+
+class RetrievalBackend:
+    """Answers grounded in the documents of a directory, indexed once with llama_index"""
+
+    def __init__(self, directory: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")):
+        from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
+        documents = SimpleDirectoryReader(directory).load_data()
+        self.query_engine = VectorStoreIndex.from_documents(documents).as_query_engine()
+
+    def __call__(self, user_input: str) -> str:
+        with span("retrieval.query"):
+            return str(self.query_engine.query(user_input))
+
+
+@dataclass
+class RoleRoute:
+    """Where a role's requests go and how they are scheduled"""
+    backend_factory: Callable[[], Backend]
+    fallback: Backend
+    priority: int
+    max_concurrency: int
+    deadline: float
+    backend: Optional[Backend] = None
+
+
+@dataclass(order=True)
+class _Request:
+    priority: int
+    deadline: float
+    seq: int
+    role: str = field(compare=False)
+    user_input: str = field(compare=False)
+    future: Future = field(compare=False)
+    enqueued: float = field(compare=False, default_factory=time.monotonic)
+
+
+class RoleRouter:
+    """
+    Send each role's requests to its backend with quotas, priorities and deadlines.
+
+    Every role has its own queue, ordered by deadline. A free worker takes the
+    request with the best (priority, deadline) among roles that are under
+    their concurrency quota. Lower priority roles have quotas below the worker
+    count, so clinician requests always find a free worker even while admin
+    batches are running. A request that is still queued at its deadline fails
+    without being run.
+    """
+    def __init__(self, routes: Dict[str, RoleRoute], workers: int = 6):
+        """
+        Args:
+            routes: Route per canonical role name
+            workers: Requests running at the same time across all roles
+        """
+        self.routes = routes
+        self.workers = workers
+        self._queues: Dict[str, List[_Request]] = {role: [] for role in routes}
+        self._active: Dict[str, int] = {role: 0 for role in routes}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._backend_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"role-router-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, user_input: str, role: str, deadline: Optional[float] = None,
+               priority: Optional[int] = None) -> Future:
+        """
+        Queue a request
+        Args:
+            user_input: The user's message
+            role: Canonical role name
+            deadline: Seconds from now the request must start by, defaults to the role's
+            priority: Overrides the role's priority, lower runs first
+        Returns:
+            Future with the response text
+        """
+        route = self.routes[role]
+        request = _Request(
+            priority=route.priority if priority is None else priority,
+            deadline=time.monotonic() + (route.deadline if deadline is None else deadline),
+            seq=next(self._seq),
+            role=role,
+            user_input=user_input,
+            future=Future()
+        )
+        with self._condition:
+            heapq.heappush(self._queues[role], request)
+            self._condition.notify()
+        return request.future
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._condition:
+            return {role: len(queue) for role, queue in self._queues.items()}
+
+    def _next_request(self) -> Optional[_Request]:
+        """Best runnable request, dropping cancelled and expired ones; called with the condition held"""
+        now = time.monotonic()
+        best = None
+        for role, queue in self._queues.items():
+            while queue and (queue[0].future.cancelled() or queue[0].deadline < now):
+                dropped = heapq.heappop(queue)
+                # Fails for a future the caller cancelled, which must not be resolved again
+                if dropped.future.set_running_or_notify_cancel():
+                    dropped.future.set_exception(DeadlineExceeded(f"{role} request waited past its deadline"))
+            if queue and self._active[role] < self.routes[role].max_concurrency:
+                if best is None or queue[0] < best:
+                    best = queue[0]
+        if best is not None:
+            heapq.heappop(self._queues[best.role])
+            self._active[best.role] += 1
+        return best
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                request = self._next_request()
+                while request is None:
+                    self._condition.wait(timeout=1.0)
+                    request = self._next_request()
+            try:
+                if request.future.set_running_or_notify_cancel():
+                    with span("role.request", role=request.role, priority=request.priority,
+                              queue_wait=time.monotonic() - request.enqueued), \
+                            profile_request(f"role.{request.role}"):
+                        request.future.set_result(self._backend(request.role)(request.user_input))
+            except Exception as e:
+                logger.error(f"{request.role} backend failed: {str(e)}")
+                request.future.set_result(self.routes[request.role].fallback(request.user_input))
+            finally:
+                with self._condition:
+                    self._active[request.role] -= 1
+                    # A slot for this role is free again
+                    self._condition.notify_all()
+
+    def _backend(self, role: str) -> Backend:
+        route = self.routes[role]
+        if route.backend is None:
+            with self._backend_lock:
+                if route.backend is None:
+                    try:
+                        route.backend = route.backend_factory()
+                    except Exception as e:
+                        logger.error(f"Could not start the {role} backend, using canned replies: {str(e)}")
+                        route.backend = route.fallback
+        return route.backend
+
+
+def default_routes() -> Dict[str, RoleRoute]:
+    """
+    Doctors: patient database lookups and SQL agent, first in line.
+    Patients: local model if LOCAL_MODEL_NAME is set, otherwise the remote provider.
+    Admins: SQL agent for batch work, behind everyone else.
+    """
+    local_model = os.getenv("LOCAL_MODEL_NAME")
+    return {
+        "Doctor": RoleRoute(SQLAgentBackend, get_response_doctor, priority=0, max_concurrency=6, deadline=20.0),
+        "Patient": RoleRoute(
+            (lambda: LocalLLMBackend(local_model)) if local_model else RemoteLLMBackend,
+            get_response_patient, priority=1, max_concurrency=3, deadline=30.0
+        ),
+        "Admin": RoleRoute(lambda: SQLAgentBackend(direct_lookups=False), get_response_admin,
+                           priority=2, max_concurrency=2, deadline=300.0),
+    }
+
+
+_router: Optional[RoleRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> RoleRouter:
+    """Process-wide router, started on first use"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = RoleRouter(default_routes())
+        return _router
+
+
+def get_response(user_input, role):
+    canonical = normalize_role(role)
+    if canonical is None:
+        return "I'm sorry, I don't understand your role. Please try again."
+    route = get_router().routes[canonical]
+    try:
+        return get_router().submit(user_input, canonical).result(timeout=route.deadline + 60)
+    except Exception as e:
+        logger.error(f"No response for {canonical}: {str(e)}")
+        return route.fallback(user_input)
+
+
+if __name__ == "__main__":
+    import random
+    import statistics
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    def simulated(seconds):
+        return lambda user_input: (time.sleep(seconds * random.uniform(0.8, 1.2)), "ok")[1]
+
+    router = RoleRouter({
+        "Doctor": RoleRoute(lambda: simulated(0.1), get_response_doctor, 0, 6, 20.0),
+        "Patient": RoleRoute(lambda: simulated(0.2), get_response_patient, 1, 3, 30.0),
+        "Admin": RoleRoute(lambda: simulated(0.5), get_response_admin, 2, 2, 300.0),
+    })
+    batch = [router.submit(f"report {i}", "Admin") for i in range(40)]
+    latencies = []
+    for i in range(20):
+        start = time.perf_counter()
+        router.submit(f"question {i}", "Doctor").result()
+        latencies.append(time.perf_counter() - start)
+    print(f"Doctor latency with {len(batch)} admin jobs queued: "
+          f"median {statistics.median(latencies) * 1000:.0f} ms, max {max(latencies) * 1000:.0f} ms")
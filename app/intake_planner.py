@@ -0,0 +1,284 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+YES_PATTERN = re.compile(r"\b(yes|yeah|yep|i do|i did|i have|i am)\b|有|係|對", re.IGNORECASE)
+NO_PATTERN = re.compile(r"\b(no|nope|none|nothing|not really|never|i don't|i do not|i haven't|i'm not)\b|冇|沒有|唔係|無",
+                        re.IGNORECASE)
+UNSURE_PATTERN = re.compile(r"\b(not sure|don't know|dont know|no idea|maybe|unsure|can't remember)\b|唔知|唔記得|可能",
+                            re.IGNORECASE)
+# Not \b: CJK characters are word characters, so "45歲" has no boundary after the digits
+NUMBER_PATTERN = re.compile(r"(?<!\d)(\d{1,3})(?!\d)")
+RED_FLAG_PATTERN = re.compile(
+    r"chest pain|difficulty breathing|shortness of breath|can't breathe|faint|unconscious|seizure|"
+    r"bleeding|(?:coughing|coughed|cough|vomiting|vomited|throwing) up blood|blood in|bloody|suicid|"
+    r"numb|slurred|worst headache|胸口痛|呼吸困難|暈|出血|抽筋",
+    re.IGNORECASE
+)
+NEGATION_PATTERN = re.compile(r"\b(no|not|never|denies|denied|deny|without|none)\b|n't\b|冇|沒有|沒|無|唔", re.IGNORECASE)
+# A negation only reaches a warning sign in the same clause, e.g. not across "but"
+CLAUSE_BREAK_PATTERN = re.compile(r"[.;!?。；！？]|\b(but|however|although|though|except)\b", re.IGNORECASE)
+
+
+def mentions_red_flag(text: str, window: int = 5) -> bool:
+    """
+    Whether the text mentions a warning sign that is not negated
+    Args:
+        text: Patient's reply, in English or Cantonese
+        window: Words before a warning sign searched for a negation such as "no" or "denies"
+    Returns:
+        True if any warning sign is mentioned without a negation before it
+    """
+    for match in RED_FLAG_PATTERN.finditer(text):
+        before = CLAUSE_BREAK_PATTERN.split(text[:match.start()])[-1] or ""
+        if not NEGATION_PATTERN.search(" ".join(before.split()[-window:])):
+            return True
+    return False
+
+
+@dataclass
+class IntakeField:
+    """One slot of the intake form"""
+    key: str
+    question: str
+    analysis_question: str
+    kind: str = "text"
+    translations: Dict[str, str] = field(default_factory=dict)
+
+    def question_in(self, language: str) -> Optional[str]:
+        """Pre-translated question, None if the table has no entry for the language"""
+        if language == "en":
+            return self.question
+        return self.translations.get(language)
+
+
+# The 13 fields collected by main.py and analysed by healthapp.py, in asking order.
+# Keys match the JSON keys of the extraction prompt in main.py.
+INTAKE_FIELDS: List[IntakeField] = [
+    IntakeField("name", "What is your name?", "What is the patient's name?", "name",
+                {"yue": "請問你叫咩名？"}),
+    IntakeField("age", "How old are you?", "What is the patient's age?", "age",
+                {"yue": "請問你今年幾多歲？"}),
+    IntakeField("condition", "What condition or health problem are you dealing with?",
+                "What is the patient's condition?", "text",
+                {"yue": "你而家有咩健康問題或者病？"}),
+    IntakeField("reason_for_visit", "Can you tell me why you're here today?",
+                "Can you tell me why you’re here today?", "text",
+                {"yue": "可唔可以講下你今日點解嚟睇醫生？"}),
+    IntakeField("symptoms", "When did your symptoms start, and have they gotten worse?",
+                "When did patient's symptoms start, and have they gotten worse?", "text",
+                {"yue": "你啲病徵幾時開始，有冇變得嚴重咗？"}),
+    IntakeField("pain_level", "How would you rate your pain on a scale from 1 to 10?",
+                "How would you rate patient's pain on a scale from 1 to 10?", "scale",
+                {"yue": "如果由1到10分，你會俾你嘅痛幾多分？"}),
+    IntakeField("pain_location", "Where do you feel the pain, and does it spread anywhere else?",
+                "Where did patient feel the pain, and does it spread anywhere else?", "text",
+                {"yue": "你邊度痛，會唔會痛到其他地方？"}),
+    IntakeField("additional_symptoms",
+                "Do you have any other symptoms like nausea, dizziness, or difficulty breathing?",
+                "Did patient feel any other symptoms like nausea, dizziness, or difficulty breathing?", "text",
+                {"yue": "你有冇其他病徵，例如作嘔、頭暈或者呼吸困難？"}),
+    IntakeField("fever_or_cough", "Have you had a fever, chills, or a cough recently?",
+                "Did you have a fever, chills, or a cough recently?", "yes_no",
+                {"yue": "你最近有冇發燒、發冷或者咳？"}),
+    IntakeField("allergies", "Are you allergic to any medications or foods?",
+                "Is patient allergic to any medications or foods?", "text",
+                {"yue": "你對任何藥物或者食物有冇敏感？"}),
+    IntakeField("medical_conditions",
+                "Do you have any medical conditions, such as diabetes, asthma, or heart problems?",
+                "Does patient have any medical conditions, such as diabetes, asthma, or heart problems?", "text",
+                {"yue": "你有冇其他長期病，例如糖尿病、哮喘或者心臟病？"}),
+    IntakeField("current_medications", "Are you taking any medications right now?",
+                "Is patient taking any medications right now?", "text",
+                {"yue": "你而家有冇食緊任何藥？"}),
+    IntakeField("contact_with_sick_individuals",
+                "Have you recently been around anyone who's sick or has similar symptoms?",
+                "Have patient recently been around anyone who’s sick or has similar symptoms?", "yes_no",
+                {"yue": "你最近有冇接觸過生病或者有類似病徵嘅人？"}),
+]
+
+CLOSING = {
+    "en": "Thank you, I have everything I need. Press End Conversation when you are ready.",
+    "yue": "多謝你，我已經有晒需要嘅資料。準備好嘅話請撳「End Conversation」。",
+}
+
+
+@dataclass
+class IntakeState:
+    """Progress of one patient's intake, kept in st.session_state"""
+    values: Dict[str, str] = field(default_factory=dict)
+    pending: Optional[str] = None
+    clarifications: Dict[str, int] = field(default_factory=dict)
+    follow_up_asked: bool = False
+    model_calls: int = 0
+    template_turns: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return len(self.values) == len(INTAKE_FIELDS)
+
+
+@dataclass
+class PlannerTurn:
+    """What to say next"""
+    question: str
+    english: str
+    field: Optional[str]
+    from_model: bool = False
+    done: bool = False
+
+
+def parse_answer(intake_field: IntakeField, answer: str) -> Optional[str]:
+    """
+    Normalize an answer for a field, None if it is ambiguous
+    Args:
+        intake_field: Field the answer is for
+        answer: Patient's reply, in English or Cantonese
+    Returns:
+        The value to store
+    """
+    text = answer.strip()
+    if not text or UNSURE_PATTERN.search(text):
+        return None
+    if intake_field.kind == "age":
+        match = NUMBER_PATTERN.search(text)
+        return match.group(1) if match and 0 < int(match.group(1)) < 125 else None
+    if intake_field.kind == "scale":
+        match = NUMBER_PATTERN.search(text)
+        return match.group(1) if match and 0 <= int(match.group(1)) <= 10 else None
+    if intake_field.kind == "yes_no":
+        # 沒有 contains 有, so look for a yes only outside the negations
+        no, yes = NO_PATTERN.search(text), YES_PATTERN.search(NO_PATTERN.sub(" ", text))
+        if no and not yes:
+            return "No"
+        if yes and not no:
+            # Keep the details, e.g. "yes, a cough since Monday"
+            return text if len(text.split()) > 2 else "Yes"
+        return None
+    if intake_field.kind == "name":
+        name = re.sub(r"^(my name is|i am|i'm|it's|call me|我叫|我係)\s*", "", text, flags=re.IGNORECASE)
+        return name.strip(" .") or None
+    return text
+
+
+class IntakePlanner:
+    """
+    Walk the patient through the intake fields without asking the model.
+
+    Questions come from a pre-translated table and answers are parsed with
+    simple rules, so ordinary turns take milliseconds. The model is only
+    asked to rephrase a question when an answer was ambiguous, and for a
+    single follow-up when an answer mentions a warning sign.
+    """
+    def __init__(
+        self,
+        fields: List[IntakeField] = INTAKE_FIELDS,
+        llm: Optional[Callable[[str], str]] = None,
+        max_clarifications: int = 1
+    ):
+        """
+        Args:
+            fields: Fields to fill, in asking order
+            llm: Takes a prompt and returns the model's reply; None never calls a model
+            max_clarifications: Times a field is re-asked before the raw answer is kept
+        """
+        self.fields = fields
+        self.by_key = {f.key: f for f in fields}
+        self.llm = llm
+        self.max_clarifications = max_clarifications
+
+    def next_turn(self, state: IntakeState, language: str = "en") -> PlannerTurn:
+        """Question for the first empty field, or the closing message once every field is filled"""
+        for intake_field in self.fields:
+            if intake_field.key not in state.values:
+                state.pending = intake_field.key
+                state.template_turns += 1
+                english = intake_field.question
+                return PlannerTurn(intake_field.question_in(language) or english, english, intake_field.key)
+        state.pending = None
+        return PlannerTurn(CLOSING.get(language, CLOSING["en"]), CLOSING["en"], None, done=True)
+
+    def answer(self, state: IntakeState, answer: str, english_answer: Optional[str] = None,
+               language: str = "en") -> PlannerTurn:
+        """
+        Record the reply to the pending field and decide what to ask next
+        Args:
+            state: Intake progress
+            answer: Reply as typed
+            english_answer: English translation of the reply, if it was not in English
+            language: Language to ask the next question in
+        Returns:
+            The next turn; from_model is True when the model wrote it and it is in English
+        """
+        english_answer = english_answer or answer
+        intake_field = self.by_key.get(state.pending)
+        if intake_field is None:
+            return self.next_turn(state, language)
+
+        value = parse_answer(intake_field, answer)
+        if value is None and english_answer != answer:
+            value = parse_answer(intake_field, english_answer)
+        if value is None:
+            attempts = state.clarifications.get(intake_field.key, 0)
+            if attempts < self.max_clarifications:
+                state.clarifications[intake_field.key] = attempts + 1
+                clarification = self._ask_model(state, (
+                    "You are a healthcare assistant collecting intake information. "
+                    f"You asked: \"{intake_field.question}\" and the patient replied: \"{english_answer}\". "
+                    "The reply is unclear. Ask one short, friendly question to clarify it. "
+                    "Reply with the question only."
+                ))
+                if clarification:
+                    return PlannerTurn(clarification, clarification, intake_field.key, from_model=True)
+                english = f"Sorry, I didn't quite catch that. {intake_field.question}"
+                return PlannerTurn(english, english, intake_field.key)
+            value = english_answer.strip() or "Unknown"
+        state.values[intake_field.key] = value
+
+        if not state.follow_up_asked and (mentions_red_flag(answer) or mentions_red_flag(english_answer or "")):
+            state.follow_up_asked = True
+            follow_up = self._ask_model(state, (
+                "You are a healthcare assistant collecting intake information. "
+                f"You asked: \"{intake_field.question}\" and the patient replied: \"{english_answer}\". "
+                "The reply mentions a possible warning sign. Ask one short follow-up question about it. "
+                "Reply with the question only."
+            ))
+            if follow_up:
+                # The follow-up answer is kept in the conversation, not in a field
+                state.pending = None
+                return PlannerTurn(follow_up, follow_up, None, from_model=True)
+        return self.next_turn(state, language)
+
+    def _ask_model(self, state: IntakeState, prompt: str) -> Optional[str]:
+        if self.llm is None:
+            return None
+        state.model_calls += 1
+        try:
+            return self.llm(prompt).strip() or None
+        except Exception as e:
+            logger.error(f"Failed to generate intake question: {str(e)}")
+            return None
+
+
+if __name__ == "__main__":
+    import time
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    planner = IntakePlanner(llm=lambda prompt: "Could you tell me a little more about that?")
+    state = IntakeState()
+    replies = ["My name is Chan Tai Man", "not sure", "45", "back pain", "to get my back checked",
+               "three days ago, getting worse", "7", "lower back, down my left leg", "no",
+               "no", "penicillin", "diabetes", "metformin", "no"]
+    turn = planner.next_turn(state)
+    start = time.perf_counter()
+    for reply in replies:
+        print(f"Q: {turn.question}\nA: {reply}")
+        turn = planner.answer(state, reply)
+    print(f"Q: {turn.question}")
+    print(f"{len(replies)} turns, {state.model_calls} model calls, {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(state.values)
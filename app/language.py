@@ -0,0 +1,222 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from telemetry import chat_completion, telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo"
+
+# Names shown in the language selectbox, mapped to language codes
+LANGUAGES = {"English": "en", "Cantonese": "yue"}
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "yue": "Cantonese (colloquial Hong Kong Cantonese in Traditional Chinese characters)",
+}
+
+CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+SENTENCE_PATTERN = re.compile(r"[^.!?。！？\n]+[.!?。！？]*\s*|\n")
+
+
+def detect_language(text: str, default: str = "en") -> str:
+    """
+    Guess the language of a message from its script
+    Args:
+        text: Message text
+        default: Code returned for empty or ambiguous text
+    Returns:
+        "yue" when most letters are Chinese characters, otherwise "en"
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return default
+    cjk = sum(1 for c in letters if CJK_PATTERN.match(c))
+    return "yue" if cjk / len(letters) >= 0.3 else "en"
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping punctuation and spacing so joining restores it"""
+    return SENTENCE_PATTERN.findall(text) or [text]
+
+
+def native_models_from_env() -> Dict[str, str]:
+    """
+    Models that handle a language directly, from NATIVE_LANGUAGE_MODELS,
+    e.g. "yue=hon9kon9ize/CantoneseLLMChat-v1.0"; English always uses DEFAULT_MODEL
+    """
+    models = {"en": DEFAULT_MODEL}
+    for item in os.getenv("NATIVE_LANGUAGE_MODELS", "").split(","):
+        if "=" in item:
+            code, model = item.split("=", 1)
+            models[code.strip()] = model.strip()
+    return models
+
+
+class SegmentCache:
+    """Thread-safe LRU cache of translated sentences, shared by every session in the process"""
+
+    def __init__(self, max_items: int = 20000):
+        self.max_items = max_items
+        self.items: "OrderedDict[tuple[str, str, str], str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source: str, target: str, text: str) -> Optional[str]:
+        key = (source, target, text.strip())
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                telemetry.metrics.inc("cache_lookups_total", help="Cache lookups by result",
+                                       span="translation.segment", result="hit")
+                return self.items[key]
+            self.misses += 1
+            telemetry.metrics.inc("cache_lookups_total", help="Cache lookups by result",
+                                   span="translation.segment", result="miss")
+            return None
+
+    def put(self, source: str, target: str, text: str, translation: str) -> None:
+        with self.lock:
+            self.items[(source, target, text.strip())] = translation
+            self.items.move_to_end((source, target, text.strip()))
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+
+class TogetherTranslator:
+    """Translate with a chat model on the Together API"""
+
+    def __init__(self, client, model: str = DEFAULT_MODEL):
+        self.client = client
+        self.model = model
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        response = chat_completion(
+            self.client,
+            "llm.translate",
+            model=self.model,
+            messages=[
+                {"role": "system", "content": (
+                    f"Translate the user's text from {LANGUAGE_NAMES.get(source, source)} to "
+                    f"{LANGUAGE_NAMES.get(target, target)}. Reply with the translation only."
+                )},
+                {"role": "user", "content": text},
+            ],
+            max_tokens=300,
+            temperature=0.1,
+            stream=False
+        )
+        return response.choices[0].message.content.strip()
+
+
+@dataclass
+class LanguageRoute:
+    """How to serve a conversation in one language"""
+    language: str
+    model: str
+    translate: bool
+
+
+class LanguagePipeline:
+    """
+    Serve a conversation in the patient's language at close to English latency.
+
+    A language with a native model configured goes straight to that model.
+    Otherwise messages are translated sentence by sentence: sentences already
+    seen by any session come from the shared cache, and the rest are
+    translated concurrently, so a reply costs one round trip rather than one
+    per sentence. Replies can be translated in the background while the page
+    renders.
+    """
+    def __init__(
+        self,
+        translator,
+        cache: Optional[SegmentCache] = None,
+        native_models: Optional[Dict[str, str]] = None,
+        max_workers: int = 8
+    ):
+        """
+        Args:
+            translator: Object with translate(text, source, target) -> str
+            cache: Sentence cache, shared across sessions
+            native_models: Language code to model that handles it directly
+            max_workers: Sentences translated at the same time
+        """
+        self.translator = translator
+        self.cache = cache or SegmentCache()
+        self.native_models = native_models if native_models is not None else native_models_from_env()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+        # Separate pool so a background reply never waits on its own sentence workers
+        self.background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="translate-reply")
+
+    def route(self, language: str) -> LanguageRoute:
+        """Native model for the language if one is configured, else the English model with translation"""
+        if language in self.native_models:
+            return LanguageRoute(language, self.native_models[language], translate=False)
+        return LanguageRoute(language, self.native_models.get("en", DEFAULT_MODEL), translate=True)
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        """Translate text, reusing cached sentences; untranslatable sentences are kept as they are"""
+        if source == target or not text.strip():
+            return text
+        sentences = split_sentences(text)
+        translated: Dict[str, str] = {}
+        pending: Dict[str, Future] = {}
+        for sentence in sentences:
+            if not sentence.strip() or sentence in translated or sentence in pending:
+                continue
+            cached = self.cache.get(source, target, sentence)
+            if cached is not None:
+                translated[sentence] = cached
+            else:
+                pending[sentence] = self.executor.submit(self.translator.translate, sentence.strip(), source, target)
+        for sentence, future in pending.items():
+            try:
+                translated[sentence] = future.result()
+                self.cache.put(source, target, sentence, translated[sentence])
+            except Exception as e:
+                logger.error(f"Failed to translate segment: {str(e)}")
+                translated[sentence] = sentence.strip()
+        parts = []
+        for sentence in sentences:
+            if not sentence.strip():
+                parts.append(sentence)
+                continue
+            trailing = sentence[len(sentence.rstrip()):]
+            if target == "yue":
+                # Chinese text is not separated by spaces
+                trailing = trailing.replace(" ", "")
+            parts.append(translated[sentence].strip() + trailing)
+        return "".join(parts)
+
+    def translate_async(self, text: str, source: str, target: str) -> Future:
+        """Start translating text and return a future for the result"""
+        return self.background.submit(self.translate, text, source, target)
+
+
+if __name__ == "__main__":
+    import time
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    class SlowTranslator:
+        def translate(self, text, source, target):
+            time.sleep(0.2)
+            return f"[{target}] {text}"
+
+    pipeline = LanguagePipeline(SlowTranslator(), native_models={"en": DEFAULT_MODEL})
+    question = "Thank you. How long have you had the pain? Does it spread anywhere?"
+    for attempt in ("cold", "warm"):
+        start = time.perf_counter()
+        result = pipeline.translate(question, "en", "yue")
+        print(f"{attempt}: {(time.perf_counter() - start) * 1000:.0f} ms -> {result}")
+    print(f"detect: {detect_language('我個頭好痛，痛咗兩日')} / {detect_language('My head hurts')}")
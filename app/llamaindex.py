@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv("../.env")
 from llama_parse import LlamaParse
 from llama_index.core import SimpleDirectoryReader
+from telemetry import span
 
 
 def parse_file(file_path):
@@ -36,7 +37,8 @@ def query_document(file_path, query):
     query_engine = index.as_query_engine()
 
     # query the engine
-    response = query_engine.query(query)
+    with span("retrieval.query", file=file_path):
+        response = query_engine.query(query)
     return response
 
 query = "What can you do in the Bay of Fundy?"
@@ -0,0 +1,455 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from intake_planner import INTAKE_FIELDS, IntakePlanner, IntakeState
+from language import DEFAULT_MODEL, LanguagePipeline, SegmentCache, TogetherTranslator
+from telemetry import chat_completion
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "dataset", "transcripts.json")
+PATIENT_LINE = re.compile(r"^P:\s*(.+)$", re.MULTILINE)
+SENTENCE = re.compile(r"[^.!?]+[.!?]")
+
+
+class FakeLLMServer:
+    """
+    OpenAI-compatible /v1/chat/completions served on localhost, for load tests without network access.
+
+    Every request waits `latency` seconds (with jitter) before its first token,
+    then one token per 1/`tokens_per_second`. At most `concurrency` requests
+    are served at once and the rest queue, like a provider at its rate limit.
+    Translation requests echo the text back so the app's pipeline still works.
+    """
+    def __init__(
+        self,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        tokens_per_second: float = 80.0,
+        completion_tokens: int = 40,
+        concurrency: int = 32,
+        error_rate: float = 0.0,
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: Seconds before the first token
+            jitter: Random extra latency, up to this many seconds
+            tokens_per_second: Generation speed of one request
+            completion_tokens: Tokens per reply, capped by the request's max_tokens
+            concurrency: Requests generated at the same time, the rest wait
+            error_rate: Fraction of requests answered with HTTP 500
+            port: Port to listen on, 0 picks a free one
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queue_wait = 0.0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, reply = server.complete(body)
+                data = json.dumps(reply).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm", daemon=True)
+
+    def start(self) -> "FakeLLMServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+
+    def complete(self, body: Dict[str, Any]):
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        queued = time.perf_counter()
+        with self.slots:
+            with self.lock:
+                self.requests += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                self.queue_wait += time.perf_counter() - queued
+            try:
+                if random.random() < self.error_rate:
+                    time.sleep(self.latency)
+                    return 500, {"error": {"message": "Simulated server error", "type": "server_error"}}
+                system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+                if system.startswith("Translate"):
+                    content = messages[-1]["content"]
+                    tokens = len(content.split())
+                else:
+                    tokens = min(self.completion_tokens, int(body.get("max_tokens") or self.completion_tokens))
+                    content = "Could you tell me a little more about that? " + " ".join(["detail"] * max(0, tokens - 10))
+                time.sleep(self.latency + random.uniform(0, self.jitter) + tokens / self.tokens_per_second)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        return 200, {
+            "id": f"fake-{self.requests}",
+            "object": "chat.completion",
+            "model": body.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content.strip()}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                      "total_tokens": prompt_tokens + tokens},
+        }
+
+
+def _namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class HTTPChatClient:
+    """Bare chat completions client on urllib, used when neither SDK is installed"""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs: Any) -> Any:
+        import urllib.request
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(kwargs).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return _namespace(json.loads(response.read()))
+
+
+def make_client(base_url: str, kind: str = "auto") -> Any:
+    """
+    Chat client pointed at the fake server
+    Args:
+        base_url: Server URL ending in /v1
+        kind: "together" (what the apps use), "openai", "http", or "auto" for the first one installed
+    Returns:
+        Client with chat.completions.create
+    """
+    if kind in ("auto", "together"):
+        try:
+            from together import Together
+            return Together(api_key="fake", base_url=base_url, max_retries=0)
+        except ImportError:
+            if kind == "together":
+                raise
+    if kind in ("auto", "openai"):
+        try:
+            from openai import OpenAI
+            return OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+        except ImportError:
+            if kind == "openai":
+                raise
+    return HTTPChatClient(base_url)
+
+
+def load_conversations(path: str = TRANSCRIPTS_FILE, limit: Optional[int] = None) -> List[List[str]]:
+    """
+    Patient replies from each transcript: the "P:" lines of dialogues, or the sentences of a narrative
+    Args:
+        path: transcripts.json, a mapping of ID to transcript text
+        limit: Conversations to load, None for all
+    Returns:
+        One list of replies per conversation
+    """
+    with open(path, encoding="utf-8") as f:
+        transcripts = json.load(f)
+    conversations = []
+    for text in transcripts.values():
+        replies = PATIENT_LINE.findall(text) or [s.strip() for s in SENTENCE.findall(text)]
+        if replies:
+            conversations.append(replies)
+        if limit and len(conversations) >= limit:
+            break
+    return conversations
+
+
+@dataclass
+class SessionResult:
+    """Timings of one simulated user"""
+    arrival: float
+    start_delay: float = 0.0
+    duration: float = 0.0
+    turn_latencies: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class ChatEngine:
+    """
+    The conversation work main.py does per session, without the Streamlit page: intake
+    questions from the planner, translation for non-English sessions, and the final extraction
+    """
+    def __init__(self, client: Any, language: str = "en", model: str = DEFAULT_MODEL, max_turns: int = 14):
+        self.client = client
+        self.language = language
+        self.model = model
+        self.max_turns = max_turns
+        self.pipeline = LanguagePipeline(TogetherTranslator(client, model), SegmentCache(),
+                                         native_models={"en": model})
+        self.planner = IntakePlanner(llm=self._ask)
+
+    def _ask(self, prompt: str) -> str:
+        response = chat_completion(self.client, "llm.intake_question", model=self.model,
+                                   messages=[{"role": "assistant", "content": prompt}],
+                                   max_tokens=150, temperature=0.7, stream=False)
+        return response.choices[0].message.content
+
+    def run(self, replies: List[str], result: SessionResult, think_time: float) -> None:
+        state = IntakeState()
+        history = []
+        turn = self.planner.next_turn(state, self.language)
+        history.append(f"assistant: {turn.english}")
+        for reply in replies[:self.max_turns]:
+            time.sleep(think_time * random.uniform(0.5, 1.5))
+            start = time.perf_counter()
+            english = None
+            if self.language != "en":
+                english = self.pipeline.translate(reply, self.language, "en")
+            turn = self.planner.answer(state, reply, english, self.language)
+            if self.language != "en" and turn.question == turn.english:
+                self.pipeline.translate(turn.english, "en", self.language)
+            result.turn_latencies.append(time.perf_counter() - start)
+            history += [f"user: {english or reply}", f"assistant: {turn.english}"]
+            if turn.done:
+                break
+        start = time.perf_counter()
+        chat_completion(self.client, "llm.extract_information", model=self.model,
+                        messages=[{"role": "assistant", "content": (
+                            "Extract the patient's information from this conversation as JSON.\n\n"
+                            + "\n".join(history))}],
+                        max_tokens=500, temperature=0.7, stream=False)
+        result.turn_latencies.append(time.perf_counter() - start)
+
+
+class AnalyzerEngine:
+    """The per-conversation work of healthapp.py: one model call per intake question, in sequence"""
+
+    def __init__(self, client: Any, model: str = DEFAULT_MODEL):
+        self.client = client
+        self.model = model
+        self.questions = [intake_field.analysis_question for intake_field in INTAKE_FIELDS]
+
+    def run(self, replies: List[str], result: SessionResult, think_time: float) -> None:
+        conversation_text = "\n".join(replies)
+        for question in self.questions:
+            start = time.perf_counter()
+            chat_completion(self.client, "llm.analyze_conversation", model=self.model,
+                            messages=[
+                                {"role": "assistant", "content": "Answer the following question based on "
+                                                                 "the patient-doctor conversation provided."},
+                                {"role": "system", "content": conversation_text},
+                                {"role": "user", "content": question},
+                            ],
+                            max_tokens=150, temperature=0.7, stream=False)
+            result.turn_latencies.append(time.perf_counter() - start)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+@dataclass
+class StepReport:
+    """Outcome of one arrival rate"""
+    rate: float
+    sessions: int
+    completed: int
+    errors: int
+    elapsed: float
+    sessions_per_second: float
+    model_calls_per_second: float
+    turn_p50: float
+    turn_p95: float
+    turn_p99: float
+    session_p50: float
+    session_p95: float
+    start_delay_p95: float
+    saturated: bool
+
+
+def run_step(
+    engine: Any,
+    conversations: List[List[str]],
+    rate: float,
+    duration: float,
+    executor: ThreadPoolExecutor,
+    think_time: float,
+    slo: float,
+    drain_timeout: float,
+    model_calls: Callable[[], int]
+) -> StepReport:
+    """
+    Start sessions with Poisson arrivals at `rate` per second for `duration` seconds and wait for them
+    Args:
+        engine: ChatEngine or AnalyzerEngine
+        conversations: Patient replies to replay, picked at random
+        rate: Mean new sessions per second
+        duration: Seconds to keep starting sessions
+        executor: Pool the simulated users run on; its size caps concurrent users
+        think_time: Mean seconds a user waits between replies
+        slo: 95th percentile turn latency, in seconds, above which the step counts as saturated
+        drain_timeout: Seconds to wait for running sessions after the last arrival
+        model_calls: Returns the number of requests the LLM server has received so far
+    Returns:
+        StepReport
+    """
+    results: List[SessionResult] = []
+    futures = []
+
+    def session(result: SessionResult, replies: List[str]) -> None:
+        started = time.perf_counter()
+        result.start_delay = started - result.arrival
+        try:
+            engine.run(replies, result, think_time)
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+        result.duration = time.perf_counter() - result.arrival
+
+    calls_before = model_calls()
+    step_start = time.perf_counter()
+    next_arrival = step_start
+    while next_arrival < step_start + duration:
+        time.sleep(max(0.0, next_arrival - time.perf_counter()))
+        result = SessionResult(arrival=time.perf_counter())
+        results.append(result)
+        futures.append(executor.submit(session, result, random.choice(conversations)))
+        next_arrival += random.expovariate(rate)
+    deadline = time.perf_counter() + drain_timeout
+    for future in futures:
+        try:
+            future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - step_start
+
+    finished = [r for r in results if r.duration > 0]
+    completed = [r for r in finished if r.error is None]
+    errors = len(results) - len(completed)
+    turns = [latency for r in completed for latency in r.turn_latencies]
+    turn_p95 = percentile(turns, 95)
+    return StepReport(
+        rate=rate,
+        sessions=len(results),
+        completed=len(completed),
+        errors=errors,
+        elapsed=round(elapsed, 2),
+        sessions_per_second=round(len(completed) / elapsed, 3),
+        model_calls_per_second=round((model_calls() - calls_before) / elapsed, 2),
+        turn_p50=round(percentile(turns, 50), 3),
+        turn_p95=round(turn_p95, 3),
+        turn_p99=round(percentile(turns, 99), 3),
+        session_p50=round(percentile([r.duration for r in completed], 50), 3),
+        session_p95=round(percentile([r.duration for r in completed], 95), 3),
+        start_delay_p95=round(percentile([r.start_delay for r in finished], 95), 3),
+        saturated=turn_p95 > slo or errors > 0.01 * max(1, len(results))
+    )
+
+
+def print_report(steps: List[StepReport], server: FakeLLMServer) -> None:
+    print(f"{'rate/s':>7} {'sessions':>8} {'done':>5} {'err':>4} {'sess/s':>7} {'calls/s':>8} "
+          f"{'turn p50':>9} {'p95':>7} {'p99':>7} {'session p95':>11} {'start p95':>9}")
+    for step in steps:
+        print(f"{step.rate:7.2f} {step.sessions:8d} {step.completed:5d} {step.errors:4d} "
+              f"{step.sessions_per_second:7.2f} {step.model_calls_per_second:8.2f} "
+              f"{step.turn_p50:9.3f} {step.turn_p95:7.3f} {step.turn_p99:7.3f} "
+              f"{step.session_p95:11.2f} {step.start_delay_p95:9.3f}{'  saturated' if step.saturated else ''}")
+    saturated = next((step.rate for step in steps if step.saturated), None)
+    sustained = [step.rate for step in steps if saturated is None or step.rate < saturated]
+    print(f"Highest sustained rate: {max(sustained) if sustained else 'none'} sessions/s; "
+          f"saturation point: {saturated if saturated is not None else 'not reached'}")
+    print(f"Fake LLM: {server.requests} requests, max {server.max_in_flight} in flight, "
+          f"{server.queue_wait / max(1, server.requests) * 1000:.1f} ms mean queue wait")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay transcripts against the chat or analyzer engine, offline")
+    parser.add_argument("--scenario", choices=["chat", "analyzer"], default="chat",
+                        help="chat replays main.py intake sessions, analyzer replays healthapp.py analyses")
+    parser.add_argument("--rates", default="0.5,1,2,4,8", help="Comma-separated session arrival rates per second")
+    parser.add_argument("--step-seconds", type=float, default=20.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--drain-seconds", type=float, default=120.0, help="Seconds to wait for sessions to finish")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between a user's replies")
+    parser.add_argument("--language", default="en", help="Session language for the chat scenario, e.g. yue")
+    parser.add_argument("--max-users", type=int, default=256, help="Users served at the same time")
+    parser.add_argument("--slo", type=float, default=2.0, help="95th percentile turn latency target in seconds")
+    parser.add_argument("--transcripts", default=TRANSCRIPTS_FILE)
+    parser.add_argument("--client", choices=["auto", "together", "openai", "http"], default="auto")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Fake LLM extra random latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Fake LLM generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=40, help="Fake LLM tokens per reply")
+    parser.add_argument("--server-concurrency", type=int, default=32, help="Fake LLM requests served at once")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake LLM fraction of HTTP 500 replies")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    from logging_setup import configure_logging
+
+    configure_logging(level="WARNING")
+
+    server = FakeLLMServer(args.latency, args.jitter, args.tokens_per_second, args.completion_tokens,
+                           args.server_concurrency, args.error_rate).start()
+    client = make_client(server.base_url, args.client)
+    conversations = load_conversations(args.transcripts)
+    engine: Any = (ChatEngine(client, args.language) if args.scenario == "chat" else AnalyzerEngine(client))
+    print(f"{args.scenario}: {len(conversations)} conversations, client {type(client).__name__}, "
+          f"fake LLM at {server.base_url}")
+
+    steps = []
+    with ThreadPoolExecutor(max_workers=args.max_users, thread_name_prefix="user") as executor:
+        for rate in (float(r) for r in args.rates.split(",")):
+            steps.append(run_step(engine, conversations, rate, args.step_seconds, executor,
+                                  args.think_time, args.slo, args.drain_seconds, lambda: server.requests))
+            print(f"rate {rate}/s done: {asdict(steps[-1])}")
+    print_report(steps, server)
+    server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "steps": [asdict(step) for step in steps],
+                       "server": {"requests": server.requests, "max_in_flight": server.max_in_flight}}, f, indent=2)
@@ -0,0 +1,164 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed with extra= or log_context
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the time, level, logger, message and any extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Add the fields set with log_context to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue the record with its message merged, leaving formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks cannot be pickled or outlive the frame, keep the text
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """
+    Attach fields such as batch_id or file_id to every record logged inside the block
+    Args:
+        **fields: Field names and values, added to JSON output
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5
+) -> logging.handlers.QueueListener:
+    """
+    Send all logging through a queue to a background thread that writes the console and a rotating file.
+    Call it once from an entry point; later calls return the running listener.
+    Args:
+        level: Root level, defaults to LOG_LEVEL or INFO
+        log_file: Rotating JSON log file, defaults to LOG_FILE; None logs to the console only
+        json_format: JSON on the console too, defaults to LOG_FORMAT=json
+        max_bytes: Size at which the log file is rotated
+        backup_count: Rotated files kept
+    Returns:
+        The queue listener
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.getenv("LOG_LEVEL", "INFO")
+        log_file = log_file or os.getenv("LOG_FILE")
+        if json_format is None:
+            json_format = os.getenv("LOG_FORMAT", "").lower() == "json"
+
+        console = logging.StreamHandler()
+        console.setFormatter(JsonFormatter() if json_format else logging.Formatter(DEFAULT_FORMAT))
+        handlers: List[logging.Handler] = [console]
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        def write_directly_in_child():
+            # A forked worker has no listener thread, so it writes to the handlers itself
+            root.removeHandler(queue_handler)
+            for handler in handlers:
+                handler.addFilter(ContextFilter())
+                root.addHandler(handler)
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=write_directly_in_child)
+        return _listener
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.mkdtemp(), "demo.log")
+    configure_logging(log_file=path)
+    logger = logging.getLogger("demo")
+
+    start = time.perf_counter()
+    with log_context(batch_id="b-1"):
+        for i in range(10_000):
+            logger.info("Processed file %d", i, extra={"file_id": f"f-{i}", "duration_ms": 1.5})
+    elapsed = time.perf_counter() - start
+    _listener.stop()
+    with open(path) as f:
+        lines = f.readlines()
+    print(f"{len(lines)} records, {elapsed / 10_000 * 1e6:.1f} us per call on the caller's thread")
+    print(lines[-1].strip())
@@ -1,10 +1,27 @@
 import streamlit as st
-from together import Together
-import pandas as pd
 import os
+from chat_view import ChatView
+from language import DEFAULT_MODEL, LANGUAGE_NAMES, LANGUAGES, detect_language
+from intake_planner import IntakePlanner, IntakeState
+from telemetry import chat_completion, start_metrics_server
 
-# Initialize Together API
-client = Together(api_key=os.getenv("TOGETHER_API_KEY"))
+@st.cache_resource
+def get_client():
+    # Together API client, created once per server process instead of on every rerun
+    from together import Together
+    return Together(api_key=os.getenv("TOGETHER_API_KEY"))
+
+
+@st.cache_resource
+def start_telemetry():
+    # Queue-based logging once per server process, plus /metrics, /traces and /profiling when TELEMETRY_PORT is set
+    import profiling  # registers /profiling; PROFILING=1 starts sampling straight away
+    from logging_setup import configure_logging
+    configure_logging()
+    if os.getenv("TELEMETRY_PORT"):
+        start_metrics_server(int(os.environ["TELEMETRY_PORT"]))
+
+start_telemetry()
 
 
 # Track the conversation history and responses in session state
@@ -16,38 +33,31 @@ if "conversation_active" not in st.session_state:
     st.session_state.conversation_active = True  # Track if conversation is active
 if "rerun_trigger" not in st.session_state:
     st.session_state.rerun_trigger = 0  # Dummy variable to trigger rerun
+if "intake" not in st.session_state:
+    st.session_state.intake = IntakeState()  # Which intake fields are filled
 
-## Function to ask questions to patient
+@st.cache_resource
+def get_language_pipeline():
+    # Sentence cache and translation workers shared by every session
+    from language import LanguagePipeline, TogetherTranslator
+    return LanguagePipeline(TogetherTranslator(get_client()))
 
-def generate_response(conversation_history):
-   
-    prompt = (
-        "You are a healthcare assistant chatbot. Your task is to ask one clear and specific question to collect "
-        "essential health-related information from the patient. The goal is to gather details such as:\n"
-        "- Patient's name\n"
-        "- Age\n"
-        "- Condition\n"
-        "- Reason for visit\n"
-        "- Symptom onset and progression\n"
-        "- Pain level\n"
-        "- Pain location and spread\n"
-        "- Additional symptoms (e.g., nausea, dizziness)\n"
-        "- Recent fever, chills, or cough\n"
-        "- Allergies\n"
-        "- Medical conditions\n"
-        "- Current medications\n"
-        "- Recent contact with sick individuals\n\n"
-        "Ask only one relevant question at a time, based on the conversation so far.\n\n"
-        "Conversation history:\n"
-    )
-    # Use only the last few entries in the conversation history to keep context focused
-    recent_history = conversation_history[-5:]  # Last 5 messages for context
-    prompt += "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_history])
-    prompt += "\n\nHealthcare Assistant's next question:"
 
+def english_text(msg):
+    # Messages in another language keep an English copy for the prompts
+    return msg.get("english", msg["content"])
+
+## Function to ask the model for clarifications and follow-ups; routine intake questions come from the planner
+
+def ask_model(prompt, model=DEFAULT_MODEL, reply_language="en"):
+    if reply_language != "en":
+        # A native model answers in the patient's language directly
+        prompt += f" Ask the question in {LANGUAGE_NAMES[reply_language]}."
     try:
-        response = client.chat.completions.create(
-            model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
+        response = chat_completion(
+            get_client(),
+            "llm.intake_question",
+            model=model,
             messages=[{"role": "assistant", "content": prompt}],
             max_tokens=150,
             temperature=0.7,
@@ -56,12 +66,27 @@ def generate_response(conversation_history):
             repetition_penalty=1.0,
             stream=False
         )
-        generated_text = response.choices[0].message.content.strip()
         # Return only the assistant's question
-        return generated_text
+        return response.choices[0].message.content.strip()
     except Exception as e:
         st.error(f"An error occurred in generating the question: {e}")
-        return "I'm sorry, I couldn't generate a question. Please try again."
+        return None
+
+
+@st.cache_resource
+def get_intake_planner(model, reply_language):
+    return IntakePlanner(llm=lambda prompt: ask_model(prompt, model, reply_language))
+
+
+def assistant_entry(turn):
+    # Pre-translated questions are used as they are; anything else is translated in the background
+    entry = {"role": "assistant", "content": turn.question}
+    if language_code == "en":
+        return entry, None
+    entry["english"] = turn.english
+    if turn.question != turn.english or not route.translate:
+        return entry, None
+    return entry, get_language_pipeline().translate_async(turn.english, "en", language_code)
 
 
 # Function to extract key information from the conversation
@@ -89,10 +114,12 @@ def extract_information(conversation_history):
         "Include only the relevant information provided by the patient, and exclude any questions or statements from the assistant.\n\n"
         "Conversation:\n"
     )
-    extraction_prompt += "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
+    extraction_prompt += "\n".join([f"{msg['role']}: {english_text(msg)}" for msg in conversation_history])
 
     try:
-        response = client.chat.completions.create(
+        response = chat_completion(
+            get_client(),
+            "llm.extract_information",
             model="meta-llama/Llama-3.2-3B-Instruct-Turbo",
             messages=[{"role": "assistant", "content": extraction_prompt}],
             max_tokens=500,
@@ -118,43 +145,56 @@ def extract_information(conversation_history):
 st.title("LinguaLink Chatbot")
 
 # Language selection
-language = st.selectbox("Select a language for conversation:", ["English", "Cantonese"])
+language = st.selectbox("Select a language for conversation:", list(LANGUAGES))
+language_code = LANGUAGES[language]
+# Use a model that speaks the language natively if one is configured, otherwise translate around the English model
+route = get_language_pipeline().route(language_code)
+planner = get_intake_planner(route.model, "en" if route.translate else language_code)
+question_entry, reply_translation = None, None
+answered = False
 
 # Display the initial greeting if the conversation is just starting
 if len(st.session_state.conversation_history) == 0 and st.session_state.conversation_active:
     intro_text = "Hello! I'm LinguaLink. Let's discuss your health concerns, and I'll gather some essential information along the way."
-    st.session_state.conversation_history.append({"role": "assistant", "content": intro_text})
+    intro = {"role": "assistant", "content": intro_text}
+    if language_code != "en":
+        intro["english"] = intro_text
+        intro["content"] = get_language_pipeline().translate(intro_text, "en", language_code)
+    st.session_state.conversation_history.append(intro)
+    question_entry, reply_translation = assistant_entry(planner.next_turn(st.session_state.intake, language_code))
+    st.session_state.conversation_history.append(question_entry)
 
 
-for msg in st.session_state.conversation_history:
-    with st.chat_message("user" if msg["role"] == "user" else "assistant"):
-        st.write(msg["content"])
-
-# Initialize session state 
-if "user_input" not in st.session_state:
-    st.session_state.user_input = ""  # Initialize as an empty string to store user input
+# Only the newest pages of a long conversation are drawn on each run
+ChatView("conversation_view").render(st.session_state.conversation_history)
 
 # Check if the conversation is active
 if st.session_state.conversation_active:
-    # Generate the next question based on conversation history
-    next_question = generate_response(st.session_state.conversation_history)
-    st.session_state.conversation_history.append({"role": "assistant", "content": next_question})
-
-    # Display the text input for user message
-    user_input_temp = st.text_input("Your message", key="user_input_box")
+    # A new box per submitted message, so repeating the last answer (e.g. "no" twice) still counts
+    user_input_temp = st.text_input("Your message", key=f"user_input_box_{st.session_state.rerun_trigger}")
 
-    # Process user input only if it's non-empty and different from the last stored input
-    if user_input_temp.strip() and user_input_temp != st.session_state.user_input:
+    # Process user input only if it's non-empty
+    if user_input_temp.strip():
         
-        st.session_state.conversation_history.append({"role": "user", "content": user_input_temp.strip()})
-
-        
-        st.session_state.user_input = user_input_temp.strip()
-
-        # Increment rerun trigger to force a UI refresh
+        user_entry = {"role": "user", "content": user_input_temp.strip()}
+        input_language = detect_language(user_entry["content"], default=language_code)
+        if input_language != "en" and (route.translate or input_language != language_code):
+            user_entry["english"] = get_language_pipeline().translate(user_entry["content"], input_language, "en")
+        st.session_state.conversation_history.append(user_entry)
+
+        # The planner fills the field from the reply and picks the next question, usually without the model
+        turn = planner.answer(st.session_state.intake, user_entry["content"], user_entry.get("english"), language_code)
+        question_entry, reply_translation = assistant_entry(turn)
+        st.session_state.conversation_history.append(question_entry)
+        answered = True
+
+        # Increment rerun trigger to force a UI refresh and clear the message box
         st.session_state["rerun_trigger"] = st.session_state.get("rerun_trigger", 0) + 1
         
 
+# Optional MRN used to save the extracted record to the patients table
+patient_mrn = st.text_input("Patient MRN (optional, saves the extracted record)")
+
 # Button to stop the conversation and proceed with extraction
 if st.button("End Conversation") and st.session_state.conversation_active:
     # Stop the conversation
@@ -173,12 +213,28 @@ if st.button("End Conversation") and st.session_state.conversation_active:
                 extracted_info_dict[key] = value
         
         # Convert to DataFrame
+        import pandas as pd
         patient_data_df = pd.DataFrame([extracted_info_dict])
 
         # Display the DataFrame
         st.write("Extracted Patient Information:")
         st.dataframe(patient_data_df)
 
-        # patient_data_df.to_csv("patient_data.csv", index=False)
+        # Save the record to the patients table when it can be keyed by MRN
+        if patient_mrn.strip():
+            from patient_sink import PatientSink, record_from_extraction
+            try:
+                with PatientSink(batch_size=1, commit_every=1) as sink:
+                    sink.add(record_from_extraction(extracted_info_dict, mrn=patient_mrn.strip()))
+                st.success(f"Saved record for {patient_mrn.strip()}.")
+            except Exception as e:
+                st.error(f"An error occurred while saving the record: {e}")
     else:
         st.warning("No information extracted.")
+
+# Show the translated question once the background translation finishes
+if reply_translation is not None:
+    question_entry["content"] = reply_translation.result()
+if answered or reply_translation is not None:
+    # Draw the new question now rather than on the next interaction
+    st.rerun()
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime
 from inference import get_response
+from chat_view import ChatView, bubble
 
 # Page Configurations
 st.set_page_config(page_title="MediAssist", page_icon="💊", layout="centered")
@@ -129,10 +130,11 @@ if st.button("Send") and user_input:
     # Clear input box after sending
     user_input = ""
 
-# Display conversation history with enhanced styling
-for entry in st.session_state["conversation_history"]:
+# Display conversation history with enhanced styling; only new messages are rendered each run
+def render_entry(entry):
     if entry["role"] == "user":
-        role_label = f"({entry['user_role']})"
-        st.markdown(f'<div class="user-message">{entry["message"]} <small>{role_label}</small></div>', unsafe_allow_html=True)
-    else:
-        st.markdown(f'<div class="bot-message">{entry["message"]}</div>', unsafe_allow_html=True)
+        return bubble("user-message", entry["message"], f"({entry['user_role']})")
+    return bubble("bot-message", entry["message"])
+
+
+ChatView("conversation_view", to_html=render_entry).render(st.session_state["conversation_history"])
@@ -1,8 +1,7 @@
 import streamlit as st
-from datetime import datetime
-import speech_recognition as sr
-from io import StringIO
-from pdfminer.high_level import extract_text
+import os
+
+from chat_view import ChatView, bubble
 
 # Page Configurations
 st.set_page_config(page_title="MediAssist", page_icon="💊", layout="wide")
@@ -161,10 +160,6 @@ st.markdown(
     }
 
     /* Hide Streamlit components */
-    .stButton, .stFileUploader {
-        display: none;
-    }
-
     .upload-input {
         display: none;
     }
@@ -235,8 +230,108 @@ if "patient_history" not in st.session_state:
     st.session_state["patient_history"] = []
 if "doctor_history" not in st.session_state:
     st.session_state["doctor_history"] = []
+if "patient_seq" not in st.session_state:
+    st.session_state["patient_seq"] = 0
+if "doctor_seq" not in st.session_state:
+    st.session_state["doctor_seq"] = 0
 if "is_recording" not in st.session_state:
     st.session_state["is_recording"] = False
+if "upload_jobs" not in st.session_state:
+    st.session_state["upload_jobs"] = []
+if "upload_files" not in st.session_state:
+    st.session_state["upload_files"] = set()
+if "voice_transcript" not in st.session_state:
+    from speech_stream import LiveTranscript
+    st.session_state["voice_transcript"] = LiveTranscript()
+if "voice_clip" not in st.session_state:
+    st.session_state["voice_clip"] = None
+
+
+# Both portals join the conversation named in the URL, e.g. ?conversation=visit-42
+conversation_id = st.query_params.get("conversation", "default")
+
+
+@st.cache_resource
+def start_telemetry():
+    # Queue-based logging once per server process, plus /metrics, /traces and /profiling when TELEMETRY_PORT is set
+    import profiling  # registers /profiling; PROFILING=1 starts sampling straight away
+    from logging_setup import configure_logging
+    configure_logging()
+    from telemetry import start_metrics_server
+    if os.getenv("TELEMETRY_PORT"):
+        start_metrics_server(int(os.environ["TELEMETRY_PORT"]))
+
+start_telemetry()
+
+
+@st.cache_resource
+def get_conversation_bus():
+    # Shared by every browser session in this process
+    from message_bus import create_bus
+    return create_bus()
+
+
+def render_bubble(entry):
+    css_class = "patient-message" if entry["role"] == "patient" else "doctor-message"
+    return bubble(f"message {css_class}", entry["message"])
+
+
+def show_conversation(portal):
+    # Runs as a fragment: pulls only new messages from the bus and redraws this column
+    history = st.session_state[f"{portal}_history"]
+    for delta in get_conversation_bus().read(conversation_id, after=st.session_state[f"{portal}_seq"], timeout=0.2):
+        history.append({"role": delta.role, "message": delta.message})
+        st.session_state[f"{portal}_seq"] = delta.seq
+    ChatView(f"{portal}_chat_view", to_html=render_bubble).render(history)
+    with st.form(f"{portal}_form", clear_on_submit=True, border=False):
+        text = st.text_input("Message", placeholder="Type your message...", label_visibility="collapsed")
+        if st.form_submit_button("Send") and text.strip():
+            get_conversation_bus().publish(conversation_id, portal, text.strip())
+            st.rerun(scope="fragment")
+
+
+@st.cache_resource
+def get_upload_processor():
+    # One worker pool and parse cache shared by every session
+    from uploads import UploadProcessor
+    return UploadProcessor(cache_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".upload_cache"))
+
+
+@st.cache_resource
+def get_speech_recognizer():
+    # Offline recognizer and recognition workers shared by every session
+    from concurrent.futures import ThreadPoolExecutor
+    from speech_stream import default_backend
+    return default_backend(), ThreadPoolExecutor(max_workers=2, thread_name_prefix="speech")
+
+
+def show_voice_transcript():
+    transcript = st.session_state["voice_transcript"]
+    for event in transcript.pop_final():
+        get_conversation_bus().publish(conversation_id, "patient", event.text)
+    if transcript.partial:
+        st.caption(f"🎤 {transcript.partial}…")
+    elif transcript.feeding:
+        st.caption("🎤 Listening…")
+
+
+def show_upload_progress(polling: bool):
+    processor = get_upload_processor()
+    pending = False
+    for job_id in st.session_state["upload_jobs"]:
+        job = processor.get(job_id)
+        if job is None:
+            continue
+        if job.status == "failed":
+            st.error(f"{job.name}: {job.error}")
+        elif job.done:
+            st.success(f"{job.name}: {job.message}")
+        else:
+            pending = True
+            st.progress(job.progress, text=f"{job.name}: {job.message}")
+    if polling and not pending:
+        # run_every is fixed until the next full run, which stops the polling
+        st.rerun()
 
 # Sample patient data
 patient_data = {
@@ -297,24 +392,38 @@ with col1:
         unsafe_allow_html=True
     )
 
-    def get_response(user_input):
-        # Static response for testing
-        return "I'm here to assist you. How can I help?"
-    # Display conversation when user submits a message
-    if st.button("patient-send-button") and user_input:
-        # Get bot's response
-        bot_response = get_response(user_input)
-        # Append user input and bot response to the conversation history
-        st.session_state["patient_history"].append({"role": "user", "message": user_input})
-        st.session_state["patient_history"].append({"role": "assistant", "message": bot_response})
-        # Clear input box after sending
-        user_input = ""
-    # Display conversation history with enhanced styling
-    for entry in st.session_state["patient_history"]:
-        if entry["role"] == "user":
-            st.markdown(f'<div class="user-message">{entry["message"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="bot-message">{entry["message"]}</div>', unsafe_allow_html=True)
+    st.fragment(run_every=0.5)(show_conversation)("patient")
+    # Attachments are parsed in the background; only the progress fragment reruns while they do
+    uploaded_files = st.file_uploader(
+        "Attach medical records",
+        type=["txt", "pdf", "docx", "xlsx", "csv"],
+        accept_multiple_files=True,
+        key="patient_files"
+    )
+    for uploaded_file in uploaded_files or []:
+        # Submit each upload once; uploading a file again retries it if it failed
+        if uploaded_file.file_id in st.session_state["upload_files"]:
+            continue
+        st.session_state["upload_files"].add(uploaded_file.file_id)
+        job = get_upload_processor().submit(uploaded_file.name, uploaded_file.getvalue())
+        if job.job_id not in st.session_state["upload_jobs"]:
+            st.session_state["upload_jobs"].append(job.job_id)
+    pending = any(
+        not (job and job.done)
+        for job in map(get_upload_processor().get, st.session_state["upload_jobs"])
+    )
+    st.fragment(run_every=1 if pending else None)(show_upload_progress)(pending)
+
+    # Voice input is segmented and recognized off the UI thread; partial text shows as it arrives
+    recording = st.audio_input("🎤 Voice input", key="patient_voice")
+    if recording is not None:
+        if recording.file_id != st.session_state["voice_clip"]:
+            st.session_state["voice_clip"] = recording.file_id
+            backend, executor = get_speech_recognizer()
+            st.session_state["voice_transcript"].feed_wav_bytes(recording.getvalue(), backend, executor)
+    listening = st.session_state["voice_transcript"].active
+    st.fragment(run_every=0.5 if listening else None)(show_voice_transcript)()
+
     # Add JavaScript for textarea auto-resize
     st.markdown(
         """
@@ -373,3 +482,4 @@ with col2:
         unsafe_allow_html=True
     )
 
+    st.fragment(run_every=0.5)(show_conversation)("doctor")
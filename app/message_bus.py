@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Delta:
+    """One message added to a conversation"""
+    conversation_id: str
+    seq: int
+    role: str
+    message: str
+    timestamp: float = field(default_factory=time.time)
+
+
+class ConversationBus:
+    """
+    In-process pub/sub for conversations shared between browser sessions.
+
+    The bus runs an asyncio event loop on a daemon thread. Publishers and
+    readers may call it from any thread, including Streamlit script threads.
+    Each conversation keeps its last `capacity` messages in a ring buffer,
+    and readers ask for everything after the last sequence number they saw,
+    so only new messages cross the bus. At most `max_conversations` are kept;
+    the least recently used one without a waiting reader is dropped first.
+    Sequence numbers come from one counter for the whole bus, so a reader of a
+    dropped conversation still gets every message published after it returns.
+    """
+    def __init__(self, capacity: int = 500, max_conversations: int = 1000):
+        """
+        Args:
+            capacity: Messages kept per conversation
+            max_conversations: Conversations kept in memory
+        """
+        self.capacity = capacity
+        self.max_conversations = max_conversations
+        self._buffers: Dict[str, Deque[Delta]] = {}
+        self._seq: Dict[str, int] = {}
+        self._last_seq = 0
+        self._waiting: Dict[str, int] = {}
+        self._conditions: "OrderedDict[str, asyncio.Condition]" = OrderedDict()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="conversation-bus", daemon=True)
+        self._thread.start()
+
+    def publish(self, conversation_id: str, role: str, message: str) -> Delta:
+        """Append a message to a conversation and wake its readers"""
+        return self._call(self._publish(conversation_id, role, message))
+
+    def read(self, conversation_id: str, after: int = 0, timeout: float = 0.0) -> List[Delta]:
+        """
+        Messages with a sequence number above `after`
+        Args:
+            conversation_id: Conversation to read
+            after: Last sequence number the caller has, 0 for the whole buffer
+            timeout: Seconds to wait for a new message if there is none yet
+        Returns:
+            New messages in order; older ones may have left the ring buffer
+        """
+        return self._call(self._read(conversation_id, after, timeout))
+
+    async def subscribe(self, conversation_id: str, after: int = 0) -> AsyncIterator[Delta]:
+        """Yield messages as they are published, for consumers running their own event loop"""
+        while True:
+            deltas = await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(self._read(conversation_id, after, 30.0), self._loop)
+            )
+            for delta in deltas:
+                after = delta.seq
+                yield delta
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _condition(self, conversation_id: str) -> asyncio.Condition:
+        # Runs on the bus loop only, so the dicts need no lock
+        if conversation_id in self._conditions:
+            self._conditions.move_to_end(conversation_id)
+            return self._conditions[conversation_id]
+        self._conditions[conversation_id] = asyncio.Condition()
+        self._buffers[conversation_id] = deque(maxlen=self.capacity)
+        self._seq[conversation_id] = 0
+        self._waiting[conversation_id] = 0
+        if len(self._conditions) > self.max_conversations:
+            idle = [key for key in self._conditions if not self._waiting[key] and key != conversation_id]
+            for key in idle[:len(self._conditions) - self.max_conversations]:
+                del self._conditions[key], self._buffers[key], self._seq[key], self._waiting[key]
+        return self._conditions[conversation_id]
+
+    async def _publish(self, conversation_id: str, role: str, message: str) -> Delta:
+        condition = self._condition(conversation_id)
+        async with condition:
+            self._last_seq += 1
+            self._seq[conversation_id] = self._last_seq
+            delta = Delta(conversation_id, self._last_seq, role, message)
+            self._buffers[conversation_id].append(delta)
+            condition.notify_all()
+        return delta
+
+    async def _read(self, conversation_id: str, after: int, timeout: float) -> List[Delta]:
+        condition = self._condition(conversation_id)
+        async with condition:
+            if self._seq[conversation_id] <= after and timeout > 0:
+                self._waiting[conversation_id] += 1
+                try:
+                    await asyncio.wait_for(
+                        condition.wait_for(lambda: self._seq[conversation_id] > after), timeout
+                    )
+                except asyncio.TimeoutError:
+                    return []
+                finally:
+                    self._waiting[conversation_id] -= 1
+            return [delta for delta in self._buffers[conversation_id] if delta.seq > after]
+
+
+class RedisConversationBus:
+    """
+    Same interface as ConversationBus, backed by a Redis-compatible server.
+
+    Use it when the portals run in separate processes. Each conversation is a
+    stream trimmed to `capacity` entries. Entry IDs are "<seq>-0", so readers
+    use the same sequence numbers as with the in-process bus; a Lua script
+    takes the next number and appends the entry atomically, so concurrent
+    publishers cannot add entries out of order.
+    """
+    PUBLISH_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[2])
+    redis.call('XADD', KEYS[1], 'MAXLEN', ARGV[1], seq .. '-0',
+               'role', ARGV[2], 'message', ARGV[3], 'timestamp', ARGV[4])
+    return seq
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", capacity: int = 500, prefix: str = "conversation"):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.capacity = capacity
+        self.prefix = prefix
+        self._publish = self.redis.register_script(self.PUBLISH_SCRIPT)
+
+    def _keys(self, conversation_id: str) -> List[str]:
+        # The hash tag keeps the stream and its counter in one cluster slot, as scripts require
+        stream = f"{self.prefix}:{{{conversation_id}}}"
+        return [stream, f"{stream}:seq"]
+
+    def publish(self, conversation_id: str, role: str, message: str) -> Delta:
+        timestamp = time.time()
+        seq = self._publish(keys=self._keys(conversation_id), args=[self.capacity, role, message, repr(timestamp)])
+        return Delta(conversation_id, int(seq), role, message, timestamp)
+
+    def read(self, conversation_id: str, after: int = 0, timeout: float = 0.0) -> List[Delta]:
+        streams = {self._keys(conversation_id)[0]: f"{after}-0"}
+        block = int(timeout * 1000) if timeout > 0 else None
+        result = self.redis.xread(streams, block=block) or []
+        return [
+            Delta(conversation_id, int(entry_id.split("-")[0]), fields["role"], fields["message"],
+                  float(fields["timestamp"]))
+            for _, entries in result for entry_id, fields in entries
+        ]
+
+    async def subscribe(self, conversation_id: str, after: int = 0) -> AsyncIterator[Delta]:
+        while True:
+            for delta in await asyncio.to_thread(self.read, conversation_id, after, 30.0):
+                after = delta.seq
+                yield delta
+
+    def close(self) -> None:
+        self.redis.close()
+
+
+def create_bus(url: Optional[str] = None, capacity: int = 500):
+    """
+    Redis-backed bus if a URL is given or CONVERSATION_BUS_URL is set, otherwise in-process
+    Args:
+        url: Redis URL, e.g. redis://localhost:6379/0
+        capacity: Messages kept per conversation
+    """
+    url = url or os.getenv("CONVERSATION_BUS_URL")
+    if url:
+        return RedisConversationBus(url, capacity)
+    return ConversationBus(capacity)
+
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    bus = create_bus()
+    received = []
+
+    def doctor_view():
+        seq = 0
+        while len(received) < 3:
+            for delta in bus.read("demo", after=seq, timeout=1.0):
+                seq = delta.seq
+                received.append((time.perf_counter(), delta))
+
+    reader = threading.Thread(target=doctor_view)
+    reader.start()
+    sent = []
+    for text in ["I have a headache", "Since yesterday", "No fever"]:
+        sent.append(time.perf_counter())
+        bus.publish("demo", "patient", text)
+        time.sleep(0.1)
+    reader.join()
+    for start, (arrived, delta) in zip(sent, received):
+        print(f"#{delta.seq} {delta.role}: {delta.message} ({(arrived - start) * 1000:.2f} ms)")
+    bus.close()
@@ -1,22 +1,15 @@
-import mindsdb_sdk
-import pandas as pd
-from pathlib import Path
-import PyPDF2
 import logging
 from typing import Optional, List, Dict, Union, Any
 from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 from enum import Enum, auto
+import threading
+import time
+import uuid
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('knowledge_base_loader.log')
-    ]
-)
+from telemetry import span
+
+# Handlers are set up by the entry point, see logging_setup.configure_logging
 logger = logging.getLogger(__name__)
 
 class ModelType(Enum):
@@ -49,7 +42,86 @@ class ProcessingResult:
     error: Optional[str] = None
     content: Optional[str] = None
 
-# ... [Previous MindsDBConnection class remains the same] ...
+@dataclass
+class CompletionResult:
+    """Data class to store the outcome of a single agent completion"""
+    index: int
+    question: str
+    success: bool
+    answer: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    queue_wait: float = 0.0
+    duration: float = 0.0
+
+class MindsDBConnection:
+    """Hold a connection to a MindsDB server"""
+    def __init__(self, url: str = 'http://127.0.0.1:47334', **kwargs):
+        import mindsdb_sdk
+        self.url = url
+        self.server = mindsdb_sdk.connect(url, **kwargs)
+        logger.info(f"Successfully connected to MindsDB at {url}")
+
+class TokenBucket:
+    """Thread-safe token bucket used to rate limit calls to MindsDB"""
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size, defaults to max(1, rate)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available and return the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+def call_with_timeout(func, *args, timeout: Optional[float] = None) -> Any:
+    """
+    Run func on its own daemon thread and wait at most `timeout` seconds once it has started.
+
+    mindsdb_sdk requests have no timeout of their own. A call that hangs is
+    abandoned on its thread rather than on a shared pool, so it never delays
+    the attempts that follow, and the timeout does not include time spent
+    waiting to be scheduled.
+    Args:
+        func: Blocking call
+        *args: Arguments for func
+        timeout: Seconds to wait after the call starts, None to wait forever
+    Returns:
+        The result of func; its exception is re-raised, FutureTimeoutError on timeout
+    """
+    future: Future = Future()
+    started = threading.Event()
+
+    def target():
+        future.set_running_or_notify_cancel()
+        started.set()
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="mindsdb-call", daemon=True).start()
+    started.wait()
+    return future.result(timeout=timeout)
 
 class ModelManager:
     """Manage MindsDB models"""
@@ -201,13 +273,91 @@ class AgentManager:
     def get_completion(self, agent_name: str, question: str) -> Optional[str]:
         """Get completion from agent"""
         try:
-            agent = self.connection.server.agents.get(agent_name)
-            completion = agent.completion([{'question': question, 'answer': None}])
-            return completion.content
+            with span("agent.completion", agent=agent_name):
+                agent = self.connection.server.agents.get(agent_name)
+                completion = agent.completion([{'question': question, 'answer': None}])
+                return completion.content
         except Exception as e:
             logger.error(f"Failed to get completion from agent {agent_name}: {str(e)}")
             return None
 
+    def bulk_completion(self,
+                        agent_name: str,
+                        questions: List[str],
+                        max_workers: int = 8,
+                        rate_limit: Optional[float] = None,
+                        timeout: Optional[float] = 60.0,
+                        retries: int = 2,
+                        backoff: float = 0.5) -> List[CompletionResult]:
+        """
+        Get completions for many questions concurrently
+
+        Args:
+            agent_name: Name of the agent to query
+            questions: Questions to ask, one completion each
+            max_workers: Maximum number of questions in flight
+            rate_limit: Maximum completion requests per second, None for unlimited
+            timeout: Seconds to wait for a single attempt once it has started, None to wait forever
+            retries: Extra attempts after a failed or timed out attempt
+            backoff: Base delay in seconds between attempts, doubled each retry
+
+        Returns:
+            One CompletionResult per question, in the order of the input
+        """
+        try:
+            agent = self.connection.server.agents.get(agent_name)
+        except Exception as e:
+            logger.error(f"Failed to get agent {agent_name}: {str(e)}")
+            return [CompletionResult(index=i, question=q, success=False, error=str(e))
+                    for i, q in enumerate(questions)]
+
+        bucket = TokenBucket(rate_limit) if rate_limit else None
+        batch_id = uuid.uuid4().hex[:12]
+
+        def run(index: int, question: str) -> CompletionResult:
+            result = CompletionResult(index=index, question=question, success=False)
+            start = time.perf_counter()
+            with span("agent.completion", agent=agent_name, bulk=True) as completion_span:
+                for attempt in range(retries + 1):
+                    result.attempts = attempt + 1
+                    if bucket:
+                        result.queue_wait += bucket.acquire()
+                    try:
+                        completion = call_with_timeout(agent.completion, [{'question': question, 'answer': None}],
+                                                       timeout=timeout)
+                        result.answer = completion.content
+                        result.success = True
+                        result.error = None
+                        break
+                    except FutureTimeoutError:
+                        result.error = f"Timed out after {timeout}s"
+                    except Exception as e:
+                        result.error = str(e)
+                    if attempt < retries:
+                        time.sleep(backoff * 2 ** attempt)
+                completion_span.set(queue_wait=result.queue_wait, attempts=result.attempts, success=result.success)
+            result.duration = time.perf_counter() - start
+            if not result.success:
+                logger.error(f"Failed to get completion from agent {agent_name} "
+                             f"for question {index}: {result.error}",
+                             extra={"batch_id": batch_id, "question_index": index, "attempts": result.attempts,
+                                    "duration_ms": round(result.duration * 1000, 1)})
+            return result
+
+        results: List[Optional[CompletionResult]] = [None] * len(questions)
+        batch_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run, i, q) for i, q in enumerate(questions)]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.index] = result
+
+        succeeded = sum(1 for r in results if r.success)
+        logger.info(f"Bulk completion on {agent_name}: {succeeded}/{len(questions)} succeeded",
+                    extra={"batch_id": batch_id, "questions": len(questions), "succeeded": succeeded,
+                           "duration_ms": round((time.perf_counter() - batch_start) * 1000, 1)})
+        return results
+
     def list_agents(self) -> List[str]:
         """List all available agents"""
         try:
@@ -227,48 +377,54 @@ class AgentManager:
             logger.error(f"Failed to delete agent {agent_name}: {str(e)}")
             return False
 
-# Initialize connection
-connection = MindsDBConnection()
-
-# Initialize managers
-model_manager = ModelManager(connection)
-agent_manager = AgentManager(connection)
-    
-# Create a new OpenAI model
-model_config = ModelConfig(
-    model_type=ModelType.OPENAI,
-    model_name="my_gpt4_model",
-    parameters={
-        'api_key': 'your-api-key',
-        'engine_name': 'gpt-4',
-        'temperature': 0.7,
-        'max_tokens': 2000
-    }
-)
-model = model_manager.create_model(model_config)
-    
-# Create a new agent with SQL skill
-agent_config = AgentConfig(
-    agent_name="sql_assistant",
-    model_name="my_gpt4_model",
-    description="SQL query assistant powered by GPT-4",
-    skills=[
-        {
-            'name': 'sql_skill',
-            'type': 'sql',
-            'parameters': {
-                'database': 'my_database',
-                'tables': ['users', 'orders']
-            }
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    configure_logging(log_file="knowledge_base_loader.log")
+
+    # Initialize connection
+    connection = MindsDBConnection()
+
+    # Initialize managers
+    model_manager = ModelManager(connection)
+    agent_manager = AgentManager(connection)
+
+    # Create a new OpenAI model
+    model_config = ModelConfig(
+        model_type=ModelType.OPENAI,
+        model_name="my_gpt4_model",
+        parameters={
+            'api_key': 'your-api-key',
+            'engine_name': 'gpt-4',
+            'temperature': 0.7,
+            'max_tokens': 2000
         }
-    ]
-)
-agent = agent_manager.create_agent(agent_config)
-    
-# Get a completion from the agent
-if agent:
-    response = agent_manager.get_completion(
-        "sql_assistant",
-        "Write a query to get all users who placed orders in the last 7 days"
     )
-    print(f"Agent response: {response}")
+    model = model_manager.create_model(model_config)
+
+    # Create a new agent with SQL skill
+    agent_config = AgentConfig(
+        agent_name="sql_assistant",
+        model_name="my_gpt4_model",
+        description="SQL query assistant powered by GPT-4",
+        skills=[
+            {
+                'name': 'sql_skill',
+                'type': 'sql',
+                'parameters': {
+                    'database': 'my_database',
+                    'tables': ['users', 'orders']
+                }
+            }
+        ]
+    )
+    agent = agent_manager.create_agent(agent_config)
+
+    # Get a completion from the agent
+    if agent:
+        response = agent_manager.get_completion(
+            "sql_assistant",
+            "Write a query to get all users who placed orders in the last 7 days"
+        )
+        print(f"Agent response: {response}")
@@ -0,0 +1,232 @@
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from patients_db import PATIENT_COLUMNS, get_pool
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Diagnoses seeded by data.sql
+KNOWN_DIAGNOSES = [
+    'Pneumonia', 'Fractured Femur', 'Acute Appendicitis', 'Myocardial Infarction',
+    'Type 2 Diabetes', 'Chronic Kidney Disease', 'Asthma Exacerbation', 'COVID-19',
+    'Hypertensive Crisis', 'Gastroenteritis'
+]
+
+MRN_PATTERN = re.compile(r'\bMRN[\s#:-]*(\d{1,7})\b', re.IGNORECASE)
+ROOM_PATTERN = re.compile(r'\broom(?:\s+number)?[\s#:]*(\d{1,4})\b', re.IGNORECASE)
+DIAGNOSIS_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(d) for d in KNOWN_DIAGNOSES) + r')\b', re.IGNORECASE
+)
+DATE = r'(\d{4}-\d{2}-\d{2})'
+BETWEEN_PATTERN = re.compile(r'\bbetween\s+' + DATE + r'\s+and\s+' + DATE, re.IGNORECASE)
+AFTER_PATTERN = re.compile(r'\b(?:after|since|from)\s+' + DATE, re.IGNORECASE)
+BEFORE_PATTERN = re.compile(r'\b(?:before|until|to)\s+' + DATE, re.IGNORECASE)
+
+# Questions asking for analysis rather than records go to the SQL agent
+OPEN_ENDED_PATTERN = re.compile(
+    r'\b(how many|count|average|mean|most|least|trend|compare|why|explain|'
+    r'summari[sz]e|percent|ratio|distribution|correlat\w*)\b',
+    re.IGNORECASE
+)
+
+MAX_ROWS = 100
+
+
+@dataclass
+class LookupFilters:
+    """Structured filters recognised in a question"""
+    mrn: Optional[str] = None
+    room_number: Optional[str] = None
+    primary_diagnosis: Optional[str] = None
+    admitted_from: Optional[date] = None
+    admitted_to: Optional[date] = None
+
+    def is_empty(self) -> bool:
+        return not any(getattr(self, name) for name in self.__dataclass_fields__)
+
+
+@dataclass
+class LookupResult:
+    """Answer to a routed question"""
+    route: str
+    answer: str
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    duration: float = 0.0
+
+
+def parse_filters(question: str) -> LookupFilters:
+    """
+    Extract structured lookup filters from a question
+    Args:
+        question: Free text question
+    Returns:
+        LookupFilters, empty when nothing structured was found
+    """
+    filters = LookupFilters()
+
+    match = MRN_PATTERN.search(question)
+    if match:
+        filters.mrn = 'MRN' + match.group(1).zfill(6)
+
+    match = ROOM_PATTERN.search(question)
+    if match:
+        filters.room_number = match.group(1)
+
+    match = DIAGNOSIS_PATTERN.search(question)
+    if match:
+        filters.primary_diagnosis = next(
+            d for d in KNOWN_DIAGNOSES if d.lower() == match.group(1).lower()
+        )
+
+    try:
+        match = BETWEEN_PATTERN.search(question)
+        if match:
+            filters.admitted_from = date.fromisoformat(match.group(1))
+            filters.admitted_to = date.fromisoformat(match.group(2))
+        else:
+            match = AFTER_PATTERN.search(question)
+            if match:
+                filters.admitted_from = date.fromisoformat(match.group(1))
+            match = BEFORE_PATTERN.search(question)
+            if match:
+                filters.admitted_to = date.fromisoformat(match.group(1))
+    except ValueError:
+        # Not a real calendar date, leave it to the agent
+        filters.admitted_from = filters.admitted_to = None
+
+    return filters
+
+
+def build_query(filters: LookupFilters) -> Tuple[str, List[Any]]:
+    """
+    Build a parameterised query for the given filters.
+
+    Clauses are always emitted in the same order, so each combination of
+    filters maps to one query text and psycopg reuses its prepared statement.
+    """
+    clauses, params = [], []
+    if filters.mrn:
+        clauses.append('mrn = %s')
+        params.append(filters.mrn)
+    if filters.room_number:
+        clauses.append('room_number = %s')
+        params.append(filters.room_number)
+    if filters.primary_diagnosis:
+        clauses.append('primary_diagnosis = %s')
+        params.append(filters.primary_diagnosis)
+    if filters.admitted_from:
+        clauses.append('admission_date >= %s')
+        params.append(filters.admitted_from)
+    if filters.admitted_to:
+        clauses.append('admission_date < %s::date + 1')
+        params.append(filters.admitted_to)
+
+    query = (
+        f"SELECT {', '.join(PATIENT_COLUMNS)} FROM patients "
+        f"WHERE {' AND '.join(clauses)} ORDER BY admission_date DESC LIMIT {MAX_ROWS}"
+    )
+    return query, params
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    """Render rows as a short plain text answer"""
+    if not rows:
+        return "No matching patients found."
+    lines = []
+    for row in rows:
+        discharge = row['discharge_date'] or 'still admitted'
+        lines.append(
+            f"{row['mrn']}: {row['first_name']} {row['last_name']}, "
+            f"{row['primary_diagnosis']}, room {row['room_number']}, "
+            f"admitted {row['admission_date']:%Y-%m-%d}, discharge {discharge}, "
+            f"insurance {row['insurance_provider']}"
+        )
+    if len(rows) == MAX_ROWS:
+        lines.append(f"(showing the {MAX_ROWS} most recent admissions)")
+    return "\n".join(lines)
+
+
+class QueryRouter:
+    """
+    Answer structured patient lookups straight from Postgres and send
+    everything else to the SQL agent.
+    """
+    def __init__(self, fallback: Callable[[str], str], pool: Any = None):
+        """
+        Args:
+            fallback: Called with the question when it is not a structured lookup
+            pool: psycopg_pool.ConnectionPool, defaults to the shared patients pool
+        """
+        self.fallback = fallback
+        self.pool = pool
+
+    def route(self, question: str) -> Optional[LookupFilters]:
+        """Return the filters to use for a direct lookup, or None for the agent"""
+        if OPEN_ENDED_PATTERN.search(question):
+            return None
+        filters = parse_filters(question)
+        return None if filters.is_empty() else filters
+
+    def lookup(self, filters: LookupFilters) -> List[Dict[str, Any]]:
+        """Run a direct lookup using a pooled connection and a prepared statement"""
+        from psycopg.rows import dict_row
+
+        query, params = build_query(filters)
+        pool = self.pool or get_pool()
+        with span("db.query", operation="patients.lookup") as query_span, pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(query, params, prepare=True)
+                rows = cur.fetchall()
+            query_span.set(rows=len(rows))
+            return rows
+
+    def ask(self, question: str) -> LookupResult:
+        """
+        Answer a question, directly when possible
+        Args:
+            question: Free text question about patients
+        Returns:
+            LookupResult with the route taken and the answer text
+        """
+        start = time.perf_counter()
+        filters = self.route(question)
+        if filters is not None:
+            try:
+                rows = self.lookup(filters)
+                return LookupResult(route='sql', answer=format_rows(rows), rows=rows,
+                                    duration=time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Direct lookup failed, falling back to agent: {str(e)}")
+
+        answer = self.fallback(question)
+        return LookupResult(route='agent', answer=answer, duration=time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import mindsdb_sdk
+    from psql_agent import AgentRegistry
+    from patients_db import PATIENTS_CONNECTION_ARGS
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    registry = AgentRegistry(mindsdb_sdk.connect())
+    router = QueryRouter(
+        lambda q: registry.ask(PATIENTS_CONNECTION_ARGS, q, tables=['patients'])
+    )
+
+    for question in [
+        'Look up MRN000042',
+        'Who is in room 312?',
+        'Show pneumonia patients admitted after 2024-11-01',
+        'Which diagnosis has the longest average stay?'
+    ]:
+        result = router.ask(question)
+        print(f"[{result.route} {result.duration * 1000:.1f}ms] {question}\n{result.answer}\n")
+
+    registry.close()
@@ -0,0 +1,189 @@
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from patients_db import PATIENT_COLUMNS, get_pool
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = 'patients_staging'
+
+
+def record_from_extraction(info: Dict[str, str], mrn: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Map the fields extracted by main.py onto patients table columns
+    Args:
+        info: Extracted key/value pairs, keys may still carry quotes from the LLM output
+        mrn: Medical record number, overrides any MRN found in the extraction
+    Returns:
+        Record keyed by patients column names, leaving out fields that were not extracted
+    """
+    clean = {
+        key.strip().strip('"\',').lower(): value.strip().strip('"\',')
+        for key, value in info.items()
+    }
+    first_name, _, last_name = clean.get('name', '').partition(' ')
+    record = {
+        'first_name': first_name or None,
+        'last_name': last_name or None,
+        'primary_diagnosis': clean.get('condition') or clean.get('reason_for_visit') or None
+    }
+    return {'mrn': mrn or clean.get('mrn'), **{key: value for key, value in record.items() if value}}
+
+
+class PatientSink:
+    """
+    Bulk writer for the patients table.
+
+    Records are buffered and written a batch at a time with COPY into a
+    temporary staging table, then merged into patients with an upsert on mrn.
+    An upsert sets exactly the columns present in the record: a column given
+    as None is cleared, e.g. discharge_date on readmission, and a column left
+    out keeps its stored value.
+    """
+    def __init__(
+        self,
+        pool: Any = None,
+        batch_size: int = 5000,
+        commit_every: int = 10
+    ):
+        """
+        Args:
+            pool: psycopg_pool.ConnectionPool, defaults to the shared patients pool
+            batch_size: Records per COPY batch
+            commit_every: Batches written between commits
+        """
+        self.pool = pool or get_pool()
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.written = 0
+        self.skipped = 0
+        self.batches = 0
+        self.sink_id = uuid.uuid4().hex[:12]
+        self._buffer: List[Dict[str, Any]] = []
+        self._pending_batches = 0
+        self._conn = None
+
+    def __enter__(self) -> 'PatientSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(commit=exc_type is None)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Buffer a single record keyed by column name, writing a batch once the buffer is full"""
+        if not record.get('mrn'):
+            self.skipped += 1
+            return
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Buffer many records"""
+        for record in records:
+            self.add(record)
+
+    def flush(self) -> None:
+        """Write buffered records and commit if the commit interval was reached"""
+        if not self._buffer:
+            return
+        # ON CONFLICT cannot touch the same row twice in one statement, so
+        # merge the records for each mrn in the batch, later fields winning.
+        merged: Dict[str, Dict[str, Any]] = {}
+        for record in self._buffer:
+            merged.setdefault(record['mrn'], {}).update(record)
+        batch = list(merged.values())
+        self._buffer = []
+
+        # One COPY and upsert per set of columns present, so absent columns are left alone
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for record in batch:
+            groups.setdefault(tuple(column for column in PATIENT_COLUMNS if column in record), []).append(record)
+
+        start = time.perf_counter()
+        conn = self._connection()
+        with span("db.query", operation="patients.upsert", rows=len(batch)), conn.cursor() as cur:
+            for present, records in groups.items():
+                columns = ', '.join(present)
+                updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in present if column != 'mrn')
+                on_conflict = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+                with cur.copy(f'COPY {STAGING_TABLE} ({columns}) FROM STDIN') as copy:
+                    for record in records:
+                        copy.write_row([record[column] for column in present])
+                cur.execute(
+                    f'INSERT INTO patients ({columns}) SELECT {columns} FROM {STAGING_TABLE} '
+                    f'ON CONFLICT (mrn) {on_conflict}'
+                )
+                cur.execute(f'TRUNCATE {STAGING_TABLE}')
+
+        self.written += len(batch)
+        self._pending_batches += 1
+        if self._pending_batches >= self.commit_every:
+            conn.commit()
+            self._pending_batches = 0
+        self.batches += 1
+        logger.info(f"Wrote {len(batch)} patient records in {time.perf_counter() - start:.3f}s",
+                    extra={"batch_id": f"{self.sink_id}-{self.batches}", "rows": len(batch),
+                           "duration_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Flush remaining records and return the connection to the pool.
+        If the flush or commit fails, the open transaction is rolled back and the error re-raised.
+        Args:
+            commit: Write and commit what is buffered; False discards it and rolls back
+        """
+        try:
+            if commit:
+                self.flush()
+                if self._conn is not None:
+                    self._conn.commit()
+        finally:
+            self._buffer = []
+            self._pending_batches = 0
+            conn, self._conn = self._conn, None
+            if conn is not None:
+                try:
+                    # A no-op after the commit above, otherwise it discards the open transaction
+                    conn.rollback()
+                finally:
+                    self.pool.putconn(conn)
+
+    def _connection(self) -> Any:
+        if self._conn is None:
+            self._conn = self.pool.getconn()
+            self._conn.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} AS '
+                f'SELECT {", ".join(PATIENT_COLUMNS)} FROM patients WITH NO DATA'
+            )
+        return self._conn
+
+
+if __name__ == "__main__":
+    import random
+    from datetime import datetime, timedelta
+
+    from logging_setup import configure_logging
+
+    configure_logging(level="WARNING")
+
+    def synthetic_records(count: int) -> Iterable[Dict[str, Any]]:
+        now = datetime.now()
+        for i in range(count):
+            yield {
+                'mrn': 'MRN' + str(100000 + i).zfill(6),
+                'first_name': random.choice(['Mary', 'John', 'Linda', 'David']),
+                'last_name': random.choice(['Smith', 'Lee', 'Garcia', 'Brown']),
+                'admission_date': now - timedelta(days=random.randint(0, 30)),
+                'primary_diagnosis': random.choice(['Pneumonia', 'Asthma Exacerbation']),
+                'insurance_provider': random.choice(['Aetna', 'Medicare']),
+                'room_number': str(random.randint(101, 599))
+            }
+
+    start = time.perf_counter()
+    with PatientSink() as sink:
+        sink.write(synthetic_records(100_000))
+    print(f"Loaded {sink.written} records in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,56 @@
+import os
+import threading
+from typing import Any, Optional
+
+# Local Postgres started by db.bash and seeded with data.sql
+PATIENTS_CONNECTION_ARGS = {
+    "user": "postgres",
+    "password": "mysecretpassword",
+    "host": "localhost",
+    "port": "5432",
+    "database": "postgres",
+    "schema": "public"
+}
+
+# Columns of the patients table defined in data.sql, in table order
+PATIENT_COLUMNS = [
+    'mrn', 'first_name', 'last_name', 'date_of_birth', 'gender', 'blood_type',
+    'admission_date', 'discharge_date', 'primary_diagnosis', 'insurance_provider',
+    'room_number'
+]
+
+PATIENTS_DSN = os.getenv(
+    "PATIENTS_DSN",
+    "postgresql://{user}:{password}@{host}:{port}/{database}".format(**PATIENTS_CONNECTION_ARGS)
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(dsn: Optional[str] = None, min_size: int = 1, max_size: int = 10) -> Any:
+    """
+    Get the process-wide connection pool for the patients database
+    Args:
+        dsn: Connection string, defaults to PATIENTS_DSN
+        min_size: Connections opened up front
+        max_size: Upper bound on open connections
+    Returns:
+        A psycopg_pool.ConnectionPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from psycopg_pool import ConnectionPool
+            _pool = ConnectionPool(dsn or PATIENTS_DSN, min_size=min_size,
+                                   max_size=max_size, open=True)
+        return _pool
+
+
+def close_pool() -> None:
+    """Close the shared pool, if one was opened"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction or the quality check changes, so old cache entries are ignored
+EXTRACTOR_VERSION = 2
+
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdf_cache"))
+
+# Fastest first; the first backend whose output passes the quality check wins
+DEFAULT_BACKENDS = ("pypdf2", "pdfminer", "pdfplumber")
+
+
+@dataclass
+class PdfExtraction:
+    """Result of extracting text from one PDF"""
+    success: bool
+    file_path: str
+    backend: Optional[str] = None
+    pages: List[str] = field(default_factory=list)
+    cached: bool = False
+    error: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+
+def _pages_pypdf2(path: str) -> List[str]:
+    import PyPDF2
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+def _pages_pdfminer(path: str) -> List[str]:
+    from pdfminer.high_level import extract_text
+    # pdfminer ends every page with a form feed, so the last split is empty
+    pages = extract_text(path).split("\f")
+    return pages[:-1] if pages and not pages[-1].strip() else pages
+
+
+def _pages_pdfplumber(path: str) -> List[str]:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+BACKENDS = {
+    "pypdf2": _pages_pypdf2,
+    "pdfminer": _pages_pdfminer,
+    "pdfplumber": _pages_pdfplumber,
+}
+
+
+def passes_quality_check(pages: Sequence[str], min_chars_per_page: int = 20) -> bool:
+    """
+    Reject extractions that are empty, mostly unmapped glyphs or mostly noise
+    Args:
+        pages: Extracted text per page
+        min_chars_per_page: Average non-whitespace characters required per page
+    Returns:
+        True if the text looks usable
+    """
+    text = "".join(pages)
+    visible = [c for c in text if not c.isspace()]
+    if not pages or len(visible) < min_chars_per_page * len(pages):
+        return False
+    garbage = text.count("�") + text.count("(cid:") * 5
+    if garbage / len(visible) > 0.05:
+        return False
+    readable = sum(1 for c in visible if c.isalnum() or c in ".,;:!?'\"()-%/")
+    return readable / len(visible) >= 0.7
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(digest: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{digest}.v{EXTRACTOR_VERSION}.json")
+
+
+def load_cached(path: str, cache_dir: str = CACHE_DIR, digest: Optional[str] = None) -> Optional[PdfExtraction]:
+    """Cached extraction for a file's current contents, or None"""
+    cache_file = _cache_path(digest or file_hash(path), cache_dir)
+    if not os.path.exists(cache_file):
+        return None
+    with open(cache_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.update(file_path=path, cached=True)
+    return PdfExtraction(**data)
+
+
+def extract_pdf(
+    path: str,
+    backends: Sequence[str] = DEFAULT_BACKENDS,
+    cache_dir: str = CACHE_DIR,
+    use_cache: bool = True
+) -> PdfExtraction:
+    """
+    Extract text from a PDF with the fastest backend that gives usable text
+    Args:
+        path: PDF file
+        backends: Backend names to try, in order
+        cache_dir: Directory of cached results keyed by file hash
+        use_cache: Whether to read and write the cache
+    Returns:
+        PdfExtraction with per-page text
+    """
+    start = time.perf_counter()
+    digest = file_hash(path)
+    if use_cache:
+        with span("pdf.cache_lookup") as lookup_span:
+            cached = load_cached(path, cache_dir, digest)
+            lookup_span.set(cache_hit=cached is not None)
+        if cached:
+            return cached
+
+    fallback: Optional[PdfExtraction] = None
+    passed = False
+    errors = []
+    for name in backends:
+        try:
+            with span("pdf.parse", backend=name) as parse_span:
+                pages = BACKENDS[name](path)
+                parse_span.set(pages=len(pages))
+        except Exception as e:
+            errors.append(f"{name}: {str(e)}")
+            continue
+        result = PdfExtraction(success=True, file_path=path, backend=name, pages=pages)
+        if passes_quality_check(pages):
+            passed = True
+            break
+        # Keep the first readable output in case nothing passes
+        fallback = fallback or result
+        result = None
+    else:
+        result = fallback
+
+    if result is None:
+        logger.error(f"Failed to extract {path}: {'; '.join(errors)}", extra={"file_id": digest[:16]})
+        return PdfExtraction(success=False, file_path=path, error="; ".join(errors) or "No backend produced text")
+
+    # A fallback that failed the quality check is not cached, so the next call retries
+    if use_cache and passed:
+        os.makedirs(cache_dir, exist_ok=True)
+        data = asdict(result)
+        del data["file_path"], data["cached"]
+        tmp_file = _cache_path(digest, cache_dir) + f".{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, _cache_path(digest, cache_dir))
+    logger.info(f"Extracted {len(result.pages)} pages from {path} with {result.backend}",
+                extra={"file_id": digest[:16], "backend": result.backend, "pages": len(result.pages),
+                       "duration_ms": round((time.perf_counter() - start) * 1000, 1)})
+    return result
+
+
+def extract_pdfs(
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    backends: Sequence[str] = DEFAULT_BACKENDS,
+    cache_dir: str = CACHE_DIR
+) -> Dict[str, PdfExtraction]:
+    """
+    Extract many PDFs, serving unchanged files from the cache and parsing the rest in a process pool
+    Args:
+        paths: PDF files
+        workers: Worker processes, defaults to all cores
+        backends: Backend names to try, in order
+        cache_dir: Directory of cached results
+    Returns:
+        Mapping of path to PdfExtraction
+    """
+    results: Dict[str, PdfExtraction] = {}
+    pending = []
+    for path in paths:
+        cached = load_cached(path, cache_dir)
+        if cached:
+            results[path] = cached
+        else:
+            pending.append(path)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(len(pending), workers or os.cpu_count() or 1)) as executor:
+            for path, result in zip(pending, executor.map(
+                extract_pdf, pending,
+                [tuple(backends)] * len(pending),
+                [cache_dir] * len(pending)
+            )):
+                results[path] = result
+    return results
+
+
+def extract_directory(directory: str, **kwargs) -> Dict[str, PdfExtraction]:
+    """Extract every PDF in a directory, see extract_pdfs"""
+    paths = sorted(str(p) for p in Path(directory).iterdir() if p.suffix.lower() == ".pdf")
+    return extract_pdfs(paths, **kwargs)
+
+
+if __name__ == "__main__":
+    import sys
+    from logging_setup import configure_logging
+
+    configure_logging(log_file=os.getenv("LOG_FILE", "pdf_extract.log"))
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "data")
+    start = time.perf_counter()
+    results = extract_directory(directory)
+    cached = sum(1 for r in results.values() if r.cached)
+    failed = sum(1 for r in results.values() if not r.success)
+    print(f"Extracted {len(results)} PDFs ({cached} cached, {failed} failed) in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,322 @@
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from telemetry import register_route
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+# Labels become file names, so they are limited to one path component
+LABEL_PATTERN = re.compile(r"[\w.-]+")
+
+# Streamlit runs each rerun of a page script on a thread with this name prefix
+STREAMLIT_THREAD_PREFIX = "ScriptRunner"
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class RequestProfile:
+    """Stack samples taken while one request was running"""
+    label: str
+    thread: str
+    started: float = field(default_factory=time.time)
+    duration: float = 0.0
+    samples: Counter = field(default_factory=Counter)
+
+    def summary(self) -> Dict[str, object]:
+        return {"label": self.label, "thread": self.thread, "started": self.started,
+                "duration_ms": round(self.duration * 1000, 1), "samples": sum(self.samples.values())}
+
+
+def frame_stack(frame, max_depth: int = 64) -> str:
+    """
+    Collapse a frame and its callers into "outer;...;inner", one entry per function
+    Args:
+        frame: Innermost frame
+        max_depth: Frames kept, counted from the innermost
+    Returns:
+        Stack in the format read by flamegraph.pl and speedscope
+    """
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of running requests from a background thread.
+
+    While disabled there is no sampler thread and `request` only checks a
+    flag, so instrumented code runs at full speed. While enabled, the thread
+    wakes every `interval` seconds, reads the stacks of the threads currently
+    inside `request` (and of Streamlit script threads), and counts them per
+    request. Finished requests are kept in a bounded list and can be written
+    out as collapsed stacks for flame graphs. Sampling at the default 10 ms
+    costs well under 1% of one core.
+    """
+    def __init__(self, interval: float = 0.01, max_depth: int = 64, keep: int = 200,
+                 sample_streamlit: bool = True):
+        """
+        Args:
+            interval: Seconds between samples
+            max_depth: Frames kept per stack
+            keep: Finished request profiles kept in memory
+            sample_streamlit: Also sample Streamlit script threads, one profile per rerun
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.sample_streamlit = sample_streamlit
+        self.enabled = False
+        self.torch_enabled = False
+        self.finished: Deque[RequestProfile] = deque(maxlen=keep)
+        self._active: Dict[int, RequestProfile] = {}
+        self._reruns: Dict[int, RequestProfile] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self) -> None:
+        with self._lock:
+            if self.enabled:
+                return
+            self.enabled = True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Sampling profiler enabled, every {self.interval * 1000:.0f} ms")
+
+    def disable(self) -> None:
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        thread.join(timeout=1.0)
+        with self._lock:
+            for profile in self._reruns.values():
+                self._finish(profile)
+            self._reruns.clear()
+        logger.info("Sampling profiler disabled")
+
+    @contextmanager
+    def request(self, label: str) -> Iterator[Optional[RequestProfile]]:
+        """
+        Attribute samples taken on this thread to one request
+        Args:
+            label: Request kind, becomes the root frame of its stacks
+        Returns:
+            The request's profile, or None while the profiler is off
+        """
+        if not self.enabled:
+            yield None
+            return
+        ident = threading.get_ident()
+        profile = RequestProfile(label, threading.current_thread().name)
+        with self._lock:
+            outer = self._active.get(ident)
+            self._active[ident] = profile
+        try:
+            yield profile
+        finally:
+            with self._lock:
+                if outer is None:
+                    self._active.pop(ident, None)
+                else:
+                    self._active[ident] = outer
+                self._finish(profile)
+
+    def collapsed(self, label: Optional[str] = None) -> str:
+        """
+        Collapsed stacks of finished requests, one "stack count" line each
+        Args:
+            label: Only requests with this label, None for all
+        Returns:
+            Text for flamegraph.pl, inferno or speedscope
+        """
+        totals: Counter = Counter()
+        with self._lock:
+            for profile in self.finished:
+                if label is None or profile.label == label:
+                    for stack, count in profile.samples.items():
+                        totals[f"{profile.label};{stack}"] += count
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+    def write(self, label: Optional[str] = None, directory: str = PROFILE_DIR) -> str:
+        """Save collapsed stacks to a file in `directory` and return its path"""
+        name = label or "all"
+        if not LABEL_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid profile label {name!r}")
+        directory = os.path.realpath(directory)
+        path = os.path.realpath(os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"))
+        if os.path.dirname(path) != directory:
+            raise ValueError(f"Invalid profile label {name!r}")
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.collapsed(label))
+        return path
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            recent = [profile.summary() for profile in list(self.finished)[-20:]]
+        return {"enabled": self.enabled, "torch_enabled": self.torch_enabled,
+                "interval_ms": self.interval * 1000, "recent": recent}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.finished.clear()
+
+    def _finish(self, profile: RequestProfile) -> None:
+        # Called with the lock held
+        profile.duration = time.time() - profile.started
+        if profile.samples:
+            self.finished.append(profile)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()} if self.sample_streamlit else {}
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    profile = self._active.get(ident)
+                    if profile is None and names.get(ident, "").startswith(STREAMLIT_THREAD_PREFIX):
+                        profile = self._reruns.get(ident)
+                        if profile is None:
+                            profile = self._reruns[ident] = RequestProfile("streamlit.rerun", names[ident])
+                    if profile is not None:
+                        profile.samples[frame_stack(frame, self.max_depth)] += 1
+                # A script thread that is gone has finished its rerun
+                for ident in [ident for ident in self._reruns if ident not in frames]:
+                    self._finish(self._reruns.pop(ident))
+
+
+profiler = SamplingProfiler(interval=float(os.getenv("PROFILING_INTERVAL_MS", "10")) / 1000)
+profile_request = profiler.request
+
+
+@contextmanager
+def torch_profile(label: str) -> Iterator[None]:
+    """
+    Record the torch operators run inside the block when torch profiling is on,
+    saving a Chrome trace to PROFILE_DIR and logging the most expensive operators
+    Args:
+        label: Name of the block, used in the trace file name
+    """
+    if not profiler.torch_enabled:
+        yield
+        return
+    import torch
+    from torch.profiler import ProfilerActivity, profile, record_function
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    with profile(activities=activities, record_shapes=True) as prof:
+        with record_function(label):
+            yield
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json")
+        prof.export_chrome_trace(path)
+        sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        logger.info(f"Torch profile of {label} saved to {path}\n"
+                    f"{prof.key_averages().table(sort_by=sort_by, row_limit=15)}")
+    except Exception as e:
+        logger.error(f"Failed to save torch profile: {str(e)}")
+
+
+def _authorized(headers: Dict[str, str]) -> bool:
+    # Changes need "Authorization: Bearer <PROFILING_ADMIN_TOKEN>"; without a token set they are refused
+    token = os.getenv("PROFILING_ADMIN_TOKEN", "")
+    supplied = headers.get("authorization", "")
+    return bool(token) and hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+
+def _admin_route(method: str, query: Dict[str, str], headers: Dict[str, str]) -> Tuple[int, str, str]:
+    """
+    /profiling on the metrics server:
+        GET                       status and recent requests
+        GET  ?format=collapsed    collapsed stacks, optionally &label=...
+        POST ?action=start|stop|torch_start|torch_stop|reset|save, with the admin token
+    """
+    if method == "GET":
+        if query.get("format") == "collapsed":
+            return 200, profiler.collapsed(query.get("label")), "text/plain"
+        return 200, json.dumps(profiler.status()), "application/json"
+    if not _authorized(headers):
+        return 403, json.dumps({"error": "Missing or wrong admin token"}), "application/json"
+    action = query.get("action")
+    if action == "start":
+        profiler.enable()
+    elif action == "stop":
+        profiler.disable()
+    elif action == "torch_start":
+        profiler.torch_enabled = True
+    elif action == "torch_stop":
+        profiler.torch_enabled = False
+    elif action == "reset":
+        profiler.reset()
+    elif action == "save":
+        try:
+            return 200, json.dumps({"path": profiler.write(query.get("label"))}), "application/json"
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}), "application/json"
+    else:
+        return 400, json.dumps({"error": f"Unknown action {action}"}), "application/json"
+    return 200, json.dumps(profiler.status()), "application/json"
+
+
+register_route("/profiling", _admin_route)
+
+if _env_flag("PROFILING"):
+    profiler.enable()
+profiler.torch_enabled = _env_flag("PROFILING_TORCH")
+
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    def busy(n):
+        return sum(i * i for i in range(n))
+
+    def handle(n):
+        with profile_request("demo"):
+            busy(n)
+            "".join(str(i) for i in range(n))
+
+    start = time.perf_counter()
+    for _ in range(50):
+        handle(100_000)
+    off = time.perf_counter() - start
+
+    profiler.enable()
+    start = time.perf_counter()
+    for _ in range(50):
+        handle(100_000)
+    on = time.perf_counter() - start
+    profiler.disable()
+
+    print(profiler.collapsed()[:800])
+    print(f"off {off * 1000:.0f} ms, on {on * 1000:.0f} ms, overhead {(on / off - 1) * 100:.1f}%")
@@ -1,41 +1,273 @@
-import mindsdb_sdk
-from uuid import uuid4
-import os
-
-con = mindsdb_sdk.connect()
-
-print(con.models.list())
-
-model_name = 'kb_default_embedding_model'
-
-# Now create an agent that will use the model we just created.
-agent = con.agents.create(name=f'mindsdb_sql_agent_{model_name}_{uuid4().hex}',
-                          model=model_name)
-
-# Set up a Postgres data source with our new agent.
-data_source = 'postgres'
-connection_args = {
-    "user": "demo_user",
-    "password": "demo_password",
-    "host": "samples.mindsdb.com",
-    "port": "5432",
-    "database": "demo",
-    "schema": "demo_data"
-}
-description = 'mindsdb demo database'
-database = con.databases.create(
-    f'mindsdb_sql_agent_datasource_{uuid4().hex}',
-    data_source,
-    connection_args
-)
-
-# Actually connect the agent to the datasource.
-agent.add_database(database.name, [], description)
-
-
-question = 'How many three-bedroom houses were sold in 2008?'
-answer = agent.completion([{'question': question, 'answer': None}])
-print(answer.content)
-
-con.databases.drop(database.name)
-con.agents.drop(agent.name)
\ No newline at end of file
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from patients_db import PATIENTS_CONNECTION_ARGS
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RegisteredAgent:
+    """A datasource and the agent connected to it, shared between callers"""
+    key: str
+    agent: Any
+    database: Any
+    tables: List[str]
+    refcount: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def name(self) -> str:
+        return self.agent.name
+
+
+class AgentRegistry:
+    """
+    Long-lived registry of SQL agents keyed by datasource connection args.
+
+    The first question against a datasource creates the datasource and the
+    agent; later questions reuse both. Entries are reference counted and
+    dropped from MindsDB once they have been idle for `idle_timeout` seconds.
+
+    MindsDB calls are made outside the registry lock, under a lock per key,
+    so a slow datasource does not hold up questions against the others, and
+    an acquire racing with the collector waits for the drop to finish before
+    creating the datasource again under the same name.
+    """
+    def __init__(
+        self,
+        con: Any,
+        model_name: str = 'kb_default_embedding_model',
+        idle_timeout: float = 600.0,
+        schema_ttl: float = 3600.0
+    ):
+        """
+        Args:
+            con: Connected mindsdb_sdk server
+            model_name: Model the SQL agents are created with
+            idle_timeout: Seconds an unused entry is kept before being dropped
+            schema_ttl: Seconds table metadata is cached per datasource
+        """
+        self.con = con
+        self.model_name = model_name
+        self.idle_timeout = idle_timeout
+        self.schema_ttl = schema_ttl
+        self._entries: Dict[str, RegisteredAgent] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._schemas: Dict[str, Any] = {}
+        self._schema_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._gc_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def make_key(engine: str, connection_args: Dict[str, Any], model_name: str) -> str:
+        """Stable key for a datasource, independent of argument order"""
+        payload = json.dumps([engine, connection_args, model_name], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def acquire(
+        self,
+        connection_args: Dict[str, Any],
+        engine: str = 'postgres',
+        description: str = '',
+        tables: Optional[List[str]] = None
+    ) -> RegisteredAgent:
+        """
+        Get the agent for a datasource, creating it on first use
+
+        Args:
+            connection_args: Datasource connection arguments
+            engine: MindsDB integration engine of the datasource
+            description: Description passed to the agent with the datasource
+            tables: Tables the agent may use, defaults to every table
+
+        Returns:
+            The registered agent, with its reference count incremented
+        """
+        key = self.make_key(engine, connection_args, self.model_name)
+        with self._lock:
+            entry = self._checkout(key)
+            if entry is not None:
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._checkout(key)
+                if entry is not None:
+                    return entry
+            entry = self._register(key, engine, connection_args, description, tables)
+            with self._lock:
+                self._entries[key] = entry
+                return self._checkout(key)
+
+    def _checkout(self, key: str) -> Optional[RegisteredAgent]:
+        # Called with the lock held
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.refcount += 1
+            entry.last_used = time.monotonic()
+        return entry
+
+    def release(self, entry: RegisteredAgent) -> None:
+        """Give back an agent obtained from acquire"""
+        with self._lock:
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def lease(self, connection_args: Dict[str, Any], **kwargs) -> Iterator[RegisteredAgent]:
+        """Context manager pairing acquire and release"""
+        entry = self.acquire(connection_args, **kwargs)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def ask(self, connection_args: Dict[str, Any], question: str, **kwargs) -> str:
+        """Ask a question against a datasource, reusing its agent"""
+        with span('agent.completion', agent='sql'), self.lease(connection_args, **kwargs) as entry:
+            answer = entry.agent.completion([{'question': question, 'answer': None}])
+            return answer.content
+
+    def get_tables(self, database: Any, key: str) -> List[str]:
+        """
+        Table names of a datasource, served from the schema cache when fresh.
+        The cache outlives dropped entries, so a datasource registered again
+        after going idle does not list its tables again.
+        """
+        with self._schema_lock:
+            cached = self._schemas.get(key)
+        if cached and time.monotonic() - cached[1] < self.schema_ttl:
+            return cached[0]
+        tables = [table.name for table in database.tables.list()]
+        with self._schema_lock:
+            self._schemas[key] = (tables, time.monotonic())
+        return tables
+
+    def collect_idle(self) -> int:
+        """Drop entries that are unused and idle past the timeout, returning how many"""
+        with self._lock:
+            now = time.monotonic()
+            idle = [
+                key for key, entry in self._entries.items()
+                if entry.refcount == 0 and now - entry.last_used >= self.idle_timeout
+            ]
+        dropped = 0
+        for key in idle:
+            # An acquire may have taken the entry since, so check again under the key lock
+            dropped += self._drop_key(key, lambda entry: (
+                entry.refcount == 0 and time.monotonic() - entry.last_used >= self.idle_timeout
+            ))
+        return dropped
+
+    def start_gc(self, interval: float = 60.0) -> None:
+        """Run collect_idle periodically on a daemon thread"""
+        if self._gc_thread and self._gc_thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.collect_idle()
+                except Exception as e:
+                    logger.error(f"Failed to collect idle agents: {str(e)}")
+
+        self._gc_thread = threading.Thread(target=loop, name='agent-registry-gc', daemon=True)
+        self._gc_thread.start()
+
+    def close(self) -> None:
+        """Stop the collector and drop every registered agent and datasource"""
+        self._stop.set()
+        with self._lock:
+            keys = list(self._entries)
+        for key in keys:
+            self._drop_key(key, lambda entry: True)
+
+    def _drop_key(self, key: str, should_drop) -> bool:
+        # Holding the key lock through the drop makes a concurrent acquire wait for it
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or not should_drop(entry):
+                    return False
+                del self._entries[key]
+            self._drop(entry)
+        return True
+
+    def _register(
+        self,
+        key: str,
+        engine: str,
+        connection_args: Dict[str, Any],
+        description: str,
+        tables: Optional[List[str]]
+    ) -> RegisteredAgent:
+        # Names derive from the key so a restarted process picks up the
+        # datasource and agent it created before instead of duplicating them.
+        database_name = f'mindsdb_sql_agent_datasource_{key}'
+        agent_name = f'mindsdb_sql_agent_{self.model_name}_{key}'
+
+        try:
+            database = self.con.databases.get(database_name)
+        except Exception:
+            database = self.con.databases.create(database_name, engine, connection_args)
+
+        if tables is None:
+            tables = self.get_tables(database, key)
+
+        try:
+            agent = self.con.agents.get(agent_name)
+        except Exception:
+            agent = self.con.agents.create(name=agent_name, model=self.model_name)
+            agent.add_database(database.name, tables, description)
+
+        logger.info(f"Registered agent {agent_name} on datasource {database_name}")
+        return RegisteredAgent(key=key, agent=agent, database=database, tables=tables)
+
+    def _drop(self, entry: RegisteredAgent) -> None:
+        # The datasource is dropped even if the agent could not be
+        try:
+            self.con.agents.drop(entry.agent.name)
+            logger.info(f"Dropped agent {entry.agent.name}")
+        except Exception as e:
+            logger.error(f"Failed to drop agent {entry.agent.name}: {str(e)}")
+        try:
+            self.con.databases.drop(entry.database.name)
+        except Exception as e:
+            logger.error(f"Failed to drop datasource {entry.database.name}: {str(e)}")
+
+
+if __name__ == "__main__":
+    import mindsdb_sdk
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    con = mindsdb_sdk.connect()
+    registry = AgentRegistry(con)
+
+    questions = [
+        'How many patients are currently admitted?',
+        'Which primary diagnosis is the most common?',
+        'How many patients are covered by Medicare?'
+    ]
+    description = 'hospital patients database'
+    for question in questions:
+        # Only the first question pays for datasource and agent setup.
+        start = time.perf_counter()
+        answer = registry.ask(PATIENTS_CONNECTION_ARGS, question,
+                              description=description, tables=['patients'])
+        print(f"[{time.perf_counter() - start:.2f}s] {question}\n{answer}")
+
+    registry.close()
@@ -0,0 +1,358 @@
+import io
+import logging
+import math
+import os
+import threading
+import wave
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+@dataclass
+class TranscriptEvent:
+    """Partial or final transcription of one utterance"""
+    utterance_id: int
+    text: str
+    final: bool
+    start_ms: int
+    end_ms: int
+
+
+def iter_wav_frames(path: str, frame_ms: int = 30) -> Iterator[bytes]:
+    """
+    Read a mono 16-bit WAV file as fixed-size PCM frames
+    Args:
+        path: WAV file
+        frame_ms: Frame length in milliseconds (10, 20 or 30 for webrtcvad)
+    """
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{path} must be mono 16-bit PCM")
+        samples = wav.getframerate() * frame_ms // 1000
+        while True:
+            frame = wav.readframes(samples)
+            if len(frame) < samples * SAMPLE_WIDTH:
+                return
+            yield frame
+
+
+def wav_sample_rate(path: str) -> int:
+    with wave.open(path, "rb") as wav:
+        return wav.getframerate()
+
+
+class EnergyVAD:
+    """Voice activity detection by frame RMS energy, with no dependencies"""
+
+    def __init__(self, threshold: float = 500.0):
+        """
+        Args:
+            threshold: RMS level of 16-bit samples above which a frame counts as speech
+        """
+        self.threshold = threshold
+
+    def is_speech(self, frame: bytes, sample_rate: int) -> bool:
+        samples = array("h", frame)
+        if not samples:
+            return False
+        return math.sqrt(sum(s * s for s in samples) / len(samples)) >= self.threshold
+
+
+class WebRtcVAD:
+    """Voice activity detection with webrtcvad, more robust to background noise"""
+
+    def __init__(self, aggressiveness: int = 2):
+        import webrtcvad
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: bytes, sample_rate: int) -> bool:
+        return self.vad.is_speech(frame, sample_rate)
+
+
+class SphinxBackend:
+    """Offline recognition through speech_recognition's PocketSphinx binding"""
+
+    def __init__(self, language: str = "en-US"):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.language = language
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        audio = self.sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+        try:
+            return self.recognizer.recognize_sphinx(audio, language=self.language)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class VoskBackend:
+    """Offline recognition with a local Vosk model"""
+
+    def __init__(self, model_path: str):
+        from vosk import Model
+        self.model = Model(model_path)
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        import json
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+class StreamingTranscriber:
+    """
+    Turn a stream of PCM frames into partial and final transcripts.
+
+    Frames are fed from the capture side; voice activity detection runs
+    inline because it is cheap, while recognition is handed to a worker pool.
+    While an utterance is in progress its audio so far is re-recognized every
+    `partial_ms` to produce partial results; when `silence_ms` of silence ends
+    it, the whole utterance is recognized once more as the final result.
+    Partial results that arrive after a newer one are dropped.
+    """
+    def __init__(
+        self,
+        backend,
+        on_event: Callable[[TranscriptEvent], None],
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        vad=None,
+        start_frames: int = 3,
+        silence_ms: int = 600,
+        partial_ms: int = 1000,
+        padding_ms: int = 300,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        """
+        Args:
+            backend: Object with transcribe(pcm, sample_rate) -> str
+            on_event: Called with every TranscriptEvent, from a worker thread
+            sample_rate: Sample rate of the frames
+            frame_ms: Length of each frame fed in
+            vad: Object with is_speech(frame, sample_rate), defaults to EnergyVAD
+            start_frames: Consecutive speech frames that open an utterance
+            silence_ms: Silence that closes an utterance
+            partial_ms: Speech between partial results
+            padding_ms: Audio kept from before the utterance started
+            executor: Worker pool for recognition, shared between sessions if given
+        """
+        self.backend = backend
+        self.on_event = on_event
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.vad = vad or EnergyVAD()
+        self.start_frames = start_frames
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.partial_frames = max(1, partial_ms // frame_ms)
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="speech")
+        self.lock = threading.Lock()
+
+        self._padding: Deque[bytes] = deque(maxlen=max(start_frames, padding_ms // frame_ms))
+        self._utterance: Optional[List[bytes]] = None
+        self._utterance_id = 0
+        self._start_frame = 0
+        self._frame_index = 0
+        self._speech_run = 0
+        self._silence_run = 0
+        self._since_partial = 0
+        self._latest_partial: Dict[int, int] = {}
+        self._finalized: Set[int] = set()
+        self._pending: List[Future] = []
+
+    def feed(self, frame: bytes) -> None:
+        """Push one frame of audio"""
+        speech = self.vad.is_speech(frame, self.sample_rate)
+        self._frame_index += 1
+
+        if self._utterance is None:
+            self._padding.append(frame)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self._utterance = list(self._padding)
+                self._start_frame = self._frame_index - len(self._utterance)
+                self._utterance_id += 1
+                self._silence_run = self._since_partial = 0
+                self._padding.clear()
+            return
+
+        self._utterance.append(frame)
+        self._silence_run = 0 if speech else self._silence_run + 1
+        self._since_partial += 1
+        if self._silence_run >= self.silence_frames:
+            self._finish()
+        elif self._since_partial >= self.partial_frames:
+            self._since_partial = 0
+            self._submit(final=False)
+
+    def close(self, wait: bool = True) -> None:
+        """Finish any utterance in progress and release the workers"""
+        if self._utterance is not None:
+            self._finish()
+        if wait:
+            wait_futures(self._pending)
+        self._pending = []
+        if self.owns_executor:
+            self.executor.shutdown(wait=wait)
+
+    def _finish(self) -> None:
+        self._submit(final=True)
+        self._utterance = None
+        self._speech_run = 0
+
+    def _submit(self, final: bool) -> None:
+        pcm = b"".join(self._utterance)
+        utterance_id = self._utterance_id
+        start_ms = self._start_frame * self.frame_ms
+        end_ms = self._frame_index * self.frame_ms
+        with self.lock:
+            sequence = self._latest_partial.get(utterance_id, 0) + 1
+            self._latest_partial[utterance_id] = sequence
+        self._pending = [f for f in self._pending if not f.done()]
+        self._pending.append(self.executor.submit(
+            self._recognize, pcm, utterance_id, sequence, final, start_ms, end_ms
+        ))
+
+    def _recognize(self, pcm: bytes, utterance_id: int, sequence: int, final: bool,
+                   start_ms: int, end_ms: int) -> None:
+        try:
+            text = self.backend.transcribe(pcm, self.sample_rate)
+        except Exception as e:
+            logger.error(f"Recognition failed for utterance {utterance_id}: {str(e)}")
+            text = ""
+        with self.lock:
+            if not final and (utterance_id in self._finalized
+                              or sequence < self._latest_partial.get(utterance_id, 0)):
+                # A newer partial or the final result is already on its way, or the final was delivered
+                return
+            if final:
+                self._finalized.add(utterance_id)
+                self._latest_partial.pop(utterance_id, None)
+            # Delivered under the lock so a partial that passed the check cannot land after the final
+            self.on_event(TranscriptEvent(utterance_id, text, final, start_ms, end_ms))
+
+
+def transcribe_wav(path: str, backend, frame_ms: int = 30, **kwargs) -> List[TranscriptEvent]:
+    """
+    Run a WAV file through the streaming pipeline, e.g. for recorded fixtures
+    Args:
+        path: Mono 16-bit WAV file
+        backend: Object with transcribe(pcm, sample_rate) -> str
+        frame_ms: Frame length fed to the pipeline
+        **kwargs: Passed to StreamingTranscriber
+    Returns:
+        Events in the order they were produced
+    """
+    events: List[TranscriptEvent] = []
+    lock = threading.Lock()
+
+    def collect(event: TranscriptEvent) -> None:
+        with lock:
+            events.append(event)
+
+    transcriber = StreamingTranscriber(backend, collect, sample_rate=wav_sample_rate(path),
+                                       frame_ms=frame_ms, **kwargs)
+    for frame in iter_wav_frames(path, frame_ms):
+        transcriber.feed(frame)
+    transcriber.close()
+    return events
+
+
+def default_backend():
+    """Vosk if VOSK_MODEL_PATH points at a model, otherwise PocketSphinx; both run offline"""
+    model_path = os.getenv("VOSK_MODEL_PATH")
+    if model_path and os.path.isdir(model_path):
+        return VoskBackend(model_path)
+    return SphinxBackend()
+
+
+class LiveTranscript:
+    """
+    Transcript state for one chat session, updated from recognition workers.
+
+    The UI reads `partial` for the utterance in progress and drains finished
+    utterances with `pop_final`, so each one is posted to the chat once.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.partial = ""
+        self.finals: List[TranscriptEvent] = []
+        self.feeding = False
+
+    def on_event(self, event: TranscriptEvent) -> None:
+        with self.lock:
+            if event.final:
+                self.partial = ""
+                if event.text:
+                    self.finals.append(event)
+            else:
+                self.partial = event.text
+
+    def pop_final(self) -> List[TranscriptEvent]:
+        with self.lock:
+            finals, self.finals = self.finals, []
+        return finals
+
+    @property
+    def active(self) -> bool:
+        return self.feeding or bool(self.partial)
+
+    def feed_wav_bytes(self, data: bytes, backend, executor: ThreadPoolExecutor, frame_ms: int = 30) -> None:
+        """
+        Stream a recorded clip through a StreamingTranscriber on a background thread
+        Args:
+            data: WAV file contents, e.g. from st.audio_input
+            backend: Recognizer backend
+            executor: Shared recognition pool
+            frame_ms: Frame length fed to the pipeline
+        """
+        self.feeding = True
+
+        def run() -> None:
+            try:
+                with wave.open(io.BytesIO(data), "rb") as wav:
+                    if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+                        raise ValueError("Recording must be mono 16-bit PCM")
+                    sample_rate = wav.getframerate()
+                    samples = sample_rate * frame_ms // 1000
+                    transcriber = StreamingTranscriber(backend, self.on_event, sample_rate=sample_rate,
+                                                       frame_ms=frame_ms, executor=executor)
+                    while True:
+                        frame = wav.readframes(samples)
+                        if len(frame) < samples * SAMPLE_WIDTH:
+                            break
+                        transcriber.feed(frame)
+                    transcriber.close()
+            except Exception as e:
+                logger.error(f"Failed to transcribe recording: {str(e)}")
+            finally:
+                self.feeding = False
+
+        threading.Thread(target=run, name="speech-feed", daemon=True).start()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    if len(sys.argv) < 2:
+        print("Usage: python speech_stream.py recording.wav")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    for event in transcribe_wav(sys.argv[1], default_backend()):
+        kind = "final" if event.final else "partial"
+        print(f"[{event.start_ms / 1000:6.2f}-{event.end_ms / 1000:6.2f}] {kind:7} {event.text}")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
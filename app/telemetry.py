@@ -0,0 +1,399 @@
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("TELEMETRY_SERVICE_NAME", "mediassist")
+
+# Attribute names with a metric attached, set them on spans to have them aggregated
+PROMPT_TOKENS = "llm.tokens.prompt"
+COMPLETION_TOKENS = "llm.tokens.completion"
+CACHE_HIT = "cache.hit"
+QUEUE_WAIT = "queue.wait_seconds"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed operation"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes; dots in names may be written as underscores, e.g. cache_hit=True"""
+        for key, value in attributes.items():
+            self.attributes[ATTRIBUTE_ALIASES.get(key, key)] = value
+
+
+ATTRIBUTE_ALIASES = {
+    "prompt_tokens": PROMPT_TOKENS,
+    "completion_tokens": COMPLETION_TOKENS,
+    "cache_hit": CACHE_HIT,
+    "queue_wait": QUEUE_WAIT,
+}
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self.help: Dict[str, str] = {}
+
+    def inc(self, name: str, value: float = 1.0, help: str = "", **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+            self.help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = "", **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+            self.help.setdefault(name, help)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        def label_text(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                       for k, v in items)
+            return "{" + ",".join(escaped) + "}"
+
+        lines: List[str] = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# HELP {name} {self.help.get(name) or name}")
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{label_text(labels)} {value:g}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# HELP {name} {self.help.get(name) or name}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{label_text(labels, [('le', f'{bound:g}')])} {cumulative}")
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{label_text(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def spans_to_otel_json(spans: List[Span], service_name: str = SERVICE_NAME) -> Dict[str, Any]:
+    """Spans in the OTLP/JSON trace format accepted by OpenTelemetry collectors"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "telemetry"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                        "attributes": [{"key": k, "value": _otel_value(v)} for k, v in span.attributes.items()],
+                        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans, for tests and the /traces endpoint"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def finished(self, name: Optional[str] = None) -> List[Span]:
+        with self.lock:
+            return [span for span in self.spans if name is None or span.name == name]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.spans.clear()
+
+
+class OTLPJsonFileExporter:
+    """Appends batches of spans as OTLP/JSON lines to a file"""
+
+    def __init__(self, path: str, batch_size: int = 100):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending: List[Span] = []
+        self.lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self.lock:
+            self.pending.append(span)
+            if len(self.pending) < self.batch_size:
+                return
+            batch, self.pending = self.pending, []
+        self._write(batch)
+
+    def flush(self) -> None:
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[Span]) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(spans_to_otel_json(batch)) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to write spans to {self.path}: {str(e)}")
+
+
+class Telemetry:
+    """Tracer and metrics registry; every finished span also updates the metrics"""
+
+    def __init__(self, exporters: Optional[List[Any]] = None):
+        self.metrics = Metrics()
+        self.exporters = exporters if exporters is not None else []
+        self.enabled = os.getenv("TELEMETRY_DISABLED", "").lower() not in ("1", "true", "yes")
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time a block; nested spans share the trace of the enclosing one"""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent else None
+        )
+        span.set(**attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if self.enabled:
+                self._finish(span)
+
+    def traced(self, name: Optional[str] = None, **attributes: Any) -> Callable:
+        """Decorator form of span()"""
+        def decorator(func: Callable) -> Callable:
+            span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span: Span) -> None:
+        metrics, attrs = self.metrics, span.attributes
+        metrics.observe("span_duration_seconds", span.duration, "Duration of instrumented operations", span=span.name)
+        if span.error:
+            metrics.inc("span_errors_total", help="Instrumented operations that raised", span=span.name)
+        for attribute, kind in ((PROMPT_TOKENS, "prompt"), (COMPLETION_TOKENS, "completion")):
+            if attrs.get(attribute):
+                metrics.inc("llm_tokens_total", attrs[attribute], "Tokens sent to and generated by models",
+                            span=span.name, kind=kind)
+        if CACHE_HIT in attrs:
+            metrics.inc("cache_lookups_total", help="Cache lookups by result",
+                        span=span.name, result="hit" if attrs[CACHE_HIT] else "miss")
+        if QUEUE_WAIT in attrs:
+            metrics.observe("queue_wait_seconds", attrs[QUEUE_WAIT], "Time spent queued before running",
+                            span=span.name)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.error(f"Span exporter failed: {str(e)}")
+
+
+def _default_exporters() -> List[Any]:
+    exporters: List[Any] = [InMemoryExporter()]
+    if os.getenv("TELEMETRY_OTLP_FILE"):
+        import atexit
+        file_exporter = OTLPJsonFileExporter(os.environ["TELEMETRY_OTLP_FILE"])
+        atexit.register(file_exporter.flush)
+        exporters.append(file_exporter)
+    return exporters
+
+
+telemetry = Telemetry(_default_exporters())
+span = telemetry.span
+traced = telemetry.traced
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def record_usage(target: Span, response: Any) -> None:
+    """Copy token usage from an OpenAI-style chat completion response onto a span"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        target.set(prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                   completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def chat_completion(client: Any, span_name: str = "llm.chat", **kwargs: Any) -> Any:
+    """client.chat.completions.create(**kwargs) inside a span carrying the model and token usage"""
+    with span(span_name, model=kwargs.get("model", "")) as completion_span:
+        response = client.chat.completions.create(**kwargs)
+        record_usage(completion_span, response)
+        return response
+
+
+# Extra paths served by the metrics server:
+# path -> handler(method, query, headers) returning (status, body, content_type)
+RouteHandler = Callable[[str, Dict[str, str], Dict[str, str]], Tuple[int, str, str]]
+_routes: Dict[str, RouteHandler] = {}
+
+
+def register_route(path: str, handler: RouteHandler) -> None:
+    """Serve `handler` for GET and POST requests to `path` on the metrics server"""
+    _routes[path] = handler
+
+
+def start_metrics_server(port: int = int(os.getenv("TELEMETRY_PORT", "9464")),
+                         host: str = os.getenv("TELEMETRY_HOST", "127.0.0.1")) -> threading.Thread:
+    """
+    Serve /metrics (Prometheus text), /traces (OTLP/JSON of recent spans) and any
+    registered routes on a daemon thread
+    Args:
+        port: Port to listen on
+        host: Interface to bind, local only unless TELEMETRY_HOST says otherwise
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qsl, urlsplit
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def _dispatch(self, method):
+            url = urlsplit(self.path)
+            status = 200
+            if method == "GET" and url.path == "/metrics":
+                body, content_type = telemetry.metrics.to_prometheus(), "text/plain; version=0.0.4"
+            elif method == "GET" and url.path == "/traces":
+                memory = next((e for e in telemetry.exporters if isinstance(e, InMemoryExporter)), None)
+                body = json.dumps(spans_to_otel_json(memory.finished() if memory else []))
+                content_type = "application/json"
+            elif url.path in _routes:
+                try:
+                    status, body, content_type = _routes[url.path](
+                        method, dict(parse_qsl(url.query)), {k.lower(): v for k, v in self.headers.items()}
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to serve {url.path}: {str(e)}")
+                    self.send_error(500)
+                    return
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on {host}:{port}")
+    return thread
+
+
+if __name__ == "__main__":
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    with span("request", role="Doctor"):
+        with span("llm.chat", model="demo") as s:
+            time.sleep(0.05)
+            s.set(prompt_tokens=120, completion_tokens=30)
+        with span("translation.segment", cache_hit=True):
+            pass
+    print(telemetry.metrics.to_prometheus())
+    print(json.dumps(spans_to_otel_json(telemetry.exporters[0].finished()), indent=2)[:600])
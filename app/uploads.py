@@ -0,0 +1,284 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pdf_extract import load_cached as load_cached_pdf, passes_quality_check
+from profiling import profile_request
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_TYPES = ["txt", "pdf", "docx", "xlsx", "csv"]
+
+ProgressCallback = Callable[[float, str], None]
+
+
+@dataclass
+class UploadJob:
+    """State of one uploaded file, shared between the worker and the UI"""
+    job_id: str
+    name: str
+    status: str = "queued"
+    progress: float = 0.0
+    message: str = "Waiting for a worker"
+    text: Optional[str] = None
+    truncated: bool = False
+    error: Optional[str] = None
+    cached: bool = False
+    submitted: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+def parse_txt(data: bytes, progress: ProgressCallback, max_chars: int) -> Tuple[str, bool]:
+    text = data.decode("utf-8", errors="replace")
+    progress(1.0, "Read text file")
+    return text[:max_chars], len(text) > max_chars
+
+
+def parse_pdf(data: bytes, progress: ProgressCallback, max_chars: int) -> Tuple[str, bool]:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    pages: List[str] = []
+    size = 0
+    for i, page in enumerate(reader.pages):
+        pages.append(page.extract_text() or "")
+        size += len(pages[-1])
+        progress((i + 1) / total, f"Parsed page {i + 1} of {total}")
+        if size > max_chars:
+            return "\n".join(pages)[:max_chars], True
+    if not passes_quality_check(pages):
+        # Scanned or oddly encoded file, fall back to the slower extractors
+        import tempfile
+        from pdf_extract import extract_pdf
+        progress(1.0, "Retrying with a more thorough parser")
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(data)
+        try:
+            result = extract_pdf(f.name, backends=("pdfminer", "pdfplumber"))
+        finally:
+            os.remove(f.name)
+        if result.success:
+            pages = result.pages
+    text = "\n".join(pages)
+    return text[:max_chars], len(text) > max_chars
+
+
+def parse_docx(data: bytes, progress: ProgressCallback, max_chars: int) -> Tuple[str, bool]:
+    import docx
+    document = docx.Document(io.BytesIO(data))
+    paragraphs = document.paragraphs
+    lines: List[str] = []
+    size = 0
+    for i, paragraph in enumerate(paragraphs):
+        lines.append(paragraph.text)
+        size += len(paragraph.text) + 1
+        if i % 200 == 0 or i == len(paragraphs) - 1:
+            progress((i + 1) / len(paragraphs), f"Read {i + 1} of {len(paragraphs)} paragraphs")
+        if size > max_chars:
+            return "\n".join(lines)[:max_chars], True
+    return "\n".join(lines), False
+
+
+def parse_xlsx(data: bytes, progress: ProgressCallback, max_chars: int, chunk_rows: int = 1000) -> Tuple[str, bool]:
+    import openpyxl
+    # read_only streams rows from the archive instead of building the whole workbook
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    lines: List[str] = []
+    size = 0
+    try:
+        for s, sheet in enumerate(workbook.worksheets):
+            lines.append(f"# {sheet.title}")
+            total_rows = sheet.max_row or 0
+            for r, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                line = "\t".join("" if value is None else str(value) for value in row)
+                lines.append(line)
+                size += len(line) + 1
+                if size > max_chars:
+                    return "\n".join(lines)[:max_chars], True
+                if r % chunk_rows == 0:
+                    sheet_progress = r / total_rows if total_rows else 0.0
+                    progress((s + min(sheet_progress, 1.0)) / len(workbook.worksheets),
+                             f"Read {r} rows of sheet {sheet.title}")
+        progress(1.0, "Read workbook")
+        return "\n".join(lines), False
+    finally:
+        workbook.close()
+
+
+def parse_csv(data: bytes, progress: ProgressCallback, max_chars: int, chunk_rows: int = 10_000) -> Tuple[str, bool]:
+    import pandas as pd
+    parts: List[str] = []
+    size = 0
+    rows = 0
+    for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunk_rows, dtype=str):
+        part = chunk.to_csv(sep="\t", index=False, header=not parts)
+        parts.append(part)
+        size += len(part)
+        rows += len(chunk)
+        progress(min(0.99, size / len(data)), f"Read {rows} rows")
+        if size > max_chars:
+            return "".join(parts)[:max_chars], True
+    progress(1.0, f"Read {rows} rows")
+    return "".join(parts), False
+
+
+PARSERS = {
+    "txt": parse_txt,
+    "pdf": parse_pdf,
+    "docx": parse_docx,
+    "xlsx": parse_xlsx,
+    "csv": parse_csv,
+}
+
+
+class UploadProcessor:
+    """
+    Parse uploaded files on a background worker pool.
+
+    The Streamlit script submits files and returns immediately; the UI polls
+    job state to show progress. Parsed text is cached by content hash and
+    file type in memory and on disk, so re-uploading or rerunning never
+    parses twice. A failed job is replaced when the file is submitted again.
+    """
+    def __init__(
+        self,
+        max_workers: int = 2,
+        cache_dir: Optional[str] = None,
+        memory_items: int = 64,
+        max_chars: int = 2_000_000
+    ):
+        """
+        Args:
+            max_workers: Files parsed at the same time
+            cache_dir: Directory for parsed text, None disables the disk cache
+            memory_items: Parsed files kept in memory
+            max_chars: Text kept per file; larger files are truncated while streaming
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.max_chars = max_chars
+        self.jobs: Dict[str, UploadJob] = OrderedDict()
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def submit(self, name: str, data: bytes) -> UploadJob:
+        """
+        Queue a file for parsing
+        Args:
+            name: Original file name, its extension picks the parser
+            data: File contents
+        Returns:
+            The job, already done if the same contents were parsed before
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        # The same bytes under another extension go to another parser
+        job_id = f"{digest}-{self._extension(name)}"
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job and job.status != "failed":
+                self.jobs.move_to_end(job_id)
+                return job
+            job = UploadJob(job_id=job_id, name=name)
+            self.jobs[job_id] = job
+            self.jobs.move_to_end(job_id)
+            self._evict()
+
+        with span("upload.cache_lookup") as lookup_span:
+            cached = self._load(job_id, digest, name)
+            lookup_span.set(cache_hit=cached is not None)
+        if cached is not None:
+            job.text, job.truncated = cached
+            job.status, job.progress, job.cached = "done", 1.0, True
+            job.message = "Loaded from cache"
+            job.finished = time.time()
+            return job
+
+        self.executor.submit(self._run, job, data)
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    @staticmethod
+    def _extension(name: str) -> str:
+        return name.rsplit(".", 1)[-1].lower()
+
+    def _run(self, job: UploadJob, data: bytes) -> None:
+        extension = self._extension(job.name)
+        parser = PARSERS.get(extension)
+        job.status = "running"
+        if parser is None:
+            self._fail(job, f"Unsupported file type: .{extension}")
+            return
+
+        def progress(fraction: float, message: str) -> None:
+            job.progress = fraction
+            job.message = message
+
+        try:
+            start = time.perf_counter()
+            with span("upload.parse", file_type=extension, bytes=len(data),
+                      queue_wait=time.time() - job.submitted), profile_request(f"upload.{extension}"):
+                job.text, job.truncated = parser(data, progress, self.max_chars)
+            job.status, job.progress = "done", 1.0
+            job.message = f"Parsed in {time.perf_counter() - start:.1f}s"
+            if job.truncated:
+                job.message += f", truncated to {self.max_chars:,} characters"
+            job.finished = time.time()
+            self._store(job)
+        except Exception as e:
+            logger.error(f"Failed to parse upload {job.name}: {str(e)}")
+            self._fail(job, str(e))
+
+    def _fail(self, job: UploadJob, error: str) -> None:
+        job.status, job.error = "failed", error
+        job.message = f"Could not read {job.name}"
+        job.finished = time.time()
+
+    def _evict(self) -> None:
+        while len(self.jobs) > self.memory_items:
+            oldest = next(iter(self.jobs))
+            if not self.jobs[oldest].done:
+                break
+            self.jobs.pop(oldest)
+
+    def _cache_file(self, job_id: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{job_id}.json") if self.cache_dir else None
+
+    def _load(self, job_id: str, digest: str, name: str) -> Optional[Tuple[str, bool]]:
+        cache_file = self._cache_file(job_id)
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["text"], data["truncated"]
+        if name.lower().endswith(".pdf"):
+            # Reuse anything pdf_extract already parsed from app/data
+            pdf = load_cached_pdf(name, digest=digest)
+            if pdf and pdf.success:
+                return pdf.text[:self.max_chars], len(pdf.text) > self.max_chars
+        return None
+
+    def _store(self, job: UploadJob) -> None:
+        cache_file = self._cache_file(job.job_id)
+        if not cache_file:
+            return
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"name": job.name, "text": job.text, "truncated": job.truncated}, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
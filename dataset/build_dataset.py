@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build fine-tuning datasets from translated transcripts in one streaming pass.
+
+Records are read one at a time from the JSONL written by translation.py,
+rendered through every requested template, assigned to train/val/test by
+hashing their ID, and appended to sharded output files (JSONL, zstd-compressed
+JSONL, or Arrow). Memory use depends on the shard buffer, not on the number
+of records. A manifest lists every file with its record count.
+
+Usage:
+    python build_dataset.py cantonese.jsonl out/ [--templates pairs text] [--format jsonl.zst]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Templates from the Cantonese notebook, keyed by name
+TEMPLATES: Dict[str, Callable[[Dict[str, str]], Dict[str, str]]] = {
+    # cantonese_to_english.jsonl
+    'pairs': lambda r: {'input': r['translation'], 'output': r['source']},
+    # cantonese_to_english_translation.jsonl
+    'text': lambda r: {'text': f"Translate from Cantonese: {r['translation']} to English: {r['source']}"},
+}
+
+FORMATS = ('jsonl', 'jsonl.zst', 'arrow')
+
+
+def assign_split(record_id: str, ratios: Tuple[float, float, float], salt: str = '') -> str:
+    """Deterministic train/val/test assignment from a hash of the ID"""
+    digest = hashlib.sha256(f'{salt}{record_id}'.encode('utf-8')).digest()
+    point = int.from_bytes(digest[:8], 'big') / 2 ** 64
+    if point < ratios[0]:
+        return 'train'
+    if point < ratios[0] + ratios[1]:
+        return 'val'
+    return 'test'
+
+
+class ShardedWriter:
+    """Append records to numbered shard files, starting a new file every shard_size records"""
+
+    def __init__(self, out_dir: str, prefix: str, fmt: str = 'jsonl', shard_size: int = 100_000,
+                 batch_rows: int = 1000):
+        """
+        Args:
+            out_dir: Directory for the shards
+            prefix: File name prefix, e.g. 'pairs-train'
+            fmt: One of FORMATS
+            shard_size: Records per shard
+            batch_rows: Records buffered per Arrow record batch
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.fmt = fmt
+        self.shard_size = shard_size
+        self.batch_rows = batch_rows
+        self.files: List[Dict[str, Any]] = []
+        self._handle = None
+        self._raw = None
+        self._rows: List[Dict[str, str]] = []
+        self._count = 0
+
+    def write(self, record: Dict[str, str]) -> None:
+        if self._handle is None or self._count >= self.shard_size:
+            self._open_next()
+        if self.fmt == 'arrow':
+            self._rows.append(record)
+            if len(self._rows) >= self.batch_rows:
+                self._flush_rows()
+        else:
+            self._handle.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._count += 1
+        self.files[-1]['records'] = self._count
+
+    def close(self) -> None:
+        if self._handle is None:
+            return
+        if self.fmt == 'arrow':
+            self._flush_rows()
+        self._handle.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._handle = self._raw = None
+
+    def _open_next(self) -> None:
+        self.close()
+        name = f'{self.prefix}-{len(self.files):05d}.{self.fmt}'
+        path = os.path.join(self.out_dir, name)
+        if self.fmt == 'jsonl':
+            self._handle = open(path, 'w', encoding='utf-8')
+        elif self.fmt == 'jsonl.zst':
+            import io
+            import zstandard
+            self._raw = open(path, 'wb')
+            stream = zstandard.ZstdCompressor(level=10).stream_writer(self._raw, closefd=False)
+            self._handle = io.TextIOWrapper(stream, encoding='utf-8')
+        else:
+            import pyarrow as pa
+            self._raw = pa.OSFile(path, 'wb')
+            self._handle = _LazyArrowWriter(self._raw)
+        self._count = 0
+        self.files.append({'file': name, 'records': 0})
+
+    def _flush_rows(self) -> None:
+        if self._rows:
+            self._handle.write_rows(self._rows)
+            self._rows = []
+
+
+class _LazyArrowWriter:
+    """Arrow IPC file writer that takes its schema from the first batch"""
+
+    def __init__(self, sink: Any):
+        self.sink = sink
+        self.writer = None
+
+    def write_rows(self, rows: List[Dict[str, str]]) -> None:
+        import pyarrow as pa
+        batch = pa.RecordBatch.from_pylist(rows)
+        if self.writer is None:
+            self.writer = pa.ipc.new_file(self.sink, batch.schema)
+        self.writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def iter_records(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream records from a translation.py JSONL file, the last one per id.
+
+    An interrupted translation run leaves outdated records for edited
+    documents in the file, so a first pass finds the offset of each id's
+    last record and the second yields only those, in file order.
+    """
+    latest: Dict[str, int] = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                latest[str(json.loads(line)['id'])] = offset
+            offset += len(line)
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if latest[str(record['id'])] == offset:
+                    yield record
+            offset += len(line)
+
+
+def build_dataset(
+    records: Iterable[Dict[str, str]],
+    out_dir: str,
+    templates: List[str],
+    fmt: str = 'jsonl',
+    ratios: Tuple[float, float, float] = (0.9, 0.05, 0.05),
+    shard_size: int = 100_000,
+    salt: str = ''
+) -> Dict[str, Any]:
+    """
+    Write every template and split of a dataset in a single pass
+    Args:
+        records: Dicts with id, source and translation
+        out_dir: Output directory
+        templates: Names from TEMPLATES
+        fmt: One of FORMATS
+        ratios: Train, validation and test fractions
+        shard_size: Records per output file
+        salt: Changes the split assignment without changing IDs
+    Returns:
+        The manifest that was written to out_dir/manifest.json
+    """
+    if abs(sum(ratios) - 1.0) > 1e-9:
+        raise ValueError("Split ratios must sum to 1")
+    unknown = set(templates) - set(TEMPLATES)
+    if unknown:
+        raise ValueError(f"Unknown templates: {', '.join(sorted(unknown))}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    writers: Dict[Tuple[str, str], ShardedWriter] = {}
+    total = skipped = 0
+    try:
+        for record in records:
+            if not record.get('translation') or not record.get('source'):
+                skipped += 1
+                continue
+            split = assign_split(str(record['id']), ratios, salt)
+            for template in templates:
+                key = (template, split)
+                if key not in writers:
+                    writers[key] = ShardedWriter(out_dir, f'{template}-{split}', fmt, shard_size)
+                writers[key].write(TEMPLATES[template](record))
+            total += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    manifest = {
+        'format': fmt,
+        'ratios': dict(zip(('train', 'val', 'test'), ratios)),
+        'salt': salt,
+        'records': total,
+        'skipped': skipped,
+        'templates': {
+            template: {
+                split: {
+                    'records': sum(f['records'] for f in writers[(template, split)].files),
+                    'files': writers[(template, split)].files
+                }
+                for split in ('train', 'val', 'test') if (template, split) in writers
+            }
+            for template in templates
+        }
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSONL written by translation.py')
+    parser.add_argument('output_dir')
+    parser.add_argument('--templates', nargs='+', default=list(TEMPLATES), choices=list(TEMPLATES))
+    parser.add_argument('--format', default='jsonl', choices=FORMATS)
+    parser.add_argument('--ratios', nargs=3, type=float, default=[0.9, 0.05, 0.05],
+                        metavar=('TRAIN', 'VAL', 'TEST'))
+    parser.add_argument('--shard-size', type=int, default=100_000)
+    parser.add_argument('--salt', default='')
+    args = parser.parse_args()
+
+    manifest = build_dataset(iter_records(args.input), args.output_dir, args.templates, args.format,
+                             tuple(args.ratios), args.shard_size, args.salt)
+    print(f"Wrote {manifest['records']} records per template to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,97 +1,170 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Downloads all the articles from the Tulu language WikiPedia and preprocesses 
+Downloads all the articles from the Tulu language WikiPedia and preprocesses
 them to get a monolingual dataset of sentences in Tulu language. The latest
-articles from the Tulu language wikipedia are downloaded from 
+articles from the Tulu language wikipedia are downloaded from
 "https://dumps.wikimedia.org/tcywiki/latest/tcywiki-latest-pages-articles-multistream.xml.bz2"
 
+Every stage streams: the dump is decompressed chunk by chunk while it
+downloads, lines are cleaned one at a time, and duplicates are dropped with a
+fixed-size Bloom filter, so memory stays flat whatever the size of the wiki.
+
 Usage:
-    python tcy_wikipedia_downloader.py
-    
+    python download.py [--download] [--wiki tcywiki] [--capacity 10000000]
+
 """
 
-import urllib.request
+import argparse
 import bz2
+import hashlib
+import math
 import subprocess
 import os
+import urllib.request
 
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator
 
 import unicodedata
 
-print(os.getcwd())
-
-# URL of the Wikimedia dump file (Tulu Wikipedia)
-# url_tcywiki = 'https://dumps.wikimedia.org/tcywiki/latest/tcywiki-latest-pages-articles-multistream.xml.bz2'
-
-# # Download the file
-# with urllib.request.urlopen(url_tcywiki) as response:
-#     compressed_file = response.read()
-
-# # Decompress the data
-# decompressed_file = bz2.decompress(compressed_file)
-
-# # Save the decompressed file
-decompressed_file_path = 'tcywiki-latest-pages-articles-multistream.xml'
-# with open(decompressed_file_path, 'wb') as file:
-#     file.write(decompressed_file)
-
-# print("Processing the Wikimedia dump file...")
-
-# # Shell script downloaded from https://gist.github.com/sgraaf/7c061824b1c57c292faa0a123d95a714#file-extract_and_clean_wiki_dump-sh
-# shell_script_path = 'script.sh'
-
-# # Make the shell script executable
-# subprocess.run(['chmod', '+x', shell_script_path])
-
-# # Run the shell script on the decompressed file
-# subprocess.run([f'./{shell_script_path}', decompressed_file_path])
-
-# # Delete the temporary decompressed file
-# os.remove(decompressed_file_path)
-
-# print(f"Extraction and cleaning completed. The output is in {decompressed_file_path.replace('.xml', '.txt')}")
-
-# preprocess_wiki_dump: https://gist.github.com/sgraaf/926c52fba668f779f5ecac81d21e98a0#file-preprocess_wiki_dump-py
-
-wiki_dump_file_in = decompressed_file_path.replace('.xml', '.txt')
-wiki_dump_file_out = decompressed_file_path.replace('.xml', '_preprocessed.txt')
-
-print(f'Pre-processing {wiki_dump_file_in} to {wiki_dump_file_out}...')
-
-# Read the document
-with open(wiki_dump_file_in, 'r', encoding='utf-8') as in_f:
-    lines = in_f.readlines()
-
-sentences = []
-for line in lines:
-    sentence = line.strip()
-    sentence = ' '.join(sentence.split())
-    sentences.extend(sentence.split('\n'))
-
-print(f"Number of lines after blingfire: {len(sentences)}")
-
-# Use a set to store unique lines
-unique_sentences = set()
-
-processed_sentences = []
-
-for sentence in sentences:
-    # Check if the line contains more than one word
-    if len(sentence.split()) > 1:
-        # Check if the line is unique
-        if sentence not in unique_sentences:
-            unique_sentences.add(sentence)
-            processed_sentences.append(sentence)
-            
-print(f"Number of lines in the end: {len(processed_sentences)}")
-
-# Write the preprocessd lines to a file
-with open(wiki_dump_file_out, 'w', encoding='utf-8') as out_f:
-    for line in processed_sentences:
-        out_f.write(line + '\n')
-        
-print(f'Successfully pre-processed {wiki_dump_file_in} to {wiki_dump_file_out}...')
-
+DUMP_URL = 'https://dumps.wikimedia.org/{wiki}/latest/{wiki}-latest-pages-articles-multistream.xml.bz2'
+CHUNK_SIZE = 1 << 20
+
+
+class BloomFilter:
+    """Fixed-memory set membership test with a bounded false-positive rate"""
+
+    def __init__(self, capacity: int, error_rate: float = 1e-3):
+        """
+        Args:
+            capacity: Number of distinct items the filter is sized for
+            error_rate: Target false-positive rate at capacity
+        """
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> bool:
+        """Add an item, returning True if it was (probably) already present"""
+        present = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+
+def download_dump(url: str, out_path: str) -> None:
+    """Download a bz2 dump and decompress it to disk incrementally"""
+    decompressor = bz2.BZ2Decompressor()
+    with urllib.request.urlopen(url) as response, open(out_path, 'wb') as out_f:
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            # Multistream dumps are several bz2 streams back to back
+            while chunk:
+                if decompressor.eof:
+                    decompressor = bz2.BZ2Decompressor()
+                out_f.write(decompressor.decompress(chunk))
+                chunk = decompressor.unused_data if decompressor.eof else b''
+
+
+def iter_lines(path: str) -> Iterator[str]:
+    """Yield lines from a text file, decompressing on the fly if it is bz2"""
+    opener = bz2.open if path.endswith('.bz2') else open
+    with opener(path, 'rt', encoding='utf-8') as in_f:
+        yield from in_f
+
+
+def normalize_line(line: str) -> str:
+    """NFC-normalize a line, strip it and collapse internal whitespace"""
+    return ' '.join(unicodedata.normalize('NFC', line).split())
+
+
+def preprocess(lines: Iterable[str], out_f, seen: BloomFilter) -> tuple:
+    """
+    Clean, filter and dedupe lines, writing survivors as they are produced
+    Args:
+        lines: Raw lines
+        out_f: Open text file to write to
+        seen: Bloom filter of lines already written
+    Returns:
+        (lines read, lines written)
+    """
+    read = written = 0
+    for line in lines:
+        read += 1
+        sentence = normalize_line(line)
+        # Keep lines with more than one word that we have not written yet
+        if ' ' not in sentence or seen.add(sentence):
+            continue
+        out_f.write(sentence + '\n')
+        written += 1
+    return read, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wiki', default='tcywiki', help='Wikipedia dump name, e.g. tcywiki')
+    parser.add_argument('--download', action='store_true', help='Download and extract the dump first')
+    parser.add_argument('--input', help='Extracted text file, defaults to the one script.sh writes')
+    parser.add_argument('--output', help='Preprocessed output file')
+    parser.add_argument('--capacity', type=int, default=10_000_000,
+                        help='Expected number of unique lines, sizes the dedup filter')
+    parser.add_argument('--error-rate', type=float, default=1e-3,
+                        help='Chance a unique line is mistaken for a duplicate')
+    args = parser.parse_args()
+
+    print(os.getcwd())
+
+    decompressed_file_path = f'{args.wiki}-latest-pages-articles-multistream.xml'
+
+    if args.download:
+        url = DUMP_URL.format(wiki=args.wiki)
+        print(f"Downloading {url}...")
+        download_dump(url, decompressed_file_path)
+
+        print("Processing the Wikimedia dump file...")
+
+        # Shell script downloaded from https://gist.github.com/sgraaf/7c061824b1c57c292faa0a123d95a714#file-extract_and_clean_wiki_dump-sh
+        shell_script_path = Path(__file__).with_name('script.sh')
+        subprocess.run(['sh', str(shell_script_path), decompressed_file_path], check=True)
+
+        # Delete the temporary decompressed file
+        os.remove(decompressed_file_path)
+
+    # preprocess_wiki_dump: https://gist.github.com/sgraaf/926c52fba668f779f5ecac81d21e98a0#file-preprocess_wiki_dump-py
+
+    wiki_dump_file_in = args.input or decompressed_file_path.replace('.xml', '.txt')
+    wiki_dump_file_out = args.output or decompressed_file_path.replace('.xml', '_preprocessed.txt')
+
+    print(f'Pre-processing {wiki_dump_file_in} to {wiki_dump_file_out}...')
+
+    seen = BloomFilter(args.capacity, args.error_rate)
+    print(f"Dedup filter uses {len(seen.bits) / 2**20:.1f} MiB")
+
+    with open(wiki_dump_file_out, 'w', encoding='utf-8') as out_f:
+        read, written = preprocess(iter_lines(wiki_dump_file_in), out_f, seen)
+
+    print(f"Number of lines read: {read}")
+    print(f"Number of lines in the end: {written}")
+    print(f'Successfully pre-processed {wiki_dump_file_in} to {wiki_dump_file_out}...')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
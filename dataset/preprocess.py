@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel preprocessing of an extracted Wikipedia corpus.
+
+The input is split into byte-range shards aligned on article boundaries
+(WikiExtractor's <doc> lines, or plain line boundaries for a corpus without
+them). Each shard is cleaned in a worker process (WikiExtractor markup and
+blank lines dropped, NFC normalization, whitespace collapsed, single-word
+lines removed). Line fingerprints are then partitioned so the global dedup,
+which keeps the first occurrence in input order, also runs one partition per
+worker. Finally each shard writes its surviving lines to its own output
+file, so every article stays whole and in order, and reading the files in
+order gives the cleaned corpus in input order. A manifest lists the files
+with the article IDs they cover.
+
+Usage:
+    python preprocess.py corpus.txt out_dir [--workers 8] [--partitions 64]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from download import normalize_line
+
+DOC_START = b'<doc '
+DOC_ID_PATTERN = re.compile(r'<doc id="([^"]*)"')
+
+
+def fingerprint(sentence: str) -> int:
+    """64-bit fingerprint of a sentence"""
+    return int.from_bytes(hashlib.blake2b(sentence.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def plan_shards(path: str, num_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into byte ranges that start on article boundaries
+    Args:
+        path: File to split; if it starts with a <doc> line, ranges start at <doc> lines, otherwise at any line
+        num_shards: Desired number of ranges
+    Returns:
+        List of (start, end) byte offsets
+    """
+    size = os.path.getsize(path)
+    step = max(1, size // max(1, num_shards))
+    offsets = [0]
+    with open(path, 'rb') as f:
+        by_doc = f.readline().startswith(DOC_START)
+        while offsets[-1] + step < size:
+            f.seek(offsets[-1] + step)
+            f.readline()
+            position = f.tell()
+            while by_doc and position < size and not f.readline().startswith(DOC_START):
+                position = f.tell()
+            if position >= size:
+                break
+            offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _part(tmp_dir: str, kind: str, a: int, b: Optional[int] = None) -> str:
+    suffix = f'-{b:05d}' if b is not None else ''
+    return os.path.join(tmp_dir, f'{kind}-{a:05d}{suffix}')
+
+
+def clean_shard(path: str, start: int, end: int, shard: int, tmp_dir: str, partitions: int) -> Dict[str, object]:
+    """
+    Clean one byte range into a shard file, and write the fingerprint of each
+    kept line, with its position in the shard, to per-partition files
+    """
+    fingerprints = [array('Q') for _ in range(partitions)]
+    read = kept = documents = 0
+    first_doc = last_doc = None
+    with open(path, 'rb') as in_f, open(_part(tmp_dir, 'clean', shard), 'w', encoding='utf-8') as out_f:
+        in_f.seek(start)
+        while in_f.tell() < end:
+            raw = in_f.readline()
+            if not raw:
+                break
+            read += 1
+            line = raw.decode('utf-8', errors='replace')
+            if line.startswith('<doc id='):
+                match = DOC_ID_PATTERN.match(line)
+                last_doc = match.group(1) if match else None
+                first_doc = first_doc or last_doc
+                documents += 1
+                continue
+            if line.rstrip().endswith('</doc>'):
+                continue
+            sentence = normalize_line(line)
+            if ' ' not in sentence:
+                continue
+            key = fingerprint(sentence)
+            fingerprints[key % partitions].extend((key, kept))
+            out_f.write(sentence + '\n')
+            kept += 1
+    for partition, values in enumerate(fingerprints):
+        with open(_part(tmp_dir, 'fp', partition, shard), 'wb') as f:
+            values.tofile(f)
+    return {'shard': shard, 'lines_read': read, 'lines_kept': kept,
+            'documents': documents, 'first_doc': first_doc, 'last_doc': last_doc}
+
+
+def dedup_partition(partition: int, num_shards: int, tmp_dir: str) -> int:
+    """
+    Find repeated lines in one fingerprint partition, reading shards in input
+    order so the first occurrence is kept, and record the positions to drop
+    per shard. Returns the number of duplicates.
+    """
+    seen = set()
+    duplicates = 0
+    for shard in range(num_shards):
+        fp_path = _part(tmp_dir, 'fp', partition, shard)
+        values = array('Q')
+        with open(fp_path, 'rb') as f:
+            values.frombytes(f.read())
+        os.remove(fp_path)
+        drop = array('Q')
+        for i in range(0, len(values), 2):
+            key = values[i]
+            if key in seen:
+                drop.append(values[i + 1])
+            else:
+                seen.add(key)
+        with open(_part(tmp_dir, 'drop', shard, partition), 'wb') as f:
+            drop.tofile(f)
+        duplicates += len(drop)
+    return duplicates
+
+
+def write_shard(shard: int, partitions: int, tmp_dir: str, out_dir: str) -> Dict[str, object]:
+    """Copy a cleaned shard to its output file, leaving out the duplicates found by dedup_partition"""
+    drop = set()
+    for partition in range(partitions):
+        drop_path = _part(tmp_dir, 'drop', shard, partition)
+        values = array('Q')
+        with open(drop_path, 'rb') as f:
+            values.frombytes(f.read())
+        drop.update(values)
+        os.remove(drop_path)
+    written = 0
+    digest = hashlib.sha256()
+    name = f'shard-{shard:05d}.txt'
+    clean_path = _part(tmp_dir, 'clean', shard)
+    with open(clean_path, 'r', encoding='utf-8') as in_f, \
+            open(os.path.join(out_dir, name), 'w', encoding='utf-8') as out_f:
+        for position, line in enumerate(in_f):
+            if position in drop:
+                continue
+            out_f.write(line)
+            digest.update(line.encode('utf-8'))
+            written += 1
+    os.remove(clean_path)
+    return {'file': name, 'lines': written, 'sha256': digest.hexdigest()}
+
+
+def preprocess_corpus(in_path: str, out_dir: str, workers: int = None, partitions: int = 64) -> Dict[str, object]:
+    """
+    Clean, dedupe and shard a corpus using a process pool
+    Args:
+        in_path: Extracted corpus, one paragraph or sentence per line
+        out_dir: Directory for the output shards and manifest.json
+        workers: Worker processes, defaults to the number of cores
+        partitions: Number of output files, each a run of whole articles; also the number of dedup partitions
+    Returns:
+        The manifest that was written
+    """
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_dir = os.path.join(out_dir, '_parts')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    ranges = plan_shards(in_path, partitions)
+    shards = len(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shard_stats = list(executor.map(
+            clean_shard,
+            [in_path] * shards,
+            [r[0] for r in ranges],
+            [r[1] for r in ranges],
+            range(shards),
+            [tmp_dir] * shards,
+            [partitions] * shards
+        ))
+        duplicates = sum(executor.map(
+            dedup_partition,
+            range(partitions),
+            [shards] * partitions,
+            [tmp_dir] * partitions
+        ))
+        outputs = list(executor.map(
+            write_shard,
+            range(shards),
+            [partitions] * shards,
+            [tmp_dir] * shards,
+            [out_dir] * shards
+        ))
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for output, stats in zip(outputs, shard_stats):
+        output.update(documents=stats['documents'], first_doc=stats['first_doc'], last_doc=stats['last_doc'])
+    manifest = {
+        'source': os.path.abspath(in_path),
+        'source_bytes': os.path.getsize(in_path),
+        'input_shards': shards,
+        'lines_read': sum(s['lines_read'] for s in shard_stats),
+        'lines_cleaned': sum(s['lines_kept'] for s in shard_stats),
+        'duplicates': duplicates,
+        'lines_written': sum(o['lines'] for o in outputs),
+        'documents': sum(s['documents'] for s in shard_stats),
+        'workers': workers,
+        'seconds': round(time.perf_counter() - start_time, 3),
+        'files': outputs
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Extracted corpus, e.g. the output of script.sh or WikiExtractor')
+    parser.add_argument('output_dir', help='Directory for output shards and manifest.json')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to all cores')
+    parser.add_argument('--partitions', type=int, default=64, help='Number of output shards, each a run of whole articles')
+    args = parser.parse_args()
+
+    print(f'Pre-processing {args.input} into {args.output_dir}...')
+    manifest = preprocess_corpus(args.input, args.output_dir, args.workers, args.partitions)
+    print(f"Number of lines read: {manifest['lines_read']}")
+    print(f"Number of lines in the end: {manifest['lines_written']}")
+    print(f"Done in {manifest['seconds']}s with {manifest['workers']} workers")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indexed transcript store backed by SQLite with an FTS5 full-text index.
+
+transcripts.json is converted once, streaming, into a SQLite file. After that
+transcripts are fetched by ID through the primary key index, iterated in
+ranges or sampled without loading the whole archive, and filtered with
+full-text queries.
+
+Usage:
+    python transcript_store.py build transcripts.json transcripts.db
+    python transcript_store.py get transcripts.db 2055
+    python transcript_store.py search transcripts.db "fungal infection" [--limit 10]
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import sys
+from typing import Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1 << 20
+BATCH_SIZE = 10_000
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+    text, content='transcripts', content_rowid='rowid'
+);
+"""
+
+
+def iter_json_object(path: str) -> Iterator[Tuple[str, object]]:
+    """
+    Stream the top-level key/value pairs of a JSON object file.
+
+    Only one value is held in memory at a time, so a multi-GB object of
+    transcripts is converted without loading it.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(CHUNK_SIZE)
+        pos = WHITESPACE.match(buffer).end()
+        if buffer[pos:pos + 1] != '{':
+            raise ValueError(f"{path} does not contain a JSON object")
+        # Parse at an offset into the buffer; consumed text is only dropped when refilling
+        pos += 1
+        eof = False
+        while True:
+            idx = WHITESPACE.match(buffer, pos).end()
+            if buffer.startswith(',', idx):
+                idx = WHITESPACE.match(buffer, idx + 1).end()
+            if buffer.startswith('}', idx):
+                return
+            try:
+                key, idx = decoder.raw_decode(buffer, idx)
+                idx = WHITESPACE.match(buffer, idx).end()
+                if not buffer.startswith(':', idx):
+                    raise json.JSONDecodeError("Expecting ':'", buffer, idx)
+                idx = WHITESPACE.match(buffer, idx + 1).end()
+                value, idx = decoder.raw_decode(buffer, idx)
+                # A value ending exactly at the buffer edge may be a truncated number
+                if idx == len(buffer) and not eof:
+                    raise json.JSONDecodeError('Value may be truncated', buffer, idx)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield key, value
+            pos = idx
+
+
+class TranscriptStore:
+    """Read-mostly store of transcripts keyed by ID"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file created by build
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def build(cls, source: str, path: str, batch_size: int = BATCH_SIZE) -> 'TranscriptStore':
+        """
+        Convert a transcripts file into a store
+        Args:
+            source: JSON object of id -> text, or JSONL with id and text fields
+            path: SQLite file to create or extend
+            batch_size: Rows inserted per transaction
+        Returns:
+            The opened store
+        """
+        store = cls(path)
+        if source.endswith('.jsonl'):
+            def records():
+                with open(source, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            yield str(record['id']), record['text']
+        else:
+            def records():
+                for key, value in iter_json_object(source):
+                    yield str(key), value
+
+        store.add_many(records(), batch_size)
+        store.conn.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('optimize')")
+        store.conn.commit()
+        return store
+
+    def add_many(self, records, batch_size: int = BATCH_SIZE) -> int:
+        """Insert or replace (id, text) pairs, returning how many were written"""
+        count = 0
+        batch: List[Tuple[str, str]] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                count += self._write(batch)
+                batch = []
+        if batch:
+            count += self._write(batch)
+        return count
+
+    def _write(self, batch: List[Tuple[str, str]]) -> int:
+        # The last text for an ID repeated within the batch wins, as it would across batches
+        batch = list(dict(batch).items())
+        with self.conn:
+            ids = [(transcript_id,) for transcript_id, _ in batch]
+            # Keep the external-content FTS index in step with replaced rows
+            self.conn.executemany(
+                "INSERT INTO transcripts_fts(transcripts_fts, rowid, text) "
+                "SELECT 'delete', rowid, text FROM transcripts WHERE id = ?", ids
+            )
+            self.conn.executemany("DELETE FROM transcripts WHERE id = ?", ids)
+            last_rowid = self.conn.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM transcripts"
+            ).fetchone()[0]
+            self.conn.executemany("INSERT INTO transcripts (id, text) VALUES (?, ?)", batch)
+            self.conn.execute(
+                "INSERT INTO transcripts_fts(rowid, text) "
+                "SELECT rowid, text FROM transcripts WHERE rowid > ?", (last_rowid,)
+            )
+        return len(batch)
+
+    def get(self, transcript_id: str) -> Optional[str]:
+        """Fetch one transcript by ID, None if it does not exist"""
+        row = self.conn.execute(
+            "SELECT text FROM transcripts WHERE id = ?", (str(transcript_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __getitem__(self, transcript_id: str) -> str:
+        text = self.get(transcript_id)
+        if text is None:
+            raise KeyError(transcript_id)
+        return text
+
+    def __contains__(self, transcript_id: str) -> bool:
+        return self.get(transcript_id) is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return self.iter_range()
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None,
+                   batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate (id, text) pairs by position in insertion order
+        Args:
+            start: First position, inclusive
+            stop: Last position, exclusive, None for the end
+            batch_size: Rows fetched per query
+        """
+        last_rowid, position = 0, 0
+        # Skip to start with a keyset query instead of a growing OFFSET
+        if start:
+            row = self.conn.execute(
+                "SELECT rowid FROM transcripts ORDER BY rowid LIMIT 1 OFFSET ?", (start - 1,)
+            ).fetchone()
+            if row is None:
+                return
+            last_rowid, position = row[0], start
+        while stop is None or position < stop:
+            limit = batch_size if stop is None else min(batch_size, stop - position)
+            rows = self.conn.execute(
+                "SELECT rowid, id, text FROM transcripts WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, limit)
+            ).fetchall()
+            if not rows:
+                return
+            for rowid, transcript_id, text in rows:
+                yield transcript_id, text
+            last_rowid = rows[-1][0]
+            position += len(rows)
+
+    def ids(self) -> Iterator[str]:
+        """Iterate all IDs without fetching text"""
+        for (transcript_id,) in self.conn.execute("SELECT id FROM transcripts ORDER BY rowid"):
+            yield transcript_id
+
+    def sample(self, n: int, seed: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Random sample of n transcripts, drawn by rowid rather than by sorting the table"""
+        rng = random.Random(seed)
+        max_rowid = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM transcripts").fetchone()[0]
+        n = min(n, len(self))
+        found = {}
+        while len(found) < n:
+            wanted = rng.sample(range(1, max_rowid + 1), min(max_rowid, (n - len(found)) * 2))
+            placeholders = ','.join('?' * len(wanted))
+            for rowid, transcript_id, text in self.conn.execute(
+                f"SELECT rowid, id, text FROM transcripts WHERE rowid IN ({placeholders})", wanted
+            ):
+                if len(found) < n:
+                    found[rowid] = (transcript_id, text)
+        return list(found.values())
+
+    def search(self, query: str, limit: Optional[int] = 100) -> List[Tuple[str, str]]:
+        """
+        Full-text search using FTS5 query syntax
+        Args:
+            query: e.g. 'fungal AND infection' or '"chest pain"'
+            limit: Maximum results, None for all
+        Returns:
+            (id, text) pairs ordered by relevance
+        """
+        sql = (
+            "SELECT t.id, t.text FROM transcripts_fts f JOIN transcripts t ON t.rowid = f.rowid "
+            "WHERE transcripts_fts MATCH ? ORDER BY f.rank"
+        )
+        params: Tuple = (query,)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (query, limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Convert transcripts.json into a store')
+    build.add_argument('source')
+    build.add_argument('db')
+
+    get = commands.add_parser('get', help='Print one transcript')
+    get.add_argument('db')
+    get.add_argument('id')
+
+    search = commands.add_parser('search', help='Full-text search')
+    search.add_argument('db')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        store = TranscriptStore.build(args.source, args.db)
+        print(f"Stored {len(store)} transcripts in {args.db}")
+    elif args.command == 'get':
+        print(TranscriptStore(args.db)[args.id])
+    else:
+        for transcript_id, text in TranscriptStore(args.db).search(args.query, args.limit):
+            print(f"{transcript_id}: {text[:120]}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched, cached translation of transcripts for the Cantonese data conversion.
+
+Transcripts are split into line-level segments (one speaker turn per line,
+with the D:/P: tag kept out of the translation). Each segment is looked up in
+a persistent translation memory first; only misses are sent to the backend,
+in batches, on a bounded thread pool with retries. Translated transcripts are
+appended to a JSONL file that doubles as the checkpoint, so an interrupted
+run resumes where it stopped, and rerunning after a source edit only
+translates the segments that changed. Once every source document has been
+seen, the file is compacted to one current record per document, in source
+order, dropping outdated and deleted ones.
+
+Usage:
+    python translation.py transcripts.db cantonese.jsonl [--backend google] [--target zh-TW]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+TAG_PATTERN = re.compile(r'^(\s*(?:D|P):\s*)')
+
+
+class StubBackend:
+    """Offline backend that tags text instead of translating it, for tests and dry runs"""
+    name = 'stub'
+
+    def translate_batch(self, texts: Sequence[str], source: str, target: str) -> List[str]:
+        return [f'[{target}] {text}' for text in texts]
+
+
+class GoogleTransBackend:
+    """Remote backend using googletrans, as in the original notebook"""
+    name = 'google'
+
+    def __init__(self):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def translate_batch(self, texts: Sequence[str], source: str, target: str) -> List[str]:
+        results = self.translator.translate(list(texts), src=source, dest=target)
+        return [result.text for result in results]
+
+
+class LLMBackend:
+    """Local backend using a model with LLMInference's batch_generate interface"""
+
+    def __init__(self, llm: Any, model_name: str = 'local', max_length: int = 512):
+        """
+        Args:
+            llm: Object with batch_generate(prompts, **kwargs) -> List[List[str]], e.g. LLMInference
+            model_name: Identifies the model in translation memory keys
+            max_length: Maximum generated sequence length
+        """
+        self.llm = llm
+        self.name = f'llm:{model_name}'
+        self.max_length = max_length
+
+    def translate_batch(self, texts: Sequence[str], source: str, target: str) -> List[str]:
+        prompts = [
+            f"Translate the following text from {source} to {target}. "
+            f"Reply with the translation only.\n\n{text}"
+            for text in texts
+        ]
+        outputs = self.llm.batch_generate(prompts, max_length=self.max_length, temperature=0.1)
+        return [responses[0].strip() for responses in outputs]
+
+
+class TranslationMemory:
+    """Persistent segment-level translation cache backed by SQLite"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "key TEXT PRIMARY KEY, backend TEXT, source TEXT, target TEXT, "
+            "text TEXT, translation TEXT)"
+        )
+
+    @staticmethod
+    def key(backend: str, source: str, target: str, text: str) -> str:
+        return hashlib.sha256('\0'.join([backend, source, target, text]).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        """Cached translations for the given keys, misses are left out"""
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(self.conn.execute(
+                    f"SELECT key, translation FROM segments WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+        return found
+
+    def put_many(self, rows: Iterable[Tuple[str, str, str, str, str, str]]) -> None:
+        """Store (key, backend, source, target, text, translation) rows"""
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO segments VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compact_checkpoint(path: str, current: Dict[str, str]) -> int:
+    """
+    Rewrite a checkpoint with the last record per id, keeping only records that match the source
+    Args:
+        path: JSONL written by translate_documents
+        current: Source hash per document id, in source order
+    Returns:
+        Records kept
+    """
+    offsets: Dict[str, int] = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if current.get(record['id']) == (record.get('source_hash') or source_hash(record['source'])):
+                    offsets[record['id']] = offset
+            offset += len(line)
+    tmp_path = f'{path}.tmp'
+    with open(path, 'rb') as in_f, open(tmp_path, 'wb') as out_f:
+        for doc_id in current:
+            if doc_id in offsets:
+                in_f.seek(offsets[doc_id])
+                out_f.write(in_f.readline())
+    os.replace(tmp_path, path)
+    return len(offsets)
+
+
+def split_segments(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a transcript into (prefix, segment) pairs, one per line.
+
+    The prefix keeps speaker tags and indentation out of the translation;
+    joining prefix + translated segment line by line rebuilds the transcript.
+    """
+    segments = []
+    for line in text.split('\n'):
+        match = TAG_PATTERN.match(line)
+        prefix = match.group(1) if match else line[:len(line) - len(line.lstrip())]
+        segments.append((prefix, line[len(prefix):]))
+    return segments
+
+
+class TranslationPipeline:
+    """Translate documents segment by segment through a cache and a backend"""
+
+    def __init__(
+        self,
+        backend: Any,
+        memory: TranslationMemory,
+        batch_size: int = 32,
+        max_concurrency: int = 4,
+        retries: int = 3,
+        backoff: float = 1.0
+    ):
+        """
+        Args:
+            backend: Object with name and translate_batch(texts, source, target)
+            memory: Translation memory shared by every run
+            batch_size: Segments per backend call
+            max_concurrency: Backend calls in flight
+            retries: Extra attempts for a failed batch
+            backoff: Base delay between attempts, doubled each retry
+        """
+        self.backend = backend
+        self.memory = memory
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {'segments': 0, 'cache_hits': 0, 'translated': 0, 'failed': 0}
+
+    def _translate_batch(self, texts: List[str], source: str, target: str) -> Optional[List[str]]:
+        for attempt in range(self.retries + 1):
+            try:
+                translations = self.backend.translate_batch(texts, source, target)
+                if len(translations) != len(texts):
+                    raise ValueError(f"Backend returned {len(translations)} results for {len(texts)} segments")
+                return translations
+            except Exception as e:
+                logger.warning(f"Translation batch failed (attempt {attempt + 1}): {str(e)}")
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return None
+
+    def translate_texts(self, texts: Sequence[str], source: str, target: str) -> List[str]:
+        """
+        Translate segments, serving repeats from the translation memory.
+        Segments that still fail after retries are returned untranslated.
+        """
+        return [text if translation is None else translation
+                for text, translation in zip(texts, self.translate_segments(texts, source, target))]
+
+    def translate_segments(self, texts: Sequence[str], source: str, target: str) -> List[Optional[str]]:
+        """
+        Translate segments, serving repeats from the translation memory
+        Returns:
+            One translation per segment, None where the backend failed after retries
+        """
+        keys = [TranslationMemory.key(self.backend.name, source, target, text) for text in texts]
+        cached = self.memory.get_many(list(set(keys)))
+        misses: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and text.strip():
+                misses[key] = text
+        self.stats['segments'] += len(texts)
+        self.stats['cache_hits'] += sum(1 for key in keys if key in cached)
+
+        miss_items = list(misses.items())
+        batches = [miss_items[i:i + self.batch_size] for i in range(0, len(miss_items), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = executor.map(
+                lambda batch: (batch, self._translate_batch([t for _, t in batch], source, target)),
+                batches
+            )
+            for batch, translations in results:
+                if translations is None:
+                    self.stats['failed'] += len(batch)
+                    continue
+                self.memory.put_many(
+                    (key, self.backend.name, source, target, text, translation)
+                    for (key, text), translation in zip(batch, translations)
+                )
+                cached.update((key, translation) for (key, _), translation in zip(batch, translations))
+                self.stats['translated'] += len(batch)
+
+        return [cached.get(key, text if not text.strip() else None) for key, text in zip(keys, texts)]
+
+    def translate_documents(
+        self,
+        documents: Iterable[Tuple[str, str]],
+        source: str,
+        target: str,
+        checkpoint_path: Optional[str] = None,
+        documents_per_step: int = 100
+    ) -> Iterator[Dict[str, str]]:
+        """
+        Translate (id, text) documents, yielding records as each step completes
+        Args:
+            documents: (id, text) pairs
+            source: Source language code
+            target: Target language code
+            checkpoint_path: JSONL file complete records are appended to; a document whose
+                id and source text match a record in it is skipped. Compacted with
+                compact_checkpoint once all documents have been read
+            documents_per_step: Documents whose segments are batched together
+        Yields:
+            {'id', 'source', 'source_hash', 'translation', 'failed_segments'} records; documents with
+            failed segments keep the source text for those lines and are not checkpointed, so a
+            rerun retries them, with the segments that did translate served from the memory
+        """
+        done: Dict[str, str] = {}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        done[record['id']] = record.get('source_hash') or source_hash(record['source'])
+        out_f = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+
+        def run(step: List[Tuple[str, str]]) -> Iterator[Dict[str, str]]:
+            split = [split_segments(text) for _, text in step]
+            flat = [segment for segments in split for _, segment in segments]
+            translated = iter(self.translate_segments(flat, source, target))
+            for (doc_id, text), segments in zip(step, split):
+                lines, failed = [], 0
+                for prefix, segment in segments:
+                    translation = next(translated)
+                    if translation is None:
+                        failed += 1
+                        translation = segment
+                    lines.append(prefix + translation)
+                record = {
+                    'id': doc_id,
+                    'source': text,
+                    'source_hash': source_hash(text),
+                    'translation': '\n'.join(lines),
+                    'failed_segments': failed
+                }
+                if out_f and not failed:
+                    out_f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                yield record
+            if out_f:
+                out_f.flush()
+
+        current: Dict[str, str] = {}
+        try:
+            step: List[Tuple[str, str]] = []
+            for doc_id, text in documents:
+                doc_id = str(doc_id)
+                current[doc_id] = source_hash(text)
+                if done.get(doc_id) == current[doc_id]:
+                    continue
+                step.append((doc_id, text))
+                if len(step) >= documents_per_step:
+                    yield from run(step)
+                    step = []
+            if step:
+                yield from run(step)
+        finally:
+            if out_f:
+                out_f.close()
+        # Only a complete pass knows which documents were edited or deleted
+        if checkpoint_path:
+            compact_checkpoint(checkpoint_path, current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='TranscriptStore file or transcripts.json')
+    parser.add_argument('output', help='JSONL output, also used as the resume checkpoint')
+    parser.add_argument('--backend', choices=['stub', 'google', 'llm'], default='stub')
+    parser.add_argument('--model', default='TinyLlama/TinyLlama-1.1B-Chat-v1.0',
+                        help='HuggingFace model for the llm backend')
+    parser.add_argument('--source', default='en')
+    parser.add_argument('--target', default='zh-TW')
+    parser.add_argument('--memory', default='translation_memory.db', help='Translation memory file')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    # logging_setup and LLMInference live with the app code
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+    from logging_setup import configure_logging
+
+    configure_logging()
+
+    if args.input.endswith('.json'):
+        from transcript_store import iter_json_object
+        documents = iter_json_object(args.input)
+    else:
+        from transcript_store import TranscriptStore
+        documents = TranscriptStore(args.input).iter_range()
+
+    if args.backend == 'llm':
+        from huggingface import LLMInference
+        backend = LLMBackend(LLMInference(model_name=args.model), model_name=args.model)
+    elif args.backend == 'google':
+        backend = GoogleTransBackend()
+    else:
+        backend = StubBackend()
+    pipeline = TranslationPipeline(backend, TranslationMemory(args.memory),
+                                   batch_size=args.batch_size, max_concurrency=args.concurrency)
+    count = incomplete = 0
+    for record in pipeline.translate_documents(documents, args.source, args.target, args.output):
+        count += 1
+        incomplete += bool(record['failed_segments'])
+    print(f"Translated {count} documents ({incomplete} incomplete, retried on the next run): {pipeline.stats}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parse doctor/patient transcripts into a columnar turns table.
+
+Every utterance becomes one row of (conversation_id, turn_idx, speaker, text,
+language). Transcripts are read from a TranscriptStore in ranges, parsed in a
+process pool and written as a directory of Parquet files, so downstream
+extraction and translation jobs can read turns without reparsing text.
+
+Usage:
+    python turns.py transcripts.db turns/ [--workers 8] [--chunk-size 5000]
+"""
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from transcript_store import TranscriptStore
+
+SPEAKERS = {'D': 'doctor', 'P': 'patient'}
+SPEAKER_PATTERN = re.compile(r'^(D|P):[ \t]*', re.MULTILINE)
+SCRIPT_PATTERNS = [
+    ('ar', re.compile(r'[\u0600-\u06FF]')),
+    ('zh', re.compile(r'[\u3400-\u4DBF\u4E00-\u9FFF]')),
+]
+
+SCHEMA = pa.schema([
+    ('conversation_id', pa.string()),
+    ('turn_idx', pa.int32()),
+    ('speaker', pa.string()),
+    ('text', pa.string()),
+    ('language', pa.string()),
+])
+
+
+def detect_languages(texts: Sequence[str], default: str = 'en') -> List[str]:
+    """
+    Script-based language tag for a batch of texts.
+
+    The batch is joined once and scanned once per script, with each match
+    mapped back to its text by offset, instead of looping per character.
+    """
+    languages = [default] * len(texts)
+    if not texts:
+        return languages
+    starts, position = [], 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + 1
+    joined = '\n'.join(texts)
+    for language, pattern in reversed(SCRIPT_PATTERNS):
+        index = 0
+        for match in pattern.finditer(joined):
+            while index + 1 < len(starts) and starts[index + 1] <= match.start():
+                index += 1
+            languages[index] = language
+    return languages
+
+
+def parse_transcript(conversation_id: str, text: str) -> List[Tuple[str, int, str, str]]:
+    """
+    Split one transcript into (conversation_id, turn_idx, speaker, text) rows.
+
+    Text before the first speaker tag, or a transcript with no tags at all,
+    becomes a single 'narrator' turn.
+    """
+    rows = []
+    matches = list(SPEAKER_PATTERN.finditer(text))
+    preamble = text[:matches[0].start()] if matches else text
+    if preamble.strip():
+        rows.append((conversation_id, 0, 'narrator', preamble.strip()))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        utterance = text[match.end():end].strip()
+        if utterance:
+            rows.append((conversation_id, len(rows), SPEAKERS[match.group(1)], utterance))
+    return rows
+
+
+def turns_table(transcripts: Iterable[Tuple[str, str]]) -> pa.Table:
+    """Build a turns table from (conversation_id, text) pairs"""
+    columns: Dict[str, List] = {name: [] for name in SCHEMA.names if name != 'language'}
+    for conversation_id, text in transcripts:
+        for cid, idx, speaker, utterance in parse_transcript(conversation_id, text):
+            columns['conversation_id'].append(cid)
+            columns['turn_idx'].append(idx)
+            columns['speaker'].append(speaker)
+            columns['text'].append(utterance)
+    columns['language'] = detect_languages(columns['text'])
+    return pa.table(columns, schema=SCHEMA)
+
+
+def _parse_range(db_path: str, start: int, stop: int, out_path: str) -> int:
+    store = TranscriptStore(db_path)
+    try:
+        table = turns_table(store.iter_range(start, stop))
+    finally:
+        store.close()
+    pq.write_table(table, out_path)
+    return table.num_rows
+
+
+def build_turns(db_path: str, out_dir: str, workers: Optional[int] = None, chunk_size: int = 5000) -> int:
+    """
+    Parse every transcript in a store into Parquet part files
+    Args:
+        db_path: TranscriptStore file
+        out_dir: Directory for part-NNNNN.parquet files
+        workers: Worker processes, defaults to all cores
+        chunk_size: Transcripts per part file
+    Returns:
+        Number of turns written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    store = TranscriptStore(db_path)
+    total = len(store)
+    store.close()
+
+    starts = list(range(0, total, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        counts = executor.map(
+            _parse_range,
+            [db_path] * len(starts),
+            starts,
+            [start + chunk_size for start in starts],
+            [os.path.join(out_dir, f'part-{i:05d}.parquet') for i in range(len(starts))]
+        )
+        return sum(counts)
+
+
+def read_turns(path: str, columns: Optional[List[str]] = None, filters=None) -> pa.Table:
+    """
+    Load turns written by build_turns
+    Args:
+        path: Directory of part files, or a single Parquet file
+        columns: Columns to read, all by default
+        filters: pyarrow filter expression or DNF list, e.g. [('speaker', '=', 'patient')]
+    Returns:
+        Arrow table, use .to_pandas() for a DataFrame
+    """
+    return pq.read_table(path, columns=columns, filters=filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('store', help='TranscriptStore file, or transcripts.json to convert first')
+    parser.add_argument('output_dir', help='Directory for the Parquet turns table')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Transcripts per part file')
+    args = parser.parse_args()
+
+    db_path = args.store
+    if db_path.endswith('.json'):
+        db_path = db_path[:-len('.json')] + '.db'
+        print(f"Converting {args.store} to {db_path}...")
+        TranscriptStore.build(args.store, db_path).close()
+
+    count = build_turns(db_path, args.output_dir, args.workers, args.chunk_size)
+    print(f"Wrote {count} turns to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+-- Scale the patients table from data.sql up for benchmarking.
+-- Run after data.sql and schema_extensions.sql.
+-- Usage: psql -v rows=1000000 -f generate_patients.sql
+\if :{?rows}
+\else
+\set rows 1000000
+\endif
+
+-- Skip the census triggers during the load and rebuild the census once at the end
+ALTER TABLE patients DISABLE TRIGGER USER;
+
+INSERT INTO patients (mrn, first_name, last_name, date_of_birth, gender, blood_type, admission_date, discharge_date, primary_diagnosis, insurance_provider, room_number)
+SELECT
+    'MRN' || LPAD(n::TEXT, GREATEST(6, length(n::TEXT)), '0') AS mrn,
+    (ARRAY['James', 'John', 'Robert', 'Mary', 'Patricia', 'Jennifer', 'Michael', 'William', 'David', 'Linda',
+           'Elizabeth', 'Sarah', 'Richard', 'Joseph', 'Thomas', 'Barbara', 'Susan', 'Jessica', 'Charles', 'Karen'])[1 + floor(random() * 20)::INTEGER] AS first_name,
+    (ARRAY['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+           'Anderson', 'Taylor', 'Thomas', 'Moore', 'Jackson', 'Martin', 'Lee', 'Thompson', 'White', 'Harris'])[1 + floor(random() * 20)::INTEGER] AS last_name,
+    (CURRENT_DATE - (random() * 365 * 80)::INTEGER * INTERVAL '1 day')::DATE AS date_of_birth,
+    CASE WHEN random() < 0.5 THEN 'Male' ELSE 'Female' END AS gender,
+    (ARRAY['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-'])[1 + floor(random() * 8)::INTEGER] AS blood_type,
+    admitted AS admission_date,
+    CASE
+        WHEN random() < 0.9
+        THEN admitted + (1 + random() * 14)::INTEGER * INTERVAL '1 day'
+        ELSE NULL
+    END AS discharge_date,
+    (ARRAY['Pneumonia', 'Fractured Femur', 'Acute Appendicitis', 'Myocardial Infarction', 'Type 2 Diabetes',
+           'Chronic Kidney Disease', 'Asthma Exacerbation', 'COVID-19', 'Hypertensive Crisis', 'Gastroenteritis'])[1 + floor(random() * 10)::INTEGER] AS primary_diagnosis,
+    (ARRAY['Blue Cross', 'Aetna', 'UnitedHealth', 'Cigna', 'Medicare', 'Medicaid', 'Kaiser Permanente', 'Humana'])[1 + floor(random() * 8)::INTEGER] AS insurance_provider,
+    CONCAT(floor(random() * 5 + 1), floor(random() * 100 + 1)::TEXT) AS room_number
+FROM (
+    -- Admissions spread over three years so date range queries are selective
+    SELECT n, CURRENT_TIMESTAMP - (random() * 365 * 3) * INTERVAL '1 day' AS admitted
+    FROM generate_series(101, 100 + :rows) AS n
+) seed
+ON CONFLICT (mrn) DO NOTHING;
+
+ALTER TABLE patients ENABLE TRIGGER USER;
+
+SELECT refresh_patient_census();
+REFRESH MATERIALIZED VIEW daily_admissions;
+ANALYZE patients;
@@ -0,0 +1,119 @@
+-- Indexes and summary tables for the patients table created in data.sql.
+-- Safe to run more than once.
+
+-- Diagnosis lookups, usually narrowed to a recent admission window
+CREATE INDEX IF NOT EXISTS idx_patient_diagnosis_admission
+    ON patients (primary_diagnosis, admission_date);
+
+-- Admission date range scans
+CREATE INDEX IF NOT EXISTS idx_patient_admission
+    ON patients (admission_date);
+
+-- Insurance breakdowns, usually narrowed to a recent admission window
+CREATE INDEX IF NOT EXISTS idx_patient_insurance_admission
+    ON patients (insurance_provider, admission_date);
+
+-- Open admissions are a small slice of the table, index only those rows.
+-- Leading with admission_date serves "most recent open admissions" with an
+-- index scan and LIMIT; an earlier version led with primary_diagnosis.
+DROP INDEX IF EXISTS idx_patient_open_admissions;
+CREATE INDEX IF NOT EXISTS idx_patient_open_admissions_by_date
+    ON patients (admission_date)
+    WHERE discharge_date IS NULL;
+
+-- Room lookups for currently admitted patients
+CREATE INDEX IF NOT EXISTS idx_patient_open_rooms
+    ON patients (room_number)
+    WHERE discharge_date IS NULL;
+
+-- Census of admissions per diagnosis and insurer. Kept up to date
+-- incrementally by the statement triggers below, so reads never scan patients.
+CREATE TABLE IF NOT EXISTS patient_census (
+    primary_diagnosis VARCHAR(100) NOT NULL,
+    insurance_provider VARCHAR(50) NOT NULL,
+    total_admissions BIGINT NOT NULL DEFAULT 0,
+    open_admissions BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (primary_diagnosis, insurance_provider)
+);
+
+-- Rebuild the census from scratch, e.g. after loading with triggers disabled
+CREATE OR REPLACE FUNCTION refresh_patient_census() RETURNS void AS $$
+BEGIN
+    TRUNCATE patient_census;
+    INSERT INTO patient_census (primary_diagnosis, insurance_provider, total_admissions, open_admissions)
+    SELECT
+        COALESCE(primary_diagnosis, 'Unknown'),
+        COALESCE(insurance_provider, 'Unknown'),
+        count(*),
+        count(*) FILTER (WHERE discharge_date IS NULL)
+    FROM patients
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply the rows changed by one statement to the census
+CREATE OR REPLACE FUNCTION patient_census_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO patient_census AS c (primary_diagnosis, insurance_provider, total_admissions, open_admissions)
+        SELECT
+            COALESCE(primary_diagnosis, 'Unknown'),
+            COALESCE(insurance_provider, 'Unknown'),
+            -count(*),
+            -count(*) FILTER (WHERE discharge_date IS NULL)
+        FROM old_rows
+        GROUP BY 1, 2
+        ON CONFLICT (primary_diagnosis, insurance_provider) DO UPDATE SET
+            total_admissions = c.total_admissions + EXCLUDED.total_admissions,
+            open_admissions = c.open_admissions + EXCLUDED.open_admissions;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO patient_census AS c (primary_diagnosis, insurance_provider, total_admissions, open_admissions)
+        SELECT
+            COALESCE(primary_diagnosis, 'Unknown'),
+            COALESCE(insurance_provider, 'Unknown'),
+            count(*),
+            count(*) FILTER (WHERE discharge_date IS NULL)
+        FROM new_rows
+        GROUP BY 1, 2
+        ON CONFLICT (primary_diagnosis, insurance_provider) DO UPDATE SET
+            total_admissions = c.total_admissions + EXCLUDED.total_admissions,
+            open_admissions = c.open_admissions + EXCLUDED.open_admissions;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS patient_census_insert ON patients;
+CREATE TRIGGER patient_census_insert AFTER INSERT ON patients
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION patient_census_apply();
+
+DROP TRIGGER IF EXISTS patient_census_update ON patients;
+CREATE TRIGGER patient_census_update AFTER UPDATE ON patients
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION patient_census_apply();
+
+DROP TRIGGER IF EXISTS patient_census_delete ON patients;
+CREATE TRIGGER patient_census_delete AFTER DELETE ON patients
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION patient_census_apply();
+
+-- Seed the census with the rows that existed before the triggers
+SELECT refresh_patient_census();
+
+-- Daily admissions for the dashboards, refreshed with
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY daily_admissions;
+CREATE MATERIALIZED VIEW IF NOT EXISTS daily_admissions AS
+SELECT
+    admission_date::DATE AS day,
+    primary_diagnosis,
+    count(*) AS admissions
+FROM patients
+GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_admissions
+    ON daily_admissions (day, primary_diagnosis);
+
+ANALYZE patients;
@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from build_dataset import FORMATS, assign_split, build_dataset, iter_records
+
+
+def make_records(count):
+    return [{"id": str(i), "source": f"P: symptom {i}", "translation": f"P: 症狀 {i}"} for i in range(count)]
+
+
+def read_file(path, fmt):
+    if fmt == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    if fmt == "jsonl.zst":
+        zstandard = pytest.importorskip("zstandard")
+        with open(path, "rb") as f:
+            text = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(f), encoding="utf-8").read()
+        return [json.loads(line) for line in text.splitlines()]
+    pa = pytest.importorskip("pyarrow")
+    with pa.OSFile(str(path), "rb") as f:
+        return pa.ipc.open_file(f).read_all().to_pylist()
+
+
+def test_split_is_stable_and_follows_the_ratios():
+    ratios = (0.8, 0.1, 0.1)
+    splits = [assign_split(str(i), ratios) for i in range(10_000)]
+    assert splits == [assign_split(str(i), ratios) for i in range(10_000)]
+    assert abs(splits.count("train") / len(splits) - 0.8) < 0.02
+    assert abs(splits.count("val") / len(splits) - 0.1) < 0.02
+    # The salt reshuffles without changing the IDs
+    assert splits != [assign_split(str(i), ratios, salt="v2") for i in range(10_000)]
+
+
+def test_iter_records_keeps_the_last_record_per_id(tmp_path):
+    path = tmp_path / "cantonese.jsonl"
+    records = make_records(2) + [{"id": "0", "source": "P: edited", "translation": "P: 改咗"}]
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    assert [(r["id"], r["source"]) for r in iter_records(str(path))] == [("1", "P: symptom 1"), ("0", "P: edited")]
+    manifest = build_dataset(iter_records(str(path)), str(tmp_path / "out"), ["pairs"])
+    assert manifest["records"] == 2
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_shards_in_every_format(tmp_path, fmt):
+    records = make_records(250)
+    manifest = build_dataset(records, str(tmp_path), ["pairs", "text"], fmt=fmt, shard_size=40)
+    assert manifest["records"] == 250
+
+    for template in ("pairs", "text"):
+        rows = []
+        for split, entry in manifest["templates"][template].items():
+            assert all(file["records"] <= 40 for file in entry["files"])
+            split_rows = []
+            for file in entry["files"]:
+                split_rows += read_file(tmp_path / file["file"], fmt)
+            assert len(split_rows) == entry["records"]
+            rows += split_rows
+        assert len(rows) == 250
+
+    pairs = {}
+    for split, entry in manifest["templates"]["pairs"].items():
+        for file in entry["files"]:
+            for row in read_file(tmp_path / file["file"], fmt):
+                pairs[row["output"]] = split
+    assert all(pairs[r["source"]] == assign_split(r["id"], (0.9, 0.05, 0.05)) for r in records)
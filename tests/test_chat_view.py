@@ -0,0 +1,132 @@
+import contextlib
+import importlib
+import importlib.util
+import sys
+import types
+
+import pytest
+
+
+class FakeStreamlit(types.ModuleType):
+    """Records what a ChatView draws; button keys listed in `clicks` report a click"""
+
+    def __init__(self):
+        super().__init__("streamlit")
+        self.session_state = {}
+        self.clicks = set()
+        self.buttons = []
+        self.drawn = []
+
+    def button(self, label, key=None):
+        self.buttons.append(label)
+        return key in self.clicks
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.drawn.append(body)
+
+    def chat_message(self, name):
+        self.drawn.append(f"[{name}]")
+        return contextlib.nullcontext()
+
+    def write(self, text):
+        self.drawn.append(text)
+
+    def rerun(self):
+        self.buttons, self.drawn = [], []
+
+
+@pytest.fixture
+def st(monkeypatch):
+    fake = FakeStreamlit()
+    if importlib.util.find_spec("streamlit") is None:
+        monkeypatch.setitem(sys.modules, "streamlit", fake)
+    chat_view = importlib.import_module("chat_view")
+    monkeypatch.setattr(chat_view, "st", fake)
+    return fake
+
+
+def messages(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(n)]
+
+
+def html_view(calls=None):
+    from chat_view import ChatView
+
+    def to_html(message):
+        if calls is not None:
+            calls.append(message["content"])
+        return f"<{message['content']}>"
+    return ChatView("chat", to_html=to_html, page_size=3)
+
+
+def test_only_newest_page_is_drawn(st):
+    html_view().render(messages(7))
+    assert st.drawn == ["<m6>"]
+    assert st.buttons == ["Show earlier messages (6 hidden)"]
+
+
+def test_short_history_has_no_button(st):
+    html_view().render(messages(3))
+    assert st.drawn == ["<m0><m1><m2>"]
+    assert st.buttons == []
+
+
+def test_show_earlier_messages_pages_back(st):
+    view = html_view()
+    history = messages(7)
+    view.render(history)
+
+    st.clicks.add("chat_more")
+    st.rerun()
+    view.render(history)
+    assert st.drawn == ["<m3><m4><m5>", "<m6>"]
+
+    st.rerun()
+    view.render(history)
+    assert st.drawn == ["<m0><m1><m2>", "<m3><m4><m5>", "<m6>"]
+    assert view.state.pages_shown == 3
+
+
+def test_messages_are_converted_once(st):
+    calls = []
+    view = html_view(calls)
+    history = messages(4)
+    view.render(history)
+    history += messages(6)[4:]
+    st.rerun()
+    view.render(history)
+    assert calls == [f"m{i}" for i in range(6)]
+    assert st.drawn == ["<m3><m4><m5>"]
+
+    # Earlier pages are joined when first shown and kept, the last page is not
+    st.clicks.add("chat_more")
+    st.rerun()
+    view.render(history)
+    assert st.drawn == ["<m0><m1><m2>", "<m3><m4><m5>"]
+    assert view.state.pages == {0: "<m0><m1><m2>"}
+
+
+def test_replaced_history_resets_the_cache(st):
+    view = html_view()
+    view.render(messages(7))
+    st.clicks.add("chat_more")
+    st.rerun()
+    view.render(messages(7))
+
+    # Same length but new message objects, e.g. after a role switch
+    st.clicks.clear()
+    st.rerun()
+    view.render([{"role": "user", "content": f"n{i}"} for i in range(7)])
+    assert st.drawn == ["<n6>"]
+    assert view.state.pages_shown == 1
+
+    st.rerun()
+    view.render([])
+    assert st.drawn == [] and view.state.count == 0
+
+
+def test_chat_message_mode_draws_shown_page(st):
+    from chat_view import ChatView
+
+    ChatView("plain", page_size=2).render(messages(3))
+    assert st.drawn == ["[user]", "m2"]
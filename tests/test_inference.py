@@ -0,0 +1,34 @@
+import threading
+import time
+
+import pytest
+
+from inference import DeadlineExceeded, RoleRoute, RoleRouter
+
+
+def test_cancelled_request_past_its_deadline_does_not_kill_the_worker():
+    gate = threading.Event()
+
+    def backend(user_input):
+        if user_input == "block":
+            gate.wait(5)
+        return f"reply to {user_input}"
+
+    route = RoleRoute(lambda: backend, lambda user_input: "fallback", priority=0, max_concurrency=1, deadline=30.0)
+    router = RoleRouter({"Doctor": route}, workers=1)
+
+    blocking = router.submit("block", "Doctor")
+    time.sleep(0.05)
+    cancelled = router.submit("cancelled", "Doctor", deadline=0.05)
+    expired = router.submit("expired", "Doctor", deadline=0.05)
+    assert cancelled.cancel()
+    time.sleep(0.1)
+    gate.set()
+
+    assert blocking.result(timeout=5) == "reply to block"
+    with pytest.raises(DeadlineExceeded):
+        expired.result(timeout=5)
+    assert cancelled.cancelled()
+    # The single worker is still alive
+    assert router.submit("after", "Doctor").result(timeout=5) == "reply to after"
+    assert router.queue_depths() == {"Doctor": 0}
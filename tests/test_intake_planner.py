@@ -0,0 +1,42 @@
+import pytest
+
+from intake_planner import INTAKE_FIELDS, mentions_red_flag, parse_answer
+
+
+@pytest.mark.parametrize("text", [
+    "I have chest pain",
+    "my left arm feels numb",
+    "no fever but I fainted this morning",
+    "I don't have a cough. There was blood in my sputum",
+    "胸口痛",
+    "I've been coughing up blood",
+])
+def test_red_flags(text):
+    assert mentions_red_flag(text)
+
+
+@pytest.mark.parametrize("text", [
+    "no chest pain",
+    "not numb at all",
+    "denies shortness of breath",
+    "I don't have any chest pain",
+    "no chest pain or shortness of breath",
+    "without bleeding",
+    "冇胸口痛",
+    "I have high blood pressure",
+    "my blood test was normal",
+    "",
+])
+def test_negated_red_flags(text):
+    assert not mentions_red_flag(text)
+
+
+@pytest.mark.parametrize("answer, age", [("45", "45"), ("I'm 45 years old", "45"), ("45歲", "45"), ("我今年45歲", "45")])
+def test_age_in_english_and_cantonese(answer, age):
+    field = next(field for field in INTAKE_FIELDS if field.kind == "age")
+    assert parse_answer(field, answer) == age
+
+
+def test_age_rejects_longer_numbers():
+    field = next(field for field in INTAKE_FIELDS if field.kind == "age")
+    assert parse_answer(field, "1985") is None
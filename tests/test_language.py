@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from language import DEFAULT_MODEL, LanguagePipeline, SegmentCache, detect_language, split_sentences
+
+
+class RecordingTranslator:
+    """Tags the text with the target language and records every call"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def translate(self, text, source, target):
+        with self.lock:
+            self.calls.append(text)
+        if text == self.fail_on:
+            raise RuntimeError("service unavailable")
+        return f"<{target}:{text}>"
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = LanguagePipeline(RecordingTranslator(), native_models={"en": DEFAULT_MODEL}, max_workers=4)
+    yield pipeline
+    pipeline.executor.shutdown()
+    pipeline.background.shutdown()
+
+
+def test_detect_language():
+    assert detect_language("My head hurts") == "en"
+    assert detect_language("我個頭好痛，痛咗兩日") == "yue"
+    assert detect_language("我有發燒 fever") == "yue"
+    assert detect_language("I took 1 Panadol 止痛 this morning") == "en"
+    assert detect_language("123 ?!") == "en"
+    assert detect_language("", default="yue") == "yue"
+
+
+def test_split_sentences_round_trips():
+    text = "Thank you. How long?\n好痛！痛咗兩日"
+    assert split_sentences(text) == ["Thank you. ", "How long?\n", "好痛！", "痛咗兩日"]
+    assert "".join(split_sentences(text)) == text
+
+
+def test_segment_cache_evicts_least_recently_used():
+    cache = SegmentCache(max_items=2)
+    cache.put("en", "yue", "a", "A")
+    cache.put("en", "yue", "b", "B")
+    assert cache.get("en", "yue", " a ") == "A"
+    cache.put("en", "yue", "c", "C")
+    assert cache.get("en", "yue", "b") is None
+    assert cache.get("en", "yue", "a") == "A"
+    assert cache.get("en", "yue", "c") == "C"
+    assert cache.get("yue", "en", "a") is None
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_route_prefers_native_model():
+    pipeline = LanguagePipeline(RecordingTranslator(), native_models={"en": "english-model", "yue": "canto-model"})
+    assert pipeline.route("yue").model == "canto-model" and not pipeline.route("yue").translate
+    fallback = pipeline.route("fr")
+    assert fallback.model == "english-model" and fallback.translate
+
+
+def test_translate_reuses_cached_segments(pipeline):
+    assert pipeline.translate("Thank you. Any fever?", "en", "yue") == "<yue:Thank you.><yue:Any fever?>"
+    assert pipeline.translate("Thank you. Any cough? Thank you.", "en", "yue") == \
+        "<yue:Thank you.><yue:Any cough?><yue:Thank you.>"
+    assert pipeline.translator.calls.count("Thank you.") == 1
+    assert sorted(pipeline.translator.calls) == ["Any cough?", "Any fever?", "Thank you."]
+
+
+def test_translate_keeps_english_spacing_and_skips_same_language(pipeline):
+    assert pipeline.translate("Hi. Bye.", "yue", "en") == "<en:Hi.> <en:Bye.>"
+    assert pipeline.translate("Hi. Bye.", "en", "en") == "Hi. Bye."
+    assert pipeline.translate("  ", "en", "yue") == "  "
+
+
+def test_failed_segment_is_kept_and_not_cached(pipeline):
+    pipeline.translator.fail_on = "Any fever?"
+    assert pipeline.translate("Hello. Any fever?", "en", "yue") == "<yue:Hello.>Any fever?"
+    pipeline.translator.fail_on = None
+    assert pipeline.translate_async("Any fever?", "en", "yue").result(timeout=5) == "<yue:Any fever?>"
+    assert pipeline.translator.calls.count("Any fever?") == 2
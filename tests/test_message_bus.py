@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from message_bus import ConversationBus
+
+
+@pytest.fixture
+def bus():
+    bus = ConversationBus(capacity=10, max_conversations=3)
+    yield bus
+    bus.close()
+
+
+def test_least_recently_used_conversations_are_dropped(bus):
+    for conversation in ["a", "b", "c"]:
+        bus.publish(conversation, "patient", "hello")
+    bus.read("a")
+    bus.publish("d", "patient", "hello")
+    assert set(bus._conditions) == {"a", "c", "d"}
+    assert set(bus._buffers) == set(bus._seq) == set(bus._waiting) == {"a", "c", "d"}
+
+
+def test_reader_of_dropped_conversation_gets_new_messages(bus):
+    seen = bus.publish("a", "patient", "first").seq
+    for conversation in ["b", "c", "d"]:
+        bus.publish(conversation, "patient", "hello")
+    assert "a" not in bus._conditions
+    bus.publish("a", "doctor", "second")
+    assert [delta.message for delta in bus.read("a", after=seen)] == ["second"]
+
+
+def test_waiting_reader_keeps_its_conversation(bus):
+    result = []
+    reader = threading.Thread(target=lambda: result.extend(bus.read("a", after=0, timeout=5.0)))
+    reader.start()
+    while not bus._waiting.get("a"):
+        pass
+    for conversation in ["b", "c", "d", "e"]:
+        bus.publish(conversation, "patient", "hello")
+    bus.publish("a", "doctor", "reply")
+    reader.join()
+    assert [delta.message for delta in result] == ["reply"]
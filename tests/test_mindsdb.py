@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from mindsdb import AgentManager
+
+AGENT = "sql_assistant"
+
+
+class FakeMindsDB:
+    """
+    Local HTTP server answering MindsDB's agent completion endpoint.
+
+    The question decides the behaviour: "hang" never answers until the test
+    ends, "flaky" fails with a 500 on its first request, anything else is
+    echoed back.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                question = body["messages"][0]["question"]
+                with fake.lock:
+                    fake.requests.append((time.monotonic(), question))
+                    seen = sum(1 for _, q in fake.requests if q == question)
+                if question == "hang":
+                    fake.release.wait(30)
+                    return
+                if question == "flaky" and seen == 1:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                payload = json.dumps({"message": {"content": f"answer to {question}"}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def count(self, question):
+        with self.lock:
+            return sum(1 for _, q in self.requests if q == question)
+
+    def stop(self):
+        self.release.set()
+        self.httpd.shutdown()
+
+
+class HTTPAgent:
+    """Agent client without a request timeout, like mindsdb_sdk's"""
+
+    def __init__(self, url, name):
+        self.url = f"{url}/api/projects/mindsdb/agents/{name}/completions"
+
+    def completion(self, messages):
+        request = urllib.request.Request(self.url, json.dumps({"messages": messages}).encode(),
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return SimpleNamespace(content=json.load(response)["message"]["content"])
+
+
+@pytest.fixture
+def server():
+    server = FakeMindsDB()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def manager(server):
+    agents = SimpleNamespace(get=lambda name: HTTPAgent(server.url, name))
+    return AgentManager(SimpleNamespace(server=SimpleNamespace(agents=agents)))
+
+
+def test_hung_attempt_times_out_without_blocking_others(manager):
+    start = time.perf_counter()
+    results = manager.bulk_completion(AGENT, ["hang", "ok"], max_workers=2, timeout=0.3, retries=0)
+    assert time.perf_counter() - start < 2
+    assert not results[0].success and "Timed out" in results[0].error
+    assert results[1].success and results[1].answer == "answer to ok"
+
+
+def test_abandoned_calls_do_not_starve_later_attempts(server, manager):
+    # Every attempt must reach the server even though earlier ones never return
+    results = manager.bulk_completion(AGENT, ["hang"] * 4, max_workers=1, timeout=0.2, retries=1, backoff=0.01)
+    assert all(not result.success and result.attempts == 2 for result in results)
+    assert server.count("hang") == 8
+
+
+def test_failed_attempt_is_retried(server, manager):
+    [result] = manager.bulk_completion(AGENT, ["flaky"], timeout=5, retries=2, backoff=0.01)
+    assert result.success and result.attempts == 2
+    assert server.count("flaky") == 2
+
+
+def test_rate_limit(server, manager):
+    questions = [f"q{i}" for i in range(15)]
+    start = time.perf_counter()
+    results = manager.bulk_completion(AGENT, questions, max_workers=15, rate_limit=10.0, timeout=5)
+    assert all(result.success for result in results)
+    # A burst of 10, then one request every 100 ms
+    assert time.perf_counter() - start >= 0.4
+    times = sorted(t for t, _ in server.requests)
+    for k in range(10, 15):
+        assert times[k] - times[0] >= (k - 9) / 10 - 0.02
+
+
+def test_summary_logs_wall_time(manager, caplog):
+    # Four concurrent 0.3 s timeouts take about 0.3 s, not the 1.2 s they add up to
+    with caplog.at_level("INFO", logger="mindsdb"):
+        results = manager.bulk_completion(AGENT, ["hang"] * 4, max_workers=4, timeout=0.3, retries=0)
+    [summary] = [r for r in caplog.records if r.getMessage().startswith("Bulk completion")]
+    assert sum(result.duration for result in results) >= 1.2
+    assert 300 <= summary.duration_ms < 1000
@@ -0,0 +1,19 @@
+from near_dedup import NearDuplicateFinder, optimal_bands
+
+
+def s_curve(similarity, bands, rows):
+    return 1 - (1 - similarity ** rows) ** bands
+
+
+def test_default_bands_catch_pairs_at_the_threshold():
+    bands, rows = optimal_bands(0.8, 128)
+    assert bands * rows <= 128
+    assert s_curve(0.8, bands, rows) >= 0.9
+    assert s_curve(0.5, bands, rows) < 0.1
+
+
+def test_dedup_reads_an_iterator_once():
+    base = "the patient reported chest pain and shortness of breath after climbing stairs yesterday evening"
+    texts = [base, base + " again", "a fungal infection with an itchy skin rash spreading over both arms"]
+    finder = NearDuplicateFinder(threshold=0.8, workers=1)
+    assert finder.dedup(iter(texts)) == [0, 2]
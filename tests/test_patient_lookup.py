@@ -0,0 +1,82 @@
+from datetime import date, datetime
+
+import pytest
+
+from patient_lookup import LookupFilters, QueryRouter, build_query, parse_filters
+
+
+@pytest.mark.parametrize("question, mrn", [
+    ("Look up MRN000042", "MRN000042"),
+    ("look up mrn 42", "MRN000042"),
+    ("Patient MRN#7", "MRN000007"),
+    ("MRN: 1234567", "MRN1234567"),
+])
+def test_mrn_is_zero_padded(question, mrn):
+    assert parse_filters(question).mrn == mrn
+
+
+def test_room_diagnosis_and_date_range():
+    filters = parse_filters("pneumonia patients in room number 312 admitted between 2024-11-01 and 2024-11-30")
+    assert filters == LookupFilters(room_number="312", primary_diagnosis="Pneumonia",
+                                    admitted_from=date(2024, 11, 1), admitted_to=date(2024, 11, 30))
+
+
+def test_open_date_ranges_and_invalid_dates():
+    assert parse_filters("covid-19 since 2024-01-15").admitted_from == date(2024, 1, 15)
+    assert parse_filters("admitted before 2024-02-01").admitted_to == date(2024, 2, 1)
+    filters = parse_filters("asthma exacerbation after 2024-02-30")
+    assert filters.primary_diagnosis == "Asthma Exacerbation"
+    assert filters.admitted_from is None and filters.admitted_to is None
+
+
+def test_build_query_orders_clauses_and_parameters():
+    query, params = build_query(LookupFilters(mrn="MRN000042", admitted_to=date(2024, 3, 1), room_number="12"))
+    where = query.split("WHERE ")[1]
+    assert where.startswith("mrn = %s AND room_number = %s AND admission_date < %s::date + 1 ORDER BY")
+    assert params == ["MRN000042", "12", date(2024, 3, 1)]
+    # The same filters in another order give the same statement
+    assert build_query(LookupFilters(room_number="12", admitted_to=date(2024, 3, 1), mrn="MRN000042"))[0] == query
+
+
+class FakeRouter(QueryRouter):
+    def __init__(self, rows=None, error=None):
+        super().__init__(fallback=lambda question: f"agent: {question}")
+        self.rows, self.error, self.lookups = rows or [], error, []
+
+    def lookup(self, filters):
+        self.lookups.append(filters)
+        if self.error:
+            raise self.error
+        return self.rows
+
+
+ROW = {"mrn": "MRN000042", "first_name": "Mary", "last_name": "Lee", "primary_diagnosis": "Pneumonia",
+       "room_number": "312", "admission_date": datetime(2024, 11, 2), "discharge_date": None,
+       "insurance_provider": "Medicare"}
+
+
+def test_structured_question_is_answered_from_the_database():
+    router = FakeRouter(rows=[ROW])
+    result = router.ask("Who is in room 312?")
+    assert result.route == "sql" and result.rows == [ROW]
+    assert "MRN000042: Mary Lee, Pneumonia, room 312" in result.answer
+
+
+@pytest.mark.parametrize("question", [
+    "How many patients have pneumonia?",
+    "Which diagnosis has the longest average stay?",
+    "Summarize the admissions in room 312",
+    "What is the weather like?",
+])
+def test_open_ended_questions_go_to_the_agent(question):
+    router = FakeRouter(rows=[ROW])
+    result = router.ask(question)
+    assert result.route == "agent" and result.answer == f"agent: {question}"
+    assert router.lookups == []
+
+
+def test_failed_lookup_falls_back_to_the_agent():
+    router = FakeRouter(error=ConnectionError("database is down"))
+    result = router.ask("Look up MRN000042")
+    assert result.route == "agent" and result.answer == "agent: Look up MRN000042"
+    assert router.lookups == [LookupFilters(mrn="MRN000042")]
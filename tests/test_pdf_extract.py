@@ -0,0 +1,57 @@
+import sys
+import types
+
+import pdf_extract
+from pdf_extract import extract_pdf, load_cached
+
+GOOD = "The patient was admitted with community acquired pneumonia and started on antibiotics."
+
+
+def make_pdf(tmp_path, content=b"%PDF-1.4 fake"):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_pdfminer_drops_trailing_form_feed_page(monkeypatch):
+    high_level = types.ModuleType("pdfminer.high_level")
+    high_level.extract_text = lambda path: "page one\fpage two\f"
+    monkeypatch.setitem(sys.modules, "pdfminer", types.ModuleType("pdfminer"))
+    monkeypatch.setitem(sys.modules, "pdfminer.high_level", high_level)
+    assert pdf_extract._pages_pdfminer("x.pdf") == ["page one", "page two"]
+
+
+def test_first_backend_passing_quality_check_is_cached(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(pdf_extract.BACKENDS, "good", lambda path: calls.append(path) or [GOOD])
+    path = make_pdf(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+
+    first = extract_pdf(path, backends=("good",), cache_dir=cache_dir)
+    second = extract_pdf(path, backends=("good",), cache_dir=cache_dir)
+    assert first.success and first.backend == "good" and not first.cached
+    assert second.cached and second.pages == [GOOD]
+    assert len(calls) == 1
+
+
+def test_fallback_failing_quality_check_is_not_cached(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(pdf_extract.BACKENDS, "noisy", lambda path: calls.append(path) or ["(cid:3)(cid:4) ??"])
+    monkeypatch.setitem(pdf_extract.BACKENDS, "broken", lambda path: 1 / 0)
+    path = make_pdf(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+
+    result = extract_pdf(path, backends=("noisy", "broken"), cache_dir=cache_dir)
+    assert result.success and result.backend == "noisy"
+    assert load_cached(path, cache_dir) is None
+
+    extract_pdf(path, backends=("noisy", "broken"), cache_dir=cache_dir)
+    assert len(calls) == 2
+
+
+def test_all_backends_failing_returns_error(tmp_path, monkeypatch):
+    monkeypatch.setitem(pdf_extract.BACKENDS, "broken", lambda path: 1 / 0)
+    path = make_pdf(tmp_path)
+    result = extract_pdf(path, backends=("broken",), cache_dir=str(tmp_path / "cache"))
+    assert not result.success
+    assert "broken" in result.error
@@ -0,0 +1,48 @@
+import random
+
+from preprocess import plan_shards, preprocess_corpus
+
+
+def make_corpus(path, articles=120):
+    random.seed(7)
+    lines = []
+    for doc in range(articles):
+        lines += [f'<doc id="{doc}" url="https://tcy.wikipedia.org/?curid={doc}" title="T{doc}">\n', f"T{doc}\n", "\n"]
+        for k in range(random.randint(1, 6)):
+            lines.append("ಒಂದು ಸಾಮಾನ್ಯ ವಾಕ್ಯ ಇಲ್ಲಿ\n" if random.random() < 0.2 else f"article {doc} sentence {k}\n")
+        lines.append("</doc>\n")
+    path.write_text("".join(lines), encoding="utf-8")
+    return lines
+
+
+def test_shards_start_on_articles(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    make_corpus(corpus)
+    with open(corpus, "rb") as f:
+        for start, _ in plan_shards(str(corpus), 8):
+            f.seek(start)
+            assert f.readline().startswith(b"<doc ")
+
+
+def test_output_keeps_articles_whole_and_in_order(tmp_path):
+    corpus = tmp_path / "corpus.txt"
+    lines = make_corpus(corpus)
+    manifest = preprocess_corpus(str(corpus), str(tmp_path / "out"), workers=2, partitions=8)
+
+    expected, seen = [], set()
+    for line in lines:
+        sentence = " ".join(line.split())
+        if line.startswith("<doc") or sentence == "</doc>" or " " not in sentence or sentence in seen:
+            continue
+        seen.add(sentence)
+        expected.append(sentence)
+
+    output = []
+    for file in manifest["files"]:
+        text = (tmp_path / "out" / file["file"]).read_text(encoding="utf-8").splitlines()
+        docs = {line.split()[1] for line in text if line.startswith("article ")}
+        assert docs <= {str(doc) for doc in range(int(file["first_doc"]), int(file["last_doc"]) + 1)}
+        output += text
+    assert output == expected
+    assert manifest["lines_written"] == len(expected)
+    assert manifest["documents"] == 120
@@ -0,0 +1,95 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from psql_agent import AgentRegistry
+
+ARGS = {"host": "localhost", "database": "postgres"}
+
+
+class FakeCollection:
+    """databases or agents of a fake MindsDB server, with a delay on every call"""
+
+    def __init__(self, server, delay=0.0):
+        self.server = server
+        self.delay = delay
+        self.items = {}
+        self.dropped = []
+        self.fail_drop = False
+
+    def get(self, name):
+        time.sleep(self.delay)
+        return self.items[name]
+
+    def create(self, name, *args, **kwargs):
+        time.sleep(self.delay)
+        assert name not in self.items, f"{name} created twice"
+        item = SimpleNamespace(name=name, tables=SimpleNamespace(list=self.server.list_tables),
+                               add_database=lambda *a: None)
+        self.items[name] = item
+        return item
+
+    def drop(self, name):
+        time.sleep(self.delay)
+        if self.fail_drop:
+            raise RuntimeError("drop failed")
+        del self.items[name]
+        self.dropped.append(name)
+
+
+class FakeServer:
+    def __init__(self, delay=0.0):
+        self.databases = FakeCollection(self, delay)
+        self.agents = FakeCollection(self, delay)
+        self.table_lists = 0
+
+    def list_tables(self):
+        self.table_lists += 1
+        return [SimpleNamespace(name="patients")]
+
+
+def test_acquire_after_collect_waits_for_the_drop():
+    server = FakeServer(delay=0.05)
+    registry = AgentRegistry(server, idle_timeout=0.0)
+    registry.release(registry.acquire(ARGS))
+
+    collector = threading.Thread(target=registry.collect_idle)
+    collector.start()
+    time.sleep(0.02)
+    entry = registry.acquire(ARGS)
+    collector.join()
+
+    assert entry.agent.name in server.agents.items
+    assert entry.database.name in server.databases.items
+
+
+def test_datasource_dropped_when_agent_drop_fails():
+    server = FakeServer()
+    registry = AgentRegistry(server, idle_timeout=0.0)
+    registry.release(registry.acquire(ARGS))
+    server.agents.fail_drop = True
+    assert registry.collect_idle() == 1
+    assert server.databases.items == {}
+
+
+def test_slow_registration_does_not_block_other_datasources():
+    server = FakeServer()
+    registry = AgentRegistry(server)
+    registry.release(registry.acquire(ARGS))
+    server.databases.delay = server.agents.delay = 0.3
+    slow = threading.Thread(target=registry.acquire, args=({"host": "slow"},))
+    slow.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    registry.release(registry.acquire(ARGS))
+    assert time.perf_counter() - start < 0.1
+    slow.join()
+
+
+def test_schema_cache_survives_idle_collection():
+    server = FakeServer()
+    registry = AgentRegistry(server, idle_timeout=0.0)
+    registry.release(registry.acquire(ARGS))
+    registry.collect_idle()
+    registry.release(registry.acquire(ARGS))
+    assert server.table_lists == 1
@@ -0,0 +1,115 @@
+import math
+import struct
+import threading
+import time
+import wave
+
+import pytest
+
+from speech_stream import LiveTranscript, StreamingTranscriber, iter_wav_frames, transcribe_wav
+
+SAMPLE_RATE = 16000
+
+
+def write_wav(path, segments):
+    """Write a mono 16-bit WAV of (seconds, amplitude) segments, a 440 Hz tone or silence"""
+    samples = []
+    for seconds, amplitude in segments:
+        for i in range(int(seconds * SAMPLE_RATE)):
+            samples.append(int(amplitude * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE)))
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+    return str(path)
+
+
+class LengthBackend:
+    """Returns the audio length, optionally slower for partial-sized inputs"""
+
+    def __init__(self, partial_delay=0.0, final_min_bytes=None):
+        self.partial_delay = partial_delay
+        self.final_min_bytes = final_min_bytes
+
+    def transcribe(self, pcm, sample_rate):
+        if self.final_min_bytes is not None and len(pcm) < self.final_min_bytes:
+            time.sleep(self.partial_delay)
+        return f"len{len(pcm)}"
+
+
+@pytest.fixture
+def two_utterances(tmp_path):
+    return write_wav(tmp_path / "two.wav", [(0.3, 0), (1.5, 8000), (1.0, 0), (0.8, 8000), (1.0, 0)])
+
+
+def test_iter_wav_frames_yields_whole_frames(two_utterances):
+    frames = list(iter_wav_frames(two_utterances, frame_ms=30))
+    assert frames and all(len(frame) == SAMPLE_RATE * 30 // 1000 * 2 for frame in frames)
+
+
+def test_transcribe_wav_finds_each_utterance(two_utterances):
+    events = transcribe_wav(two_utterances, LengthBackend())
+    finals = [event for event in events if event.final]
+    assert [event.utterance_id for event in finals] == [1, 2]
+    assert all(event.text.startswith("len") for event in finals)
+    # The first utterance is longer than partial_ms, so it produced a partial before its final
+    assert any(not event.final and event.utterance_id == 1 for event in events)
+    assert finals[0].start_ms < finals[0].end_ms <= finals[1].start_ms
+
+
+def test_silence_only_produces_nothing(tmp_path):
+    path = write_wav(tmp_path / "silence.wav", [(2.0, 0)])
+    assert transcribe_wav(path, LengthBackend()) == []
+
+
+def test_slow_partial_never_lands_after_final(tmp_path):
+    # Partials are slow, the final (the whole 2 s utterance) is fast, so the final finishes first
+    path = write_wav(tmp_path / "one.wav", [(0.3, 0), (2.0, 8000), (1.0, 0)])
+    backend = LengthBackend(partial_delay=0.3, final_min_bytes=int(2.0 * SAMPLE_RATE * 2))
+    events = transcribe_wav(path, backend)
+    final_index = next(i for i, event in enumerate(events) if event.final)
+    assert not [event for event in events[final_index:] if not event.final]
+
+
+def test_live_transcript_is_idle_after_final(tmp_path):
+    path = write_wav(tmp_path / "one.wav", [(0.3, 0), (2.0, 8000), (1.0, 0)])
+    with open(path, "rb") as f:
+        data = f.read()
+    backend = LengthBackend(partial_delay=0.3, final_min_bytes=int(2.0 * SAMPLE_RATE * 2))
+    transcript = LiveTranscript()
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        transcript.feed_wav_bytes(data, backend, executor)
+        deadline = time.time() + 10
+        while transcript.feeding and time.time() < deadline:
+            time.sleep(0.05)
+    # Let any straggling partial finish
+    time.sleep(0.5)
+    assert [event.utterance_id for event in transcript.pop_final()] == [1]
+    assert transcript.partial == ""
+    assert not transcript.active
+
+
+def test_stale_partial_for_finalized_utterance_is_dropped():
+    events = []
+    release = threading.Event()
+
+    class GatedBackend:
+        def transcribe(self, pcm, sample_rate):
+            if len(pcm) < 64000:
+                release.wait(5)
+            return f"len{len(pcm)}"
+
+    transcriber = StreamingTranscriber(GatedBackend(), events.append, partial_ms=300, silence_ms=300)
+    tone = struct.pack("<480h", *([8000, -8000] * 240))
+    quiet = bytes(960)
+    for _ in range(80):
+        transcriber.feed(tone)
+    for _ in range(15):
+        transcriber.feed(quiet)
+    time.sleep(0.2)
+    release.set()
+    transcriber.close()
+    final_index = next(i for i, event in enumerate(events) if event.final)
+    assert all(event.final for event in events[final_index:])
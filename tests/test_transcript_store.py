@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import transcript_store
+from transcript_store import TranscriptStore, iter_json_object
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Force values, keys and separators to straddle buffer refills
+    monkeypatch.setattr(transcript_store, "CHUNK_SIZE", 7)
+
+
+def test_iter_json_object_across_chunks(tmp_path, small_chunks):
+    data = {str(i): f"D: turn {i} " * i for i in range(50)}
+    data.update({"number": 12345, "empty": [], "nested": {"a": [1, 2]}})
+    path = tmp_path / "transcripts.json"
+    path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+    assert dict(iter_json_object(str(path))) == data
+
+
+def test_iter_json_object_empty_and_invalid(tmp_path):
+    empty = tmp_path / "empty.json"
+    empty.write_text("  { }  ", encoding="utf-8")
+    assert list(iter_json_object(str(empty))) == []
+
+    array = tmp_path / "array.json"
+    array.write_text("[1, 2]", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_object(str(array)))
+
+
+def test_duplicate_ids_in_one_batch(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    assert store.add_many([("1", "fever"), ("2", "cough"), ("1", "rash")]) == 2
+    assert store["1"] == "rash"
+    assert len(store) == 2
+    assert [transcript_id for transcript_id, _ in store.search("rash")] == ["1"]
+    assert store.search("fever") == []
@@ -0,0 +1,76 @@
+import json
+
+from translation import StubBackend, TranslationMemory, TranslationPipeline
+
+
+class CountingBackend(StubBackend):
+    """Stub backend that records the segments it was asked for and can fail some"""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def translate_batch(self, texts, source, target):
+        self.calls.extend(texts)
+        if self.fail & set(texts):
+            raise RuntimeError("backend unavailable")
+        return super().translate_batch(texts, source, target)
+
+
+def make_pipeline(tmp_path, backend):
+    return TranslationPipeline(backend, TranslationMemory(str(tmp_path / "memory.db")),
+                               batch_size=1, retries=0, backoff=0)
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_edited_and_deleted_documents_are_compacted(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    backend = CountingBackend()
+    pipeline = make_pipeline(tmp_path, backend)
+    list(pipeline.translate_documents([("1", "D: hello"), ("2", "P: fever"), ("3", "P: cough")], "en", "zh", out))
+
+    backend.calls.clear()
+    list(pipeline.translate_documents([("1", "D: hello again"), ("2", "P: fever")], "en", "zh", out))
+    records = read(out)
+    assert [(r["id"], r["source"]) for r in records] == [("1", "D: hello again"), ("2", "P: fever")]
+    assert records[0]["translation"] == "D: [zh] hello again"
+    assert backend.calls == ["hello again"]
+
+
+def test_interrupted_run_resumes(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    documents = [(str(i), f"P: symptom {i}") for i in range(5)]
+    backend = CountingBackend()
+    pipeline = make_pipeline(tmp_path, backend)
+    run = pipeline.translate_documents(documents, "en", "zh", out, documents_per_step=2)
+    next(run), next(run)
+    run.close()
+    assert [r["id"] for r in read(out)] == ["0", "1"]
+
+    backend.calls.clear()
+    translated = [r["id"] for r in pipeline.translate_documents(documents, "en", "zh", out, documents_per_step=2)]
+    assert translated == ["2", "3", "4"]
+    assert backend.calls == ["symptom 2", "symptom 3", "symptom 4"]
+    assert [r["id"] for r in read(out)] == ["0", "1", "2", "3", "4"]
+
+
+def test_failed_segments_are_retried_on_the_next_run(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    documents = [("1", "D: any pain?\nP: chest pain")]
+    pipeline = make_pipeline(tmp_path, CountingBackend(fail={"chest pain"}))
+    [record] = pipeline.translate_documents(documents, "en", "zh", out)
+    assert record["failed_segments"] == 1
+    assert record["translation"] == "D: [zh] any pain?\nP: chest pain"
+    assert read(out) == []
+
+    backend = CountingBackend()
+    pipeline = make_pipeline(tmp_path, backend)
+    [record] = pipeline.translate_documents(documents, "en", "zh", out)
+    assert record["failed_segments"] == 0
+    # The segment that did translate comes from the memory
+    assert backend.calls == ["chest pain"]
+    assert [r["translation"] for r in read(out)] == ["D: [zh] any pain?\nP: [zh] chest pain"]
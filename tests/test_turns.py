@@ -0,0 +1,52 @@
+from transcript_store import TranscriptStore
+from turns import build_turns, detect_languages, parse_transcript, read_turns, turns_table
+
+
+def test_speakers_are_attributed_in_order():
+    text = "D: What brings you in?\nP: Chest pain\nsince last night.\nD:\nP: It gets worse when I breathe."
+    assert parse_transcript("c1", text) == [
+        ("c1", 0, "doctor", "What brings you in?"),
+        ("c1", 1, "patient", "Chest pain\nsince last night."),
+        ("c1", 2, "patient", "It gets worse when I breathe."),
+    ]
+
+
+def test_untagged_text_becomes_narrator():
+    assert parse_transcript("c2", "Recorded at triage.\nD: Any allergies?") == [
+        ("c2", 0, "narrator", "Recorded at triage."),
+        ("c2", 1, "doctor", "Any allergies?"),
+    ]
+    assert parse_transcript("c3", "No tags here") == [("c3", 0, "narrator", "No tags here")]
+    assert parse_transcript("c4", "  \n") == []
+
+
+def test_tags_only_count_at_line_start():
+    [row] = parse_transcript("c5", "P: I told the nurse D: was wrong")
+    assert row[2:] == ("patient", "I told the nurse D: was wrong")
+
+
+def test_batch_script_detection_maps_matches_to_their_text():
+    texts = ["I have a fever", "我發燒", "", "عندي حمى", "fever 發燒 حمى", "ok"]
+    assert detect_languages(texts) == ["en", "zh", "en", "ar", "ar", "en"]
+    assert detect_languages(texts[:2], default="und") == ["und", "zh"]
+    assert detect_languages([]) == []
+
+
+def test_turns_table_tags_each_turn():
+    table = turns_table([("a", "D: How are you?\nP: 頭痛"), ("b", "P: fine")])
+    assert table.column("speaker").to_pylist() == ["doctor", "patient", "patient"]
+    assert table.column("language").to_pylist() == ["en", "zh", "en"]
+    assert table.column("turn_idx").to_pylist() == [0, 1, 0]
+
+
+def test_build_turns_writes_one_part_per_chunk(tmp_path):
+    db_path = str(tmp_path / "transcripts.db")
+    store = TranscriptStore(db_path)
+    store.add_many([(str(i), f"D: question {i}\nP: answer {i}") for i in range(5)])
+    store.close()
+
+    out_dir = tmp_path / "turns"
+    assert build_turns(db_path, str(out_dir), workers=2, chunk_size=2) == 10
+    assert len(list(out_dir.glob("part-*.parquet"))) == 3
+    patients = read_turns(str(out_dir), filters=[("speaker", "=", "patient")])
+    assert sorted(patients.column("text").to_pylist()) == [f"answer {i}" for i in range(5)]
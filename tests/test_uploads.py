@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import uploads
+from uploads import UploadProcessor
+
+
+def wait(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = UploadProcessor(max_workers=1, cache_dir=str(tmp_path))
+    yield processor
+    processor.executor.shutdown(wait=True)
+
+
+def test_failed_job_is_retried_on_resubmit(processor, monkeypatch):
+    calls = []
+
+    def flaky(data, progress, max_chars):
+        calls.append(data)
+        if len(calls) == 1:
+            raise OSError("disk busy")
+        return data.decode(), False
+
+    monkeypatch.setitem(uploads.PARSERS, "txt", flaky)
+    first = wait(processor.submit("notes.txt", b"fever since monday"))
+    assert first.status == "failed"
+
+    second = wait(processor.submit("notes.txt", b"fever since monday"))
+    assert second is not first
+    assert second.status == "done" and second.text == "fever since monday"
+    assert processor.get(second.job_id) is second
+    assert len(calls) == 2
+
+
+def test_cache_key_includes_the_extension(processor, tmp_path):
+    data = b"name,age\nMary,45\n"
+    as_text = wait(processor.submit("records.txt", data))
+    as_csv = processor.submit("records.csv", data)
+    assert as_text.job_id != as_csv.job_id
+    assert not as_csv.cached
+
+    # A fresh processor reads each from its own disk cache entry
+    reloaded = UploadProcessor(max_workers=1, cache_dir=str(tmp_path))
+    assert reloaded.submit("records.txt", data).text == as_text.text